@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import platform
+import random
+import re
+import statistics
+import sys
+import time
+
+# Widget benchmarks run without a display
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+import numpy as np
+import sympy
+from exporters import latex_code, matlab_code
+from matrix_engine import (PRECISION_DIGITS, STRASSEN_CUTOFF, Operand, apply_cse, configure_parallel, domain_product, exact_operands,
+                           multiply, multiply_pairs, parse_entry, use_multimodular, use_strassen)
+from result_cache import configure_cache
+
+#***********************************
+# Benchmark suite for the engine, validation and export paths
+#
+#   python benchmarks.py --quick                             # small sizes only
+#   python benchmarks.py -o baseline.json                    # record a baseline
+#   python benchmarks.py --baseline baseline.json            # fails (exit 1) on regressions
+#
+# Every case is (name, setup, run): setup builds fresh inputs outside the timing, so
+# per-operand caches and the parse cache never carry over between repetitions
+#***********************************
+
+SIZES = {
+    'int': [2, 16, 128, 512, 1024],
+    'float': [2, 16, 128, 512, 1024],
+    'rational': [2, 16, 64, 128],
+    'symbolic': [2, 8, 32, 64],
+}
+QUICK_SIZES = {
+    'int': [2, 16, 128],
+    'float': [2, 16, 128],
+    'rational': [2, 16],
+    'symbolic': [2, 8],
+}
+BATCH_SIZES = {'int': (4, 5000), 'float': (4, 5000), 'symbolic': (3, 2000)}
+QUICK_BATCH_SIZES = {'int': (4, 500), 'float': (4, 500), 'symbolic': (3, 200)}
+STRASSEN_SIZES = {'bigint': [32, 64, 128], 'poly': [32, 64]}
+QUICK_STRASSEN_SIZES = {'bigint': [32], 'poly': [32]}
+MULTIMODULAR_SIZES = {'wideint': [32, 128, 256], 'bigint': [32, 64, 128]}
+QUICK_MULTIMODULAR_SIZES = {'wideint': [32], 'bigint': [32]}
+PRECISION_SIZES = {'float32': [512, 1024], 'float64': [512, 1024], 'mpmath': [32, 128]}
+QUICK_PRECISION_SIZES = {'float32': [512], 'float64': [512], 'mpmath': [32]}
+SPARSE_DENSITY = 0.05
+SYMBOLS = ['α', 'β', 'γ', 'θ']
+NOISE_FLOOR = 0.001     # seconds, differences below this are never regressions
+
+
+#***********************************
+# Operand generators (seeded, so runs compare like with like)
+#***********************************
+def random_entry(rng, kind):
+    if kind == 'int':
+        return str(rng.randint(-99, 99))
+    if kind == 'float':
+        return repr(round(rng.uniform(-10, 10), 6))
+    if kind == 'rational':
+        return f"{rng.randint(-99, 99)}/{rng.randint(1, 99)}"
+    return rng.choice([f"{rng.randint(1, 9)}*{rng.choice(SYMBOLS)}", f"{rng.choice(SYMBOLS)}**2",
+                       f"sin({rng.choice(SYMBOLS)})", str(rng.randint(-9, 9))])
+
+
+def random_rows(kind, rows, cols, density=1.0, seed=0):
+    rng = random.Random(f"{kind}-{rows}-{cols}-{density}-{seed}")
+    return [[random_entry(rng, kind) if rng.random() < density else '0' for _ in range(cols)] for _ in range(rows)]
+
+
+# entries that are expensive to multiply: 1000 bit integers, dense polynomials in x, and
+# 100 bit integers whose products no longer fit in int64
+def heavy_rows(kind, rows, cols, seed=0):
+    rng = random.Random(f"{kind}-{rows}-{cols}-{seed}")
+    if kind == 'bigint':
+        return [[str(rng.randint(-10**300, 10**300)) for _ in range(cols)] for _ in range(rows)]
+    if kind == 'wideint':
+        return [[str(rng.randint(-2**100, 2**100)) for _ in range(cols)] for _ in range(rows)]
+    return [[' + '.join(f"{rng.randint(1, 99)}*x**{power}" for power in range(4)) for _ in range(cols)] for _ in range(rows)]
+
+
+def operand_pair(kind, size, density):
+    return random_rows(kind, size, size, density, 0), random_rows(kind, size, size, density, 1)
+
+
+#***********************************
+# Cases
+#***********************************
+def engine_cases(sizes):
+    for kind, kind_sizes in sizes.items():
+        for size in kind_sizes:
+            for variant, density in (('dense', 1.0), ('sparse', SPARSE_DENSITY)):
+                if variant == 'sparse' and size < 16:
+                    continue
+                name = f"{kind}/{variant}/{size}"
+                left_rows, right_rows = operand_pair(kind, size, density)
+
+                def fresh(left_rows=left_rows, right_rows=right_rows):
+                    parse_entry.cache_clear()
+                    return Operand(left_rows), Operand(right_rows)
+
+                def computed(left_rows=left_rows, right_rows=right_rows):
+                    product = multiply(left_rows, right_rows)
+                    product.texts()
+                    return product
+
+                yield f"multiply/{name}", fresh, lambda operands: multiply(*operands).texts()
+                yield f"validate/{name}", lambda left_rows=left_rows: left_rows, lambda rows: Operand(rows)
+                # export cases get an already computed product
+                if kind in ('rational', 'symbolic') or size <= 128:
+                    yield f"latex/{name}", computed, latex_code
+                yield f"matlab/{name}", computed, matlab_code
+                if kind == 'symbolic':
+                    yield f"cse/{name}", computed, apply_cse
+
+
+# many small pairs: one batched call against one multiply() per pair
+def batch_cases(batch_sizes):
+    for kind, (size, count) in batch_sizes.items():
+        lefts = [random_rows(kind, size, size, 1.0, seed) for seed in range(count)]
+        rights = [random_rows(kind, size, size, 1.0, count + seed) for seed in range(count)]
+
+        def fresh():
+            parse_entry.cache_clear()
+
+        def one_by_one(_, lefts=lefts, rights=rights):
+            return [multiply(left, right).texts() for left, right in zip(lefts, rights)]
+
+        yield f"batch/{kind}/{size}x{size}/{count}", fresh, lambda _, lefts=lefts, rights=rights: list(multiply_pairs(lefts, rights))
+        yield f"pairs/{kind}/{size}x{size}/{count}", fresh, one_by_one
+
+
+# Strassen-Winograd against the blocked classical product on the same exact operands
+def strassen_cases(sizes):
+    for kind, kind_sizes in sizes.items():
+        for size in kind_sizes:
+            left, right = Operand(heavy_rows(kind, size, size, 0)), Operand(heavy_rows(kind, size, size, 1))
+            operands = (left, right) + exact_operands(left, right)
+            if not use_strassen(*operands, STRASSEN_CUTOFF):
+                continue
+            yield f"classical/{kind}/{size}", lambda operands=operands: operands, lambda operands: domain_product(*operands)
+            yield f"strassen/{kind}/{size}", lambda operands=operands: operands, lambda operands: domain_product(*operands, strassen=True)
+
+
+# Multi-modular CRT against the blocked classical product, each size cross-checked once against
+# sympy's result before it is timed
+def multimodular_cases(sizes):
+    for kind, kind_sizes in sizes.items():
+        for size in kind_sizes:
+            left, right = Operand(heavy_rows(kind, size, size, 0)), Operand(heavy_rows(kind, size, size, 1))
+            operands = (left, right) + exact_operands(left, right)
+            if not use_multimodular(*operands):
+                continue
+            checked = []
+
+            def cross_checked(operands=operands, checked=checked):
+                if not checked:
+                    if domain_product(*operands, multimodular=True) != domain_product(*operands):
+                        raise SystemExit(f"multimodular product of {operands[0].shape} operands differs from sympy's")
+                    checked.append(True)
+                return operands
+
+            yield f"classical/{kind}/{size}", lambda operands=operands: operands, lambda operands: domain_product(*operands)
+            yield f"multimodular/{kind}/{size}", cross_checked, lambda operands: domain_product(*operands, multimodular=True)
+
+
+# the same float operands at each numeric precision, error bound included
+def precision_cases(sizes):
+    for mode, mode_sizes in sizes.items():
+        for size in mode_sizes:
+            left_rows, right_rows = random_rows('float', size, size, 1.0, 0), random_rows('float', size, size, 1.0, 1)
+
+            def fresh(left_rows=left_rows, right_rows=right_rows):
+                # parsed ahead, the case times the product and its bound
+                return Operand(left_rows).prepare(), Operand(right_rows).prepare()
+
+            yield (f"precision/{mode}/{size}", fresh,
+                   lambda operands, mode=mode: multiply(*operands, precision=(mode, PRECISION_DIGITS)))
+
+
+def widget_cases(sizes):
+    from PyQt5.QtWidgets import QApplication
+    from matrix_model import MatrixModel
+    app = QApplication.instance() or QApplication([])
+    for size in sorted({size for kind_sizes in sizes.values() for size in kind_sizes}):
+        rows = random_rows('int', size, size)
+
+        def filled(rows=rows):
+            model = MatrixModel()
+            model.set_rows(rows)
+            return model
+
+        yield f"grid/fill/{size}", MatrixModel, lambda model, rows=rows: model.set_rows(rows)
+        yield f"grid/check_matrix_sizes/{size}", filled, lambda model: model.dimensions()
+        yield f"grid/read/{size}", filled, lambda model, size=size: model.read(size, size)
+
+    # end to end: grids -> background job -> result grid, as the Compute button does it
+    import matrix_rechner
+    window = matrix_rechner.MatrixMultiplicationApp()
+    for kind in ('int', 'rational', 'symbolic'):
+        for size in [size for size in sizes[kind] if size <= 64]:
+            left_rows, right_rows = operand_pair(kind, size, 1.0)
+
+            def loaded(left_rows=left_rows, right_rows=right_rows):
+                parse_entry.cache_clear()
+                window.chain = None
+                window.operand_matrices[0].set_rows(left_rows)
+                window.operand_matrices[1].set_rows(right_rows)
+                return window
+
+            def compute(window):
+                window.compute()
+                while window.current_job is not None:
+                    app.processEvents()
+
+            yield f"gui/compute/{kind}/{size}", loaded, compute
+
+
+def run_case(setup, run, repeat):
+    timings = []
+    for _ in range(repeat):
+        argument = setup()
+        start = time.perf_counter()
+        run(argument)
+        timings.append(time.perf_counter() - start)
+    return {'min': min(timings), 'median': statistics.median(timings), 'repeat': repeat}
+
+
+#***********************************
+# Baseline comparison
+#***********************************
+def compare(results, baseline, tolerance):
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        if result['min'] > before['min'] * (1 + tolerance) and result['min'] - before['min'] > NOISE_FLOOR:
+            regressions.append((name, before['min'], result['min']))
+    return regressions
+
+
+def metadata():
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'numpy': np.__version__,
+        'sympy': sympy.__version__,
+    }
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='benchmarks', description="Time the engine, validation, export and widget paths.")
+    parser.add_argument('--quick', action='store_true', help="small sizes only")
+    parser.add_argument('--filter', metavar='REGEX', help="only run cases whose name matches")
+    parser.add_argument('--repeat', type=int, default=3, help="repetitions per case, the minimum is compared")
+    parser.add_argument('--no-widgets', action='store_true', help="skip the Qt grid and GUI cases")
+    parser.add_argument('-o', '--output', metavar='FILE', help="write the results as JSON")
+    parser.add_argument('--baseline', metavar='FILE', help="compare against a results JSON, exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.25, help="allowed slowdown against the baseline, default 0.25 (25%%)")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes for symbolic products, default 1 for stable timings")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    sizes = QUICK_SIZES if args.quick else SIZES
+    pattern = re.compile(args.filter) if args.filter else None
+    configure_parallel(workers=args.workers)
+    # repetitions of the GUI cases would otherwise time result cache hits
+    configure_cache(enabled=False)
+
+    cases = list(engine_cases(sizes)) + list(batch_cases(QUICK_BATCH_SIZES if args.quick else BATCH_SIZES))
+    cases += list(strassen_cases(QUICK_STRASSEN_SIZES if args.quick else STRASSEN_SIZES))
+    cases += list(multimodular_cases(QUICK_MULTIMODULAR_SIZES if args.quick else MULTIMODULAR_SIZES))
+    cases += list(precision_cases(QUICK_PRECISION_SIZES if args.quick else PRECISION_SIZES))
+    if not args.no_widgets:
+        cases += list(widget_cases(sizes))
+    results = {}
+    for name, setup, run in cases:
+        # e.g. classical/bigint/N is the baseline of both the Strassen and the multi-modular cases
+        if name in results or pattern is not None and not pattern.search(name):
+            continue
+        results[name] = run_case(setup, run, args.repeat)
+        print(f"{name:<40} {results[name]['min'] * 1000:10.2f} ms", flush=True)
+
+    if args.output:
+        document = {'meta': metadata(), 'results': results}
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(document, file, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as file:
+            baseline = json.load(file)['results']
+        regressions = compare(results, baseline, args.tolerance)
+        for name, before, after in regressions:
+            print(f"REGRESSION {name}: {before * 1000:.2f} ms -> {after * 1000:.2f} ms", file=sys.stderr)
+        if regressions:
+            return 1
+        print(f"no regressions against {args.baseline} (tolerance {args.tolerance:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
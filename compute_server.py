@@ -0,0 +1,492 @@
+import argparse
+import asyncio
+import json
+import multiprocessing
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from http import HTTPStatus
+import numpy as np
+from exporters import EXPORTERS, export_text
+from instrumentation import PhaseStats, enable_json_log
+from matrix_engine import (PRECISION_DIGITS, PRECISIONS, ComputeCancelled, EngineError, Operand, apply_cse, as_operand, configure_parallel,
+                           configure_precision, multiply_chain, multiply_pairs)
+from matrix_io import parse_matrix_text
+from result_cache import cacheable, configure_cache, product_key, shared_cache
+
+#***********************************
+# Local compute service: the engine, the exporters and the result cache behind an asyncio
+# HTTP/JSON server on localhost or a Unix socket, no Qt
+#
+#   python compute_server.py --port 8765
+#   curl -d '{"operands": ["[a b; c d]", "[1; 2]"], "formats": ["latex"]}' http://127.0.0.1:8765/multiply
+#
+#  - POST /multiply  {"operands": [matrix, ...], "cse": false, "formats": ["latex", ...], "stream": false}
+#  - POST /batch     {"lefts": [matrix, ...], "rights": [matrix, ...]}, always streamed
+#  - GET /health, GET /stats
+#  - a matrix is a list of rows or any text the GUI can paste ('[a b; c d]', LaTeX, repr)
+#  - concurrent requests for the same operands (same content key as the result cache) share one
+#    computation, the others wait for it
+#  - at most workers + max pending requests are admitted, the rest get 503 with Retry-After
+#  - streamed responses are NDJSON in chunked encoding: a header line, one line per result row
+#    (or batch result), then the exports chunk by chunk; a slow client stalls the worker thread
+#    producing the stream instead of letting it buffer, a client that goes away cancels it
+#***********************************
+
+SERVER_HOST = '127.0.0.1'
+SERVER_PORT = 8765
+SERVER_WORKERS = 4
+SERVER_MAX_PENDING = 16
+SERVER_MAX_BODY = 64 * 1024 * 1024
+SERVER_INLINE_CELLS = 250000    # larger results are only sent as streams
+STREAM_CHUNK = 64 * 1024        # characters per chunk handed from a worker thread to the event loop
+STREAM_QUEUE = 8                # chunks buffered per streamed response
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=()):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = list(headers)
+
+
+#***********************************
+# HTTP/1.1, one request per connection
+#***********************************
+async def read_request(reader):
+    line = await reader.readline()
+    if not line.strip():
+        return None
+    parts = line.decode('latin-1').split()
+    if len(parts) != 3:
+        raise HttpError(400, "Malformed request line")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    try:
+        length = int(headers.get('content-length') or 0)
+    except ValueError as error:
+        raise HttpError(400, "Invalid Content-Length") from error
+    if length > SERVER_MAX_BODY:
+        raise HttpError(413, f"Request body exceeds {SERVER_MAX_BODY} bytes")
+    body = await reader.readexactly(length) if length > 0 else b''
+    return parts[0].upper(), parts[1].split('?')[0], body
+
+
+def response_head(status, content_type, headers=()):
+    lines = [f"HTTP/1.1 {status} {HTTPStatus(status).phrase}", f"Content-Type: {content_type}", "Connection: close", *headers]
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+async def send_json(writer, status, document, headers=()):
+    body = json.dumps(document, ensure_ascii=False).encode()
+    writer.write(response_head(status, 'application/json', [f"Content-Length: {len(body)}", *headers]) + body)
+    await writer.drain()
+
+
+async def send_stream(writer, queue):
+    writer.write(response_head(200, 'application/x-ndjson', ["Transfer-Encoding: chunked"]))
+    while True:
+        chunk = await queue.get()
+        if chunk is None:
+            break
+        data = chunk.encode()
+        writer.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        await writer.drain()
+    writer.write(b"0\r\n\r\n")
+    await writer.drain()
+
+
+def parse_body(body):
+    try:
+        request = json.loads(body or b'{}')
+    except ValueError as error:
+        raise HttpError(400, f"Invalid JSON: {error}") from error
+    if not isinstance(request, dict):
+        raise HttpError(400, "The request must be a JSON object")
+    return request
+
+
+#***********************************
+# Worker thread side: everything that touches the engine runs here
+#***********************************
+def request_rows(value, index):
+    if isinstance(value, str):
+        return parse_matrix_text(value)
+    if not isinstance(value, list) or not value or not all(isinstance(row, list) for row in value):
+        raise EngineError(f"Matrix {index + 1} must be a list of rows or matrix text")
+    if not all(type(entry) in (int, float, str) for row in value for entry in row):
+        raise EngineError(f"Matrix {index + 1}: entries must be numbers or text")
+    return value
+
+
+def request_operand(value, index):
+    rows = request_rows(value, index)
+    # rows of JSON numbers skip the text classification of every entry
+    if len({len(row) for row in rows}) == 1 and all(type(entry) in (int, float) for row in rows for entry in row):
+        return Operand.from_array(np.array(rows))
+    return as_operand(rows)
+
+
+def prepare_operands(values, cse):
+    operands = [request_operand(value, index) for index, value in enumerate(values)]
+    return operands, product_key(operands, cse)
+
+
+def compute_product(operands, key, cse):
+    stats = PhaseStats()
+    cache = shared_cache() if cacheable(operands) else None
+    product = None
+    if cache is not None:
+        with stats.phase('cache'):
+            product = cache.get(key, operands)
+        stats.set('result cache', 'hit' if product is not None else 'miss')
+    if product is None:
+        with stats.phase('parse'):
+            operands = [operand.prepare() for operand in operands]
+        with stats.phase('multiply'):
+            product = multiply_chain(operands)
+        if cse:
+            with stats.phase('cse'):
+                apply_cse(product)
+        with stats.phase('texts'):
+            product.texts()
+        if cache is not None:
+            with stats.phase('cache'):
+                cache.put(key, product)
+    stats.set('engine', product.engine)
+    stats.set('result cells', product.shape[0] * product.shape[1])
+    stats.log('serve', operands=len(operands))
+    return product
+
+
+def render_exports(product, formats):
+    cache = shared_cache() if product.key is not None else None
+    exports = {}
+    for name in formats:
+        text = cache.rendering(product.key, name) if cache is not None else None
+        if text is None:
+            text = export_text(product, name)
+            if cache is not None:
+                cache.put_rendering(product.key, name, text)
+        exports[name] = text
+    return exports
+
+
+def product_header(product, coalesced):
+    header = {'shape': list(product.shape), 'engine': product.engine, 'coalesced': coalesced}
+    if product.error_bound is not None:
+        header['precision'] = product.precision
+        # JSON has no infinity: null when the bound overflowed
+        header['error_bound'] = product.error_bound if np.isfinite(product.error_bound) else None
+    if product.cse is not None:
+        header['temporaries'] = [[str(symbol), str(expr)] for symbol, expr in product.cse[0]]
+    return header
+
+
+class StreamWriter:
+    # NDJSON lines from a worker thread, handed to the event loop in chunks; blocks while the
+    # queue is full (slow client) and raises ComputeCancelled once the client is gone
+    def __init__(self, loop, queue, cancelled):
+        self.loop = loop
+        self.queue = queue
+        self.cancelled = cancelled
+        self.buffer = []
+        self.size = 0
+
+    def put(self, item):
+        future = asyncio.run_coroutine_threadsafe(self.queue.put(item), self.loop)
+        while True:
+            try:
+                return future.result(timeout=0.1)
+            except FutureTimeoutError:
+                if self.cancelled():
+                    future.cancel()
+                    raise ComputeCancelled()
+
+    def line(self, document):
+        text = json.dumps(document, ensure_ascii=False) + '\n'
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= STREAM_CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.put(''.join(self.buffer))
+            self.buffer = []
+            self.size = 0
+
+
+class ExportLines:
+    # file object for an exporter, its text leaves as {"export": name, "text": ...} lines
+    def __init__(self, stream, name):
+        self.stream = stream
+        self.name = name
+        self.buffer = []
+        self.size = 0
+
+    def write(self, text):
+        self.buffer.append(text)
+        self.size += len(text)
+        if self.size >= STREAM_CHUNK:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.stream.line({'export': self.name, 'text': ''.join(self.buffer)})
+            self.buffer = []
+            self.size = 0
+
+
+def stream_product(stream, product, coalesced, formats):
+    stream.line(product_header(product, coalesced))
+    for row in product.texts():
+        if stream.cancelled():
+            raise ComputeCancelled()
+        stream.line({'row': row})
+    for name in formats:
+        lines = ExportLines(stream, name)
+        EXPORTERS[name].export(product, lines, cancelled=stream.cancelled)
+        lines.flush()
+
+
+def stream_batch(stream, lefts, rights):
+    lefts = [request_rows(value, index) for index, value in enumerate(lefts)]
+    rights = [request_rows(value, index) for index, value in enumerate(rights)]
+    stream.line({'count': max(len(lefts), len(rights))})
+    for rows in multiply_pairs(lefts, rights, cancelled=stream.cancelled):
+        stream.line({'result': rows})
+
+
+#***********************************
+# Server: admission, coalescing and routing on the event loop
+#***********************************
+class ComputeServer:
+    def __init__(self, workers=SERVER_WORKERS, max_pending=SERVER_MAX_PENDING):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix='compute')
+        self.inflight = {}      # result key -> asyncio.Future of the Product being computed
+        self.running = 0        # admitted requests that are not answered yet
+        self.counters = {'requests': 0, 'computations': 0, 'coalesced': 0, 'rejected': 0}
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+    @contextmanager
+    def admitted(self):
+        if self.running >= self.workers + self.max_pending:
+            self.counters['rejected'] += 1
+            raise HttpError(503, "Server busy, retry later", ["Retry-After: 1"])
+        self.running += 1
+        try:
+            yield
+        finally:
+            self.running -= 1
+
+    async def run(self, function, *args):
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
+
+    async def product(self, operands, key, cse):
+        future = self.inflight.get(key)
+        if future is not None:
+            self.counters['coalesced'] += 1
+            return await asyncio.shield(future), True
+        future = asyncio.get_running_loop().create_future()
+        # nobody may be waiting on it, failures must not end up as 'never retrieved' warnings
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        self.inflight[key] = future
+        self.counters['computations'] += 1
+        try:
+            product = await self.run(compute_product, operands, key, cse)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+        else:
+            future.set_result(product)
+        finally:
+            del self.inflight[key]
+        return product, False
+
+    async def stream(self, writer, function, *args):
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue(STREAM_QUEUE)
+        gone = threading.Event()
+        stream = StreamWriter(loop, queue, gone.is_set)
+
+        def produce():
+            try:
+                try:
+                    function(stream, *args)
+                except EngineError as error:
+                    stream.line({'error': str(error)})
+                except ComputeCancelled:
+                    raise
+                except Exception as error:
+                    stream.line({'error': f"Computation failed: {error}"})
+                stream.flush()
+                stream.put(None)
+            except ComputeCancelled:
+                pass
+
+        task = loop.run_in_executor(self.executor, produce)
+        try:
+            await send_stream(writer, queue)
+        except BaseException:
+            gone.set()
+            raise
+        finally:
+            await asyncio.wait([task])
+
+    async def multiply(self, request, writer):
+        values = request.get('operands')
+        if not isinstance(values, list) or len(values) < 2:
+            raise HttpError(400, "'operands' must list at least two matrices")
+        formats = request.get('formats') or []
+        if not isinstance(formats, list):
+            raise HttpError(400, "'formats' must be a list")
+        unknown = [name for name in formats if not isinstance(name, str) or name not in EXPORTERS]
+        if unknown:
+            raise HttpError(400, f"Unknown formats {unknown}, choose from {sorted(EXPORTERS)}")
+        cse = bool(request.get('cse'))
+        operands, key = await self.run(prepare_operands, values, cse)
+        product, coalesced = await self.product(operands, key, cse)
+        if request.get('stream'):
+            await self.stream(writer, stream_product, product, coalesced, formats)
+            return
+        if product.shape[0] * product.shape[1] > SERVER_INLINE_CELLS:
+            raise HttpError(413, f"The result has more than {SERVER_INLINE_CELLS} cells, request it with \"stream\": true")
+        document = product_header(product, coalesced)
+        document['result'] = product.texts()
+        if formats:
+            document['exports'] = await self.run(render_exports, product, formats)
+        await send_json(writer, 200, document)
+
+    async def batch(self, request, writer):
+        lefts, rights = request.get('lefts'), request.get('rights')
+        if not isinstance(lefts, list) or not isinstance(rights, list):
+            raise HttpError(400, "'lefts' and 'rights' must be lists of matrices")
+        await self.stream(writer, stream_batch, lefts, rights)
+
+    def stats(self):
+        cache = shared_cache()
+        document = {**self.counters, 'running': self.running, 'inflight': len(self.inflight),
+                    'workers': self.workers, 'max_pending': self.max_pending}
+        if cache is not None:
+            document['result cache'] = {'hits': cache.hits, 'misses': cache.misses}
+        return document
+
+    async def dispatch(self, method, path, body, writer):
+        routes = {'/multiply': ('POST', self.multiply), '/batch': ('POST', self.batch), '/health': ('GET', None), '/stats': ('GET', None)}
+        if path not in routes:
+            raise HttpError(404, f"No endpoint {path}, use {', '.join(routes)}")
+        if method != routes[path][0]:
+            raise HttpError(405, f"{path} takes {routes[path][0]}", [f"Allow: {routes[path][0]}"])
+        if path == '/health':
+            await send_json(writer, 200, {'status': 'ok'})
+        elif path == '/stats':
+            await send_json(writer, 200, self.stats())
+        else:
+            self.counters['requests'] += 1
+            with self.admitted():
+                try:
+                    await routes[path][1](parse_body(body), writer)
+                except EngineError as error:
+                    raise HttpError(422, str(error)) from error
+
+    async def handle(self, reader, writer):
+        try:
+            request = await read_request(reader)
+            if request is not None:
+                await self.dispatch(*request, writer)
+        except HttpError as error:
+            await self.send_error(writer, error.status, error.message, error.headers)
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as error:
+            await self.send_error(writer, 500, f"Computation failed: {error}")
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def send_error(self, writer, status, message, headers=()):
+        try:
+            await send_json(writer, status, {'error': message}, headers)
+        except ConnectionError:
+            pass
+
+
+async def serve(server, host=SERVER_HOST, port=SERVER_PORT, unix_path=None, ready=None):
+    if unix_path:
+        listener = await asyncio.start_unix_server(server.handle, unix_path)
+        address = f"unix:{unix_path}"
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        bound = listener.sockets[0].getsockname()
+        address = f"http://{bound[0]}:{bound[1]}"
+    if ready is not None:
+        ready(address)
+    async with listener:
+        await listener.serve_forever()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='compute_server', description="Serve the matrix engine over HTTP/JSON on this machine.")
+    parser.add_argument('--host', default=SERVER_HOST, help=f"address to listen on, default {SERVER_HOST}")
+    parser.add_argument('--port', type=int, default=SERVER_PORT, help=f"TCP port, 0 picks a free one, default {SERVER_PORT}")
+    parser.add_argument('--unix', metavar='PATH', help="listen on a Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=SERVER_WORKERS, metavar='N', help=f"requests computed at the same time, default {SERVER_WORKERS}")
+    parser.add_argument('--max-pending', type=int, default=SERVER_MAX_PENDING, metavar='N',
+                        help=f"requests waiting for a worker before new ones get 503, default {SERVER_MAX_PENDING}")
+    parser.add_argument('--processes', type=int, metavar='N', help="worker processes for large symbolic products (1 = serial), default: all cores")
+    parser.add_argument('--precision', choices=PRECISIONS, default='auto',
+                        help="numeric products: auto (exact integers, float64 otherwise), float32, float64 or mpmath, default auto")
+    parser.add_argument('--digits', type=int, default=PRECISION_DIGITS, metavar='N',
+                        help=f"significant digits of --precision mpmath, default {PRECISION_DIGITS}")
+    parser.add_argument('--cache', metavar='FILE', help="result cache file, default in the user's cache directory")
+    parser.add_argument('--no-cache', action='store_true', help="neither look up nor store symbolic results in the result cache")
+    parser.add_argument('--stats', action='store_true', help="log per-request timings and counters as JSON lines on stderr")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.workers < 1 or args.max_pending < 0:
+        print("compute_server: --workers must be positive and --max-pending not negative", file=sys.stderr)
+        return 1
+    configure_parallel(args.processes)
+    configure_precision(args.precision, args.digits)
+    if args.cache or args.no_cache:
+        configure_cache(args.cache, enabled=not args.no_cache)
+    if args.stats:
+        enable_json_log(sys.stderr)
+    server = ComputeServer(args.workers, args.max_pending)
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix,
+                          ready=lambda address: print(f"compute_server: listening on {address}", file=sys.stderr, flush=True)))
+    except KeyboardInterrupt:
+        pass
+    except OSError as error:
+        print(f"compute_server: {error.strerror or error}", file=sys.stderr)
+        return 1
+    finally:
+        server.close()
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,288 @@
+import math
+import threading
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+from instrumentation import PhaseStats
+from evaluation import parse_sweep, write_sweep
+from exporters import export_text
+from sympy import Matrix
+from matrix_engine import OUT_OF_CORE_TILE, ComputeCancelled, EngineError, apply_cse, as_operand, matrix_cse, parse_entry
+from matrix_algebra import apply_operation
+from matrix_io import export_file, multiply_files
+from result_cache import cacheable, product_key, shared_cache
+from simplification import simplify_entries, symbolic_entries
+
+#***********************************
+# Background compute job
+#  - runs the engine and the printing of the result entries off the GUI thread
+#  - results come back by signal, tagged with the job id so stale jobs can be dropped
+#  - every phase is timed into the job's PhaseStats, which travel back with the result
+#  - symbolic results are looked up in and stored to the persistent result cache
+#***********************************
+class ComputeSignals(QObject):
+    progress = pyqtSignal(int, int, int)   # job_id, done, total
+    finished = pyqtSignal(int, object)     # job_id, ComputeResult
+    failed = pyqtSignal(int, str)          # job_id, error message
+    cancelled = pyqtSignal(int)            # job_id
+
+
+class ComputeResult:
+    def __init__(self, product, texts, stats):
+        self.product = product
+        self.texts = texts
+        self.stats = stats
+
+
+class ComputeJob(QRunnable):
+    def __init__(self, job_id, operands, chain, cse=False, stats=None, operation=None):
+        super().__init__()
+        self.job_id = job_id
+        self.operands = operands
+        self.chain = chain
+        self.cse = cse
+        self.operation = operation      # matrix_algebra operation, None multiplies the chain
+        self.stats = stats if stats is not None else PhaseStats()
+        self.signals = ComputeSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, done, total):
+        self.signals.progress.emit(self.job_id, done, total)
+
+    def compute(self, operands):
+        stats = self.stats
+        cache_before = parse_entry.cache_info()
+        with stats.phase('parse'):
+            operands = [operand.prepare() for operand in operands]
+        cache_after = parse_entry.cache_info()
+        stats.count('parsed entries', cache_after.misses - cache_before.misses)
+        stats.count('parse cache hits', cache_after.hits - cache_before.hits)
+        if self.operation is not None:
+            with stats.phase(self.operation[0]):
+                product = apply_operation(self.operation, operands, self.report_progress, self.is_cancelled)
+            stats.set('operation', ' '.join(str(part) for part in self.operation))
+            stats.set('factorization', 'reused' if product.reused_factorization else 'new')
+        else:
+            with stats.phase('multiply'):
+                product = self.chain.update(operands, self.report_progress, self.is_cancelled)
+        if product.processes > 1:
+            stats.set('processes', product.processes)
+        if product.changed is not None:
+            stats.set('recomputed rows/cols', sum(len(indices) for indices in product.changed))
+        if self.cse:
+            with stats.phase('cse'):
+                apply_cse(product)
+        with stats.phase('texts'):
+            product.texts()
+        return product
+
+    def run(self):
+        stats = self.stats
+        try:
+            operands = [as_operand(operand) for operand in self.operands]
+            cache = shared_cache() if cacheable(operands) else None
+            product = None
+            if cache is not None:
+                with stats.phase('cache'):
+                    key = product_key(operands, self.cse, self.operation)
+                    product = cache.get(key, operands)
+                stats.set('result cache', 'hit' if product is not None else 'miss')
+            if product is None:
+                product = self.compute(operands)
+                if cache is not None and not self.is_cancelled():
+                    with stats.phase('cache'):
+                        cache.put(key, product)
+            stats.set('engine', product.engine)
+            stats.set('result cells', product.shape[0] * product.shape[1])
+            if product.precision is not None:
+                stats.set('precision', product.precision)
+            if product.error_bound is not None:
+                stats.set('error bound', product.error_bound if math.isfinite(product.error_bound) else 'none')
+            if product.cse is not None:
+                stats.set('temporaries', len(product.cse[0]))
+            if self.is_cancelled():
+                raise ComputeCancelled()
+            result = ComputeResult(product, product.texts(), stats)
+        except ComputeCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except EngineError as error:
+            self.signals.failed.emit(self.job_id, str(error))
+        except Exception as error:
+            self.signals.failed.emit(self.job_id, f"Computation failed: {error}")
+        else:
+            self.signals.finished.emit(self.job_id, result)
+
+
+#***********************************
+# Out-of-core job: multiplies two .npy files tile by tile into a memory-mapped result file
+#***********************************
+class OutOfCoreJob(QRunnable):
+    def __init__(self, job_id, left_path, right_path, output_path, tile=OUT_OF_CORE_TILE):
+        super().__init__()
+        self.job_id = job_id
+        self.left_path = left_path
+        self.right_path = right_path
+        self.output_path = output_path
+        self.tile = tile
+        self.signals = ComputeSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, done, total):
+        self.signals.progress.emit(self.job_id, done, total)
+
+    def run(self):
+        try:
+            shape, dtype = multiply_files(self.left_path, self.right_path, self.output_path, self.tile,
+                                          progress=self.report_progress, cancelled=self.is_cancelled)
+        except ComputeCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except EngineError as error:
+            self.signals.failed.emit(self.job_id, str(error))
+        except Exception as error:
+            self.signals.failed.emit(self.job_id, f"Computation failed: {error}")
+        else:
+            self.signals.finished.emit(self.job_id, (self.output_path, shape, dtype))
+
+
+#***********************************
+# Export job: streams a finished Product through an exporter, into a file or (path None)
+# into a string for the clipboard
+#***********************************
+class ExportJob(QRunnable):
+    def __init__(self, job_id, product, exporter, path=None):
+        super().__init__()
+        self.job_id = job_id
+        self.product = product
+        self.exporter = exporter
+        self.path = path
+        self.signals = ComputeSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, done, total):
+        self.signals.progress.emit(self.job_id, done, total)
+
+    # exports of cached products are cached with them
+    def clipboard_text(self):
+        cache = shared_cache() if self.product.key is not None else None
+        text = cache.rendering(self.product.key, self.exporter) if cache is not None else None
+        if text is None:
+            text = export_text(self.product, self.exporter, self.report_progress, self.is_cancelled)
+            if cache is not None:
+                cache.put_rendering(self.product.key, self.exporter, text)
+        return text
+
+    def run(self):
+        try:
+            if self.path is None:
+                result = self.clipboard_text()
+            else:
+                export_file(self.path, self.product, self.exporter, self.report_progress, self.is_cancelled)
+                result = self.path
+        except ComputeCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except EngineError as error:
+            self.signals.failed.emit(self.job_id, str(error))
+        except Exception as error:
+            self.signals.failed.emit(self.job_id, f"Export failed: {error}")
+        else:
+            self.signals.finished.emit(self.job_id, result)
+
+
+#***********************************
+# Sweep job: evaluates a symbolic result over arrays of parameter values into a .npy or CSV file
+#***********************************
+class SweepJob(QRunnable):
+    def __init__(self, job_id, product, texts, path):
+        super().__init__()
+        self.job_id = job_id
+        self.product = product
+        self.texts = texts
+        self.path = path
+        self.signals = ComputeSignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, done, total):
+        self.signals.progress.emit(self.job_id, done, total)
+
+    def run(self):
+        try:
+            sweeps = {name: parse_sweep(text) for name, text in self.texts.items()}
+            count, shape = write_sweep(self.path, self.product, sweeps, self.report_progress, self.is_cancelled)
+        except ComputeCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except EngineError as error:
+            self.signals.failed.emit(self.job_id, str(error))
+        except Exception as error:
+            self.signals.failed.emit(self.job_id, f"Evaluation failed: {error}")
+        else:
+            self.signals.finished.emit(self.job_id, (self.path, count, shape))
+
+
+#***********************************
+# Simplify job: simpler forms of the entries of a finished Product, one signal per entry that
+# improved, so the result grid fills in while the job runs; the job never touches the Product,
+# the GUI thread applies the forms
+#  - with CSE the temporaries are recomputed from the simplified entries at the end
+#***********************************
+class SimplifySignals(ComputeSignals):
+    simplified = pyqtSignal(int, int, int, object)     # job_id, row, column, simpler form
+
+
+class SimplifyJob(QRunnable):
+    def __init__(self, job_id, product, level):
+        super().__init__()
+        self.job_id = job_id
+        self.level = level
+        self.matrix = Matrix(product.matrix())      # snapshot, the GUI thread edits the Product
+        self.cse = product.cse is not None
+        self.signals = SimplifySignals()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        self._cancel_event.set()
+
+    def is_cancelled(self):
+        return self._cancel_event.is_set()
+
+    def report_progress(self, done, total):
+        self.signals.progress.emit(self.job_id, done, total)
+
+    def improved(self, i, j, form):
+        self.matrix[i, j] = form
+        self.signals.simplified.emit(self.job_id, i, j, form)
+
+    def run(self):
+        try:
+            counts = simplify_entries(symbolic_entries(self.matrix), self.level, self.improved,
+                                      progress=self.report_progress, cancelled=self.is_cancelled)
+            product_cse = matrix_cse(self.matrix) if self.cse and counts['simplified entries'] else None
+        except ComputeCancelled:
+            self.signals.cancelled.emit(self.job_id)
+        except EngineError as error:
+            self.signals.failed.emit(self.job_id, str(error))
+        except Exception as error:
+            self.signals.failed.emit(self.job_id, f"Simplification failed: {error}")
+        else:
+            self.signals.finished.emit(self.job_id, (counts, product_cse))
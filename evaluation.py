@@ -0,0 +1,154 @@
+import csv
+import os
+import numpy as np
+from sympy import lambdify, sympify
+from matrix_engine import ComputeCancelled, EngineError
+
+#***********************************
+# Parameter sweeps: a symbolic result is compiled once (lambdify with CSE, NumPy backend)
+# into a function of its free symbols and evaluated over whole arrays of parameter values
+#  - samples are evaluated in chunks, so sweeps of millions of values need no per-sample
+#    Python work and bounded temporaries
+#  - results stack to (N, rows, cols), written to .npy (memory-mapped) or CSV
+#***********************************
+
+SWEEP_CHUNK = 1 << 16
+
+
+class CompiledResult:
+    def __init__(self, matrix):
+        self.shape = tuple(matrix.shape)
+        self.symbols = sorted(matrix.free_symbols, key=lambda symbol: symbol.name)
+        self.names = [symbol.name for symbol in self.symbols]
+        # one function returning every entry, constants come back as scalars
+        self.function = lambdify(self.symbols, list(matrix), modules='numpy', cse=True)
+
+    def entries(self, values):
+        with np.errstate(all='ignore'):
+            return self.function(*values)
+
+    def result_dtype(self, values):
+        sample = self.entries([value[:1] for value in values])
+        return np.result_type(np.float64, *[np.asarray(entry) for entry in sample])
+
+    def evaluate_chunk(self, values, out):
+        count = out.shape[0]
+        for index, entry in enumerate(self.entries(values)):
+            out[:, index // self.shape[1], index % self.shape[1]] = np.broadcast_to(entry, (count,))
+
+
+# Compiled once per Product, every sweep over the same result reuses the function
+def compile_product(product):
+    if product._compiled is None:
+        product._compiled = CompiledResult(product.matrix())
+    return product._compiled
+
+
+#***********************************
+# Sweep values: 'start:stop:count' (linspace), 'a, b, c' (list) or a single value,
+# any entry may be an expression ('2*pi', 'sqrt(2)')
+#***********************************
+def parse_value(text):
+    try:
+        return float(sympify(text))
+    except (TypeError, ValueError, SyntaxError) as error:
+        raise EngineError(f"'{text}' is not a number") from error
+
+
+def parse_sweep(text):
+    text = text.strip()
+    if not text:
+        raise EngineError("Sweep values are empty")
+    if ':' in text:
+        parts = text.split(':')
+        if len(parts) != 3:
+            raise EngineError(f"Expected start:stop:count, got '{text}'")
+        try:
+            count = int(parts[2])
+        except ValueError as error:
+            raise EngineError(f"Sample count '{parts[2].strip()}' is not an integer") from error
+        if count < 1:
+            raise EngineError("Sample count must be positive")
+        return np.linspace(parse_value(parts[0]), parse_value(parts[1]), count)
+    if ',' in text:
+        return np.array([parse_value(part) for part in text.split(',') if part.strip()])
+    return np.array([parse_value(text)])
+
+
+def sweep_arrays(compiled, sweeps):
+    missing = [name for name in compiled.names if name not in sweeps]
+    if missing:
+        raise EngineError(f"No values for {', '.join(missing)}")
+    arrays = [np.asarray(sweeps[name], dtype=np.float64).ravel() for name in compiled.names]
+    lengths = {len(array) for array in arrays if len(array) != 1}
+    if len(lengths) > 1:
+        raise EngineError("Sweeps of several symbols must have the same number of samples")
+    count = lengths.pop() if lengths else 1
+    return [np.broadcast_to(array, (count,)) for array in arrays], count
+
+
+def evaluate_into(compiled, arrays, out, progress=None, cancelled=None):
+    count = out.shape[0]
+    for start in range(0, count, SWEEP_CHUNK):
+        if cancelled is not None and cancelled():
+            raise ComputeCancelled()
+        stop = min(start + SWEEP_CHUNK, count)
+        compiled.evaluate_chunk([array[start:stop] for array in arrays], out[start:stop])
+        if progress is not None:
+            progress(stop, count)
+    return out
+
+
+def evaluate_sweep(product, sweeps, progress=None, cancelled=None):
+    compiled = compile_product(product)
+    arrays, count = sweep_arrays(compiled, sweeps)
+    out = np.empty((count,) + compiled.shape, dtype=compiled.result_dtype(arrays))
+    return evaluate_into(compiled, arrays, out, progress, cancelled)
+
+
+#***********************************
+# Sweep files: .npy holds the (N, rows, cols) stack, CSV one line per sample with the
+# parameter values followed by the entries M_Res[i,j]
+#***********************************
+def write_sweep(path, product, sweeps, progress=None, cancelled=None):
+    compiled = compile_product(product)
+    arrays, count = sweep_arrays(compiled, sweeps)
+    dtype = compiled.result_dtype(arrays)
+    try:
+        if os.path.splitext(path)[1].lower() == '.npy':
+            out = np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=(count,) + compiled.shape)
+            try:
+                evaluate_into(compiled, arrays, out, progress, cancelled)
+                out.flush()
+            except BaseException:
+                del out
+                os.remove(path)
+                raise
+        else:
+            write_sweep_csv(path, compiled, arrays, count, dtype, progress, cancelled)
+    except OSError as error:
+        raise EngineError(f"Cannot write '{path}': {error.strerror or error}") from error
+    return count, compiled.shape
+
+
+def write_sweep_csv(path, compiled, arrays, count, dtype, progress, cancelled):
+    rows, cols = compiled.shape
+    chunk = np.empty((min(SWEEP_CHUNK, count), rows, cols), dtype=dtype)
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        try:
+            writer = csv.writer(file, lineterminator='\n')
+            writer.writerow(compiled.names + [f"M_Res[{i + 1},{j + 1}]" for i in range(rows) for j in range(cols)])
+            for start in range(0, count, SWEEP_CHUNK):
+                if cancelled is not None and cancelled():
+                    raise ComputeCancelled()
+                stop = min(start + SWEEP_CHUNK, count)
+                block = chunk[:stop - start]
+                compiled.evaluate_chunk([array[start:stop] for array in arrays], block)
+                columns = np.column_stack([array[start:stop] for array in arrays] + [block.reshape(stop - start, -1)])
+                writer.writerows(columns.tolist())
+                if progress is not None:
+                    progress(stop, count)
+        except BaseException:
+            file.close()
+            os.remove(path)
+            raise
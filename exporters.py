@@ -0,0 +1,258 @@
+import csv
+import io
+from sympy import julia_code, latex, octave_code
+from sympy.printing.str import StrPrinter
+from matrix_engine import ComputeCancelled, chain_text, operand_names
+
+#***********************************
+# Exporters: write a Product (operands and result) as MATLAB, LaTeX, NumPy/sympy Python,
+# Julia or CSV to any text file object
+#  - output is streamed row by row, nothing builds the whole document as one string
+#  - numeric entries are written as their text, expressions go through the target's printer
+#  - nothing runs at compute time: the GUI exports when the user copies or saves
+#***********************************
+
+PROGRESS_STEPS = 100    # progress reports per export at most
+
+
+class RowCounter:
+    def __init__(self, total, progress=None, cancelled=None):
+        self.total = max(1, total)
+        self.done = 0
+        self.progress = progress
+        self.cancelled = cancelled
+
+    def tick(self):
+        if self.cancelled is not None and self.cancelled():
+            raise ComputeCancelled()
+        self.done += 1
+        if self.progress is not None and self.done * PROGRESS_STEPS // self.total != (self.done - 1) * PROGRESS_STEPS // self.total:
+            self.progress(self.done, self.total)
+
+
+def expression(source, i, j):
+    # a Product with CSE applied shows its reduced entries
+    if getattr(source, 'cse', None) is not None:
+        return source.cse[1][i, j]
+    return source.matrix()[i, j]
+
+
+class Exporter:
+    name = None         # key in EXPORTERS
+    title = None        # file dialog filter label
+    extension = None
+    formulas = {}       # operation -> format of the operand names and the operation's arguments
+
+    def export(self, product, file, progress=None, cancelled=None):
+        total = sum(source.shape[0] for source in self.sources(product))
+        self.write(product, file, RowCounter(total, progress, cancelled))
+
+    # matrices the export writes out entry by entry
+    def sources(self, product):
+        return list(product.operands) + [product]
+
+    def write(self, product, file, counter):
+        raise NotImplementedError
+
+    def print_expression(self, expr):
+        return str(expr)
+
+    def rows(self, source, counter):
+        symbolic = not source.is_numeric
+        for i in range(source.shape[0]):
+            counter.tick()
+            yield [self.print_expression(expression(source, i, j)) if symbolic else source.text(i, j) for j in range(source.shape[1])]
+
+    def names(self, product):
+        return operand_names(len(product.operands))
+
+    def formula(self, product, names):
+        if product.operation is None:
+            return chain_text(product.order, names)
+        return self.formulas[product.operation[0]].format(*names, *product.operation[1:])
+
+
+class MatlabExporter(Exporter):
+    name, title, extension = 'matlab', "MATLAB", '.m'
+    formulas = {'power': '{0}^{1}', 'inverse': 'inv({0})', 'solve': '{0} \\ {1}', 'det': 'det({0})'}
+
+    def sources(self, product):
+        # without CSE the result is written as the product of the operands
+        return list(product.operands) + ([product] if product.cse is not None else [])
+
+    def print_expression(self, expr):
+        return octave_code(expr)
+
+    def write_matrix(self, file, name, source, counter):
+        file.write(f"{name} = [")
+        for i, row in enumerate(self.rows(source, counter)):
+            file.write(('; ' if i else '') + ', '.join(row))
+        file.write("];\n")
+
+    def write(self, product, file, counter):
+        names = self.names(product)
+        for name, operand in zip(names, product.operands):
+            self.write_matrix(file, name, operand, counter)
+        if product.cse is None:
+            file.write('M_Res = ' + self.formula(product, names) + ';\n')
+            return
+        for symbol, expr in product.cse[0]:
+            file.write(octave_code(expr, assign_to=symbol.name) + '\n')
+        self.write_matrix(file, 'M_Res', product, counter)
+
+
+class LatexExporter(Exporter):
+    name, title, extension = 'latex', "LaTeX", '.tex'
+
+    def print_expression(self, expr):
+        return latex(expr)
+
+    def write_matrix(self, file, source, counter):
+        # amsmath 'matrix' stops at 10 columns, wider matrices need an 'array'
+        environment = ('matrix', '') if source.shape[1] <= 10 else ('array', '{' + 'c' * source.shape[1] + '}')
+        file.write(f"\\left[\\begin{{{environment[0]}}}{environment[1]}")
+        for i, row in enumerate(self.rows(source, counter)):
+            file.write(('\\\\\n' if i else '') + ' & '.join(row))
+        file.write(f"\\end{{{environment[0]}}}\\right]")
+
+    def write(self, product, file, counter):
+        operation = product.operation or ('multiply',)
+        if operation[0] == 'det':
+            file.write('$\\det$')
+        for index, operand in enumerate(product.operands):
+            if index:
+                file.write('$^{-1}\\times$' if operation[0] == 'solve' else '$\\times$')
+            self.write_matrix(file, operand, counter)
+        if operation[0] == 'power':
+            file.write(f'$^{{{operation[1]}}}=$')
+        elif operation[0] == 'inverse':
+            file.write('$^{-1}=$')
+        else:
+            file.write('$=$')
+        self.write_matrix(file, product, counter)
+        if product.cse is not None and product.cse[0]:
+            file.write('$,\\quad ' + ',\\; '.join(f"{latex(symbol)} = {latex(expr)}" for symbol, expr in product.cse[0]) + '$')
+
+
+class ExactPrinter(StrPrinter):
+    # Rational(1, 2) rather than 1/2, which Python would turn into a float
+    def _print_Rational(self, expr):
+        if expr.q == 1:
+            return str(expr.p)
+        return f"Rational({expr.p}, {expr.q})"
+
+
+class PythonExporter(Exporter):
+    name, title, extension = 'python', "NumPy / sympy Python", '.py'
+    formulas = {'power': '{0}**{1}', 'inverse': '{0}.inv()', 'solve': '{0}.LUsolve({1})', 'det': '{0}.det()'}
+    numpy_formulas = {'power': 'np.linalg.matrix_power({0}, {1})', 'inverse': 'np.linalg.inv({0})',
+                      'solve': 'np.linalg.solve({0}, {1})', 'det': 'np.linalg.det({0})'}
+
+    def print_expression(self, expr):
+        return ExactPrinter().doprint(expr)
+
+    def write_matrix(self, file, name, source, counter, constructor):
+        file.write(f"{name} = {constructor}([\n")
+        for row in self.rows(source, counter):
+            file.write('    [' + ', '.join(row) + '],\n')
+        file.write("])\n")
+
+    def write(self, product, file, counter):
+        names = self.names(product)
+        symbolic = not product.is_numeric
+        if symbolic:
+            symbols = set().union(*(operand.matrix().free_symbols for operand in product.operands if not operand.is_numeric))
+            file.write("from sympy import *\n")
+            if symbols:
+                names_text = ' '.join(sorted(symbol.name for symbol in symbols))
+                file.write(f"{names_text.replace(' ', ', ')}{',' if len(symbols) == 1 else ''} = symbols('{names_text}')\n")
+        else:
+            file.write("import numpy as np\n")
+        constructor = 'Matrix' if symbolic else 'np.array'
+        for name, operand in zip(names, product.operands):
+            self.write_matrix(file, name, operand, counter, constructor)
+        if product.operation is not None and not symbolic:
+            chain = self.numpy_formulas[product.operation[0]].format(*names, *product.operation[1:])
+        else:
+            chain = self.formula(product, names)
+        file.write(f"# M_Res = {chain if symbolic or product.operation else chain.replace('*', '@')}\n")
+        for symbol, expr in product.cse[0] if product.cse is not None else []:
+            file.write(f"{symbol} = {self.print_expression(expr)}\n")
+        self.write_matrix(file, 'M_Res', product, counter, constructor)
+
+
+class JuliaExporter(Exporter):
+    name, title, extension = 'julia', "Julia", '.jl'
+    formulas = MatlabExporter.formulas
+
+    def print_expression(self, expr):
+        text = julia_code(expr)
+        # blanks separate the entries of a Julia matrix literal
+        return f'({text})' if ' ' in text else text
+
+    def write_matrix(self, file, name, source, counter):
+        file.write(f"{name} = [\n")
+        for row in self.rows(source, counter):
+            file.write('    ' + ' '.join(row) + '\n')
+        file.write("]\n")
+
+    def write(self, product, file, counter):
+        names = self.names(product)
+        symbols = set().union(*(operand.matrix().free_symbols for operand in product.operands if not operand.is_numeric))
+        if symbols:
+            file.write("using Symbolics\n@variables " + ' '.join(sorted(symbol.name for symbol in symbols)) + '\n')
+        for name, operand in zip(names, product.operands):
+            self.write_matrix(file, name, operand, counter)
+        file.write(f"# M_Res = {self.formula(product, names)}\n")
+        for symbol, expr in product.cse[0] if product.cse is not None else []:
+            file.write(f"{symbol} = {julia_code(expr)}\n")
+        self.write_matrix(file, 'M_Res', product, counter)
+
+
+class CsvExporter(Exporter):
+    name, title, extension = 'csv', "CSV", '.csv'
+    delimiter = ','
+
+    def sources(self, product):
+        return [product]
+
+    def write(self, product, file, counter):
+        writer = csv.writer(file, delimiter=self.delimiter, lineterminator='\n')
+        # CSV has nowhere to put CSE temporaries, so it always gets the full entries
+        if product.cse is not None:
+            for i in range(product.shape[0]):
+                counter.tick()
+                writer.writerow([str(product.value[i, j]) for j in range(product.shape[1])])
+            return
+        for row in self.rows(product, counter):
+            writer.writerow(row)
+
+
+class TsvExporter(CsvExporter):
+    name, title, extension = 'tsv', "TSV", '.tsv'
+    delimiter = '\t'
+
+
+EXPORTERS = {exporter.name: exporter for exporter in (MatlabExporter(), LatexExporter(), PythonExporter(),
+                                                       JuliaExporter(), CsvExporter(), TsvExporter())}
+
+
+def exporter_for_path(path, default=None):
+    for exporter in EXPORTERS.values():
+        if path.lower().endswith(exporter.extension):
+            return exporter
+    return EXPORTERS[default] if default is not None else None
+
+
+def export_text(product, name, progress=None, cancelled=None):
+    text = io.StringIO()
+    EXPORTERS[name].export(product, text, progress, cancelled)
+    return text.getvalue()
+
+
+def matlab_code(product):
+    return export_text(product, 'matlab')
+
+
+def latex_code(product):
+    return export_text(product, 'latex')
@@ -0,0 +1,60 @@
+import json
+import logging
+import time
+from contextlib import contextmanager
+
+#***********************************
+# Lightweight instrumentation: wall time per named phase plus operation counters,
+# reported as one JSON log line per computation (logger 'matrix_multiplicator.stats')
+#***********************************
+logger = logging.getLogger('matrix_multiplicator.stats')
+
+
+class PhaseStats:
+    def __init__(self):
+        self.phases = {}        # name -> seconds, in the order the phases first ran
+        self.counters = {}      # name -> number or short text (engine name, ...)
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - start
+
+    def count(self, name, amount=1):
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def set(self, name, value):
+        self.counters[name] = value
+
+    def total(self):
+        return sum(self.phases.values())
+
+    def as_dict(self):
+        return {
+            'phases_ms': {name: round(seconds * 1000, 3) for name, seconds in self.phases.items()},
+            'total_ms': round(self.total() * 1000, 3),
+            'counters': dict(self.counters),
+        }
+
+    def log(self, event, **fields):
+        if logger.isEnabledFor(logging.INFO):
+            logger.info(json.dumps({'event': event, **fields, **self.as_dict()}, ensure_ascii=False, default=str))
+
+    def phase_text(self):
+        return '   '.join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in self.phases.items())
+
+    def counter_text(self):
+        return '   '.join(f"{name}: {value}" for name, value in self.counters.items())
+
+
+# JSON lines on stderr, one object per line
+def enable_json_log(stream=None):
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    return handler
@@ -0,0 +1,464 @@
+import math
+import threading
+import warnings
+from collections import OrderedDict
+import numpy as np
+from sympy import Matrix, eye
+from sympy.polys.matrices import DomainMatrix
+from matrix_engine import (FLOAT_DTYPES, ComputeCancelled, EngineError, Operand, Product, as_operand, gamma, mpmath_context,
+                           multiply, numeric_arrays, numeric_fast_path, precision_setting, precision_unit)
+try:
+    from scipy import linalg
+except ImportError:
+    linalg = None
+
+#***********************************
+# Operations on a square operand: power, inverse, determinant and solve
+#  - M^n by repeated squaring, the squares M, M^2, M^4, ... are kept, so a higher power of the
+#    same operand only multiplies what is missing; negative powers are powers of the inverse
+#  - numeric operands are factorized once by LAPACK (getrf, in float32 or float64 like products)
+#    or by mpmath at the chosen digits
+#  - exact and symbolic operands get a fraction-free Bareiss LU (DomainMatrix.fflu), rationals with
+#    their denominators cleared first: the determinant is the last pivot, a solve is one forward and
+#    one backward substitution per right-hand side
+#  - factorizations are kept per operand content (Operand.key) and precision, new right-hand sides,
+#    the inverse, the determinant and higher powers of an operand reuse the earlier work
+#  - numeric results carry the precision and an error bound like products; for LU results it is
+#    the first order estimate gamma(3n) cond(A) |x| of partial pivoting (growth factor taken as 1),
+#    with cond(A) from LAPACK gecon, math.inf (no bound) when A is singular or too ill-conditioned
+#    at that precision
+#***********************************
+
+OPERATIONS = ('multiply', 'power', 'inverse', 'solve', 'det')
+OPERATION_TITLES = {'power': "Power", 'inverse': "Inverse", 'solve': "Solve", 'det': "Determinant"}
+FACTORIZATION_CACHE_SIZE = 16   # operands whose factorizations and squares are kept
+
+
+class SingularMatrix(EngineError):
+    pass
+
+
+def check_cancelled(cancelled):
+    if cancelled is not None and cancelled():
+        raise ComputeCancelled()
+
+
+#***********************************
+# LU factorizations: det() and solve() of a right-hand side Operand
+#***********************************
+class LapackLU:
+    def __init__(self, operand, precision):
+        self.dtype = FLOAT_DTYPES.get(precision[0], np.float64)
+        self.engine = 'lapack' if linalg is not None else 'numpy.linalg'
+        self.precision = np.dtype(self.dtype).name
+        self.A = operand.float_array(self.dtype)
+        if linalg is not None:
+            with warnings.catch_warnings():
+                # an exactly singular matrix is reported by its zero pivot, not by a warning
+                warnings.simplefilter('ignore', linalg.LinAlgWarning)
+                self.lu, self.pivots = linalg.lu_factor(self.A)
+            self.singular = not np.diag(self.lu).all()
+
+    def det(self):
+        if linalg is None:
+            return np.linalg.det(self.A)
+        swaps = np.count_nonzero(self.pivots != np.arange(len(self.pivots)))
+        return np.prod(np.diag(self.lu)) * (-1 if swaps % 2 else 1)
+
+    def solve(self, right, progress=None, cancelled=None):
+        B = right.float_array(self.dtype)
+        if linalg is None:
+            try:
+                return np.linalg.solve(self.A, B)
+            except np.linalg.LinAlgError as error:
+                raise SingularMatrix("Matrix is singular") from error
+        if self.singular:
+            raise SingularMatrix("Matrix is singular")
+        return linalg.lu_solve((self.lu, self.pivots), B)
+
+    # infinity norm condition number, estimated from the factors in O(n^2)
+    def condition(self):
+        with np.errstate(over='ignore', divide='ignore', invalid='ignore'):
+            if linalg is None:
+                condition = np.linalg.cond(self.A, np.inf)
+            elif self.singular:
+                return math.inf
+            else:
+                gecon = linalg.lapack.get_lapack_funcs('gecon', (self.lu,))
+                rcond, _ = gecon(self.lu, np.linalg.norm(self.A, np.inf), norm='I')
+                condition = 1 / rcond if rcond > 0 else math.inf
+        return float(condition) if np.isfinite(condition) else math.inf
+
+
+class MpmathLU:
+    engine = 'mpmath'
+
+    def __init__(self, operand, precision):
+        self.context = mpmath_context(precision[1])
+        self.precision = f'mpmath {precision[1]} digits'
+        try:
+            self.lu, self.pivots = self.context.LU_decomp(self.context.matrix(operand.mpf_rows(self.context)))
+            self.singular = False
+        except ZeroDivisionError:
+            # a pivot vanished at this many digits
+            self.singular = True
+
+    def det(self):
+        if self.singular:
+            return self.context.mpf(0)
+        swaps = sum(1 for j, pivot in enumerate(self.pivots) if pivot != j)
+        det = self.context.fprod(self.lu[i, i] for i in range(self.lu.rows))
+        return -det if swaps % 2 else det
+
+    def solve(self, right, progress=None, cancelled=None):
+        if self.singular:
+            raise SingularMatrix("Matrix is singular")
+        columns = list(zip(*right.mpf_rows(self.context)))
+        value = np.empty((self.lu.rows, len(columns)), dtype=object)
+        for j, column in enumerate(columns):
+            check_cancelled(cancelled)
+            x = self.context.U_solve(self.lu, self.context.L_solve(self.lu, self.context.matrix(column), self.pivots))
+            value[:, j] = [x[i] for i in range(self.lu.rows)]
+            if progress is not None:
+                progress(j + 1, len(columns))
+        return value
+
+
+class BareissLU:
+    engine = 'sympy.bareiss'
+    precision = None
+
+    def __init__(self, operand):
+        A = operand.domain_matrix()
+        self.denominator = None
+        if A.domain.is_QQ:
+            # A = A_int / denominator, Bareiss then stays in the integers
+            denominator, A = A.clear_denoms(convert=True)
+            self.denominator = denominator.element
+        self.domain = A.domain
+        self.size = A.shape[0]
+        P, self.L, self.D, self.U = A.fflu()
+        # P*A = L*D^-1*U, row i of P*A is row permutation[i] of A
+        self.permutation = [row.index(self.domain.one) for row in P.to_list()]
+        self.singular = not self.U[self.size - 1, self.size - 1].element
+
+    def sign(self):
+        seen, sign = set(), 1
+        for start in range(self.size):
+            length, i = 0, start
+            while i not in seen:
+                seen.add(i)
+                i = self.permutation[i]
+                length += 1
+            if length and length % 2 == 0:
+                sign = -sign
+        return sign
+
+    def det(self):
+        # the last Bareiss pivot is the determinant of P*A
+        det = self.sign() * self.domain.to_sympy(self.U[self.size - 1, self.size - 1].element)
+        if self.denominator is not None:
+            det = det / self.denominator**self.size
+        return det
+
+    def solve(self, right, progress=None, cancelled=None):
+        if self.singular:
+            raise SingularMatrix("Matrix is singular")
+        B = right.domain_matrix()
+        field = self.domain.unify(B.domain).get_field()
+        L, D, U = (M.convert_to(field).to_list() for M in (self.L, self.D, self.U))
+        rows = B.convert_to(field).to_list()
+        if self.denominator is not None:
+            scale = field.convert(int(self.denominator))
+            rows = [[scale * entry for entry in row] for row in rows]
+        n, total = self.size, 2 * self.size
+        # L*y = P*b forward, then U*x = D*y backward, all right-hand sides at once
+        y = []
+        for i in range(n):
+            check_cancelled(cancelled)
+            accumulated = rows[self.permutation[i]]
+            for j in range(i):
+                if L[i][j]:
+                    accumulated = [a - L[i][j] * b for a, b in zip(accumulated, y[j])]
+            y.append([a / L[i][i] for a in accumulated])
+            if progress is not None:
+                progress(i + 1, total)
+        x = [None] * n
+        for i in reversed(range(n)):
+            check_cancelled(cancelled)
+            accumulated = [D[i][i] * a for a in y[i]]
+            for j in range(i + 1, n):
+                if U[i][j]:
+                    accumulated = [a - U[i][j] * b for a, b in zip(accumulated, x[j])]
+            x[i] = [a / U[i][i] for a in accumulated]
+            if progress is not None:
+                progress(2 * n - i, total)
+        return DomainMatrix(x, (n, right.shape[1]), field).to_Matrix()
+
+
+#***********************************
+# Factorization: everything known about one operand at one precision
+#***********************************
+def factorization_path(operand, precision):
+    mode = precision[0]
+    if operand.is_numeric and mode == 'mpmath':
+        return 'mpmath'
+    if operand.is_numeric and (mode in FLOAT_DTYPES or operand.kind == 'float'):
+        return 'lapack'
+    return 'bareiss'
+
+
+class Factorization:
+    def __init__(self, operand, precision, path):
+        self.operand = operand
+        self.precision = precision
+        self.path = path
+        self.lock = threading.Lock()
+        self.squares = [(operand, None)]    # (Operand, Product) of M^(2^i)
+        self._lu = None
+        self._det = None
+        self._inverse = None
+        self._condition = None
+
+    def lu(self):
+        if self._lu is None:
+            if self.path == 'lapack':
+                self._lu = LapackLU(self.operand, self.precision)
+            elif self.path == 'mpmath':
+                self._lu = MpmathLU(self.operand, self.precision)
+            else:
+                self._lu = BareissLU(self.operand)
+        return self._lu
+
+    # cond(A) for the error bounds, mpmath factorizations take the float64 estimate
+    def condition(self):
+        if self._condition is None:
+            lu = self.lu()
+            if not isinstance(lu, LapackLU):
+                try:
+                    lu = LapackLU(self.operand, ('float64', None))
+                except EngineError:
+                    lu = None
+            self._condition = lu.condition() if lu is not None else math.inf
+        return self._condition
+
+    def square(self, index, cancelled=None):
+        while len(self.squares) <= index:
+            check_cancelled(cancelled)
+            previous = self.squares[-1][0]
+            product = multiply(previous, previous, cancelled=cancelled, precision=self.precision)
+            self.squares.append((Operand.from_product(product), product))
+        return self.squares[index]
+
+
+_factorizations = OrderedDict()
+_factorizations_lock = threading.Lock()
+
+
+def factorization(operand, precision, path=None):
+    path = path or factorization_path(operand, precision)
+    key = (operand.key(), precision, path)
+    with _factorizations_lock:
+        entry = _factorizations.get(key)
+        if entry is None:
+            entry = _factorizations[key] = Factorization(operand, precision, path)
+            while len(_factorizations) > FACTORIZATION_CACHE_SIZE:
+                _factorizations.popitem(last=False)
+        else:
+            _factorizations.move_to_end(key)
+    return entry
+
+
+def clear_factorizations():
+    with _factorizations_lock:
+        _factorizations.clear()
+
+
+#***********************************
+# Operations, each returns a fresh Product: cached products are never handed out, CSE and
+# simplification change the product they get
+#***********************************
+def copied_product(product, operands, operation):
+    value = product.value.copy() if product.is_numeric else Matrix(product.value)
+    copy = Product(operands[0], operands[-1], value, product.engine)
+    copy.precision, copy.error_bound = product.precision, product.error_bound
+    copy.operands = list(operands)
+    copy.operation = operation
+    return copy
+
+
+def operand_value(operand, precision):
+    mode, digits = precision
+    if operand.is_numeric and mode == 'mpmath':
+        return np.array(operand.mpf_rows(mpmath_context(digits)), dtype=object), 'mpmath'
+    if numeric_fast_path(operand, operand, mode):
+        return numeric_arrays(operand, operand, mode)[0].copy(), 'numpy'
+    return Matrix(operand.matrix()), 'sympy'
+
+
+def identity_value(operand, precision):
+    if not operand.is_numeric:
+        return eye(operand.shape[0]), 'sympy'
+    return operand_value(Operand.from_array(np.eye(operand.shape[0], dtype=np.int64)), precision)
+
+
+# (precision name, unit roundoff) of a numeric result at a precision
+def result_unit(value, precision):
+    if value.dtype.kind in 'iu':
+        return 'int64', 0.0
+    name, bits = precision_unit(precision)
+    return name, 2.0**-bits
+
+
+def largest_entry(value):
+    return float(np.abs(np.array(value, dtype=np.float64)).max()) if value.size else 0.0
+
+
+# A or the identity rounded to the precision: the operand's own error plus one rounding per entry
+def rounded_product(operand, value, engine, precision, exact=False):
+    product = Product(operand, operand, value, engine)
+    if product.is_numeric:
+        product.precision, unit = result_unit(value, precision)
+        if exact:
+            product.error_bound = 0.0
+        elif not unit or operand.kind == 'int' and operand.max_abs * unit < 1:
+            product.error_bound = operand.error
+        else:
+            product.error_bound = operand.error + unit * largest_entry(value)
+    return product
+
+
+# (first order relative error of an LU solve, estimate of |inv(A)|) for a numeric factorization
+def lu_error_terms(fact, unit):
+    condition = fact.condition()
+    if not math.isfinite(condition):
+        return math.inf, math.inf
+    relative = gamma(3 * fact.operand.shape[0], unit) * condition
+    if relative >= 1:
+        # not a single correct digit guaranteed, the first order estimate says nothing
+        return math.inf, math.inf
+    norm = float(np.abs(fact.operand.float_array(np.float64)).sum(axis=1).max())
+    return relative, condition / norm if norm else math.inf
+
+
+# |X - inv(A) B| per entry: the rounding of the solve plus the errors of A and B carried through inv(A)
+def solve_error_bound(fact, value, right, precision):
+    name, unit = result_unit(value, precision)
+    relative, inverse_norm = lu_error_terms(fact, unit)
+    if not math.isfinite(relative):
+        return name, math.inf
+    with np.errstate(over='ignore', invalid='ignore'):
+        size = largest_entry(value)
+        bound = relative * size
+        if fact.operand.error or right.error:
+            bound += inverse_norm * (fact.operand.shape[0] * fact.operand.error * size + right.error)
+    return name, float(bound) if np.isfinite(bound) else math.inf
+
+
+# |det computed - det A| from d det = det tr(inv(A) dA), dA the backward error of the LU and the error of A
+def det_error_bound(fact, det, precision):
+    name, bits = precision_unit(precision)
+    relative, inverse_norm = lu_error_terms(fact, 2.0**-bits)
+    if not math.isfinite(relative):
+        return name, math.inf
+    size = fact.operand.shape[0]
+    with np.errstate(over='ignore', invalid='ignore'):
+        bound = abs(float(det)) * size * (relative + inverse_norm * fact.operand.error)
+    return name, float(bound) if np.isfinite(bound) else math.inf
+
+
+def inverse_product(fact, progress=None, cancelled=None):
+    with fact.lock:
+        reused = fact._lu is not None or fact._inverse is not None
+        if fact._inverse is None:
+            lu = fact.lu()
+            identity = Operand.from_array(np.eye(fact.operand.shape[0], dtype=np.int64))
+            value = lu.solve(identity, progress, cancelled)
+            fact._inverse = Product(fact.operand, fact.operand, value, lu.engine)
+            fact._inverse.precision = lu.precision
+            if fact._inverse.is_numeric:
+                fact._inverse.precision, fact._inverse.error_bound = solve_error_bound(fact, value, identity, fact.precision)
+        return fact._inverse, reused
+
+
+def matrix_power(operand, exponent, precision, progress=None, cancelled=None):
+    if exponent < 0:
+        inverse, reused = inverse_product(factorization(operand, precision), cancelled=cancelled)
+        product, powers_reused = matrix_power(Operand.from_product(inverse), -exponent, precision, progress, cancelled)
+        return product, reused or powers_reused
+    if exponent == 0:
+        value, engine = identity_value(operand, precision)
+        return rounded_product(operand, value, engine, precision, exact=True), False
+    fact = factorization(operand, precision)
+    bits = [index for index in range(exponent.bit_length()) if exponent >> index & 1]
+    with fact.lock:
+        cached = len(fact.squares)
+        reused = cached > 1
+        total = max(0, exponent.bit_length() - cached) + len(bits) - 1
+        multiplied = 0
+        result = None
+        for index in bits:
+            square, square_product = fact.square(index, cancelled)
+            if result is None:
+                result = (square, square_product)
+            else:
+                product = multiply(result[0], square, cancelled=cancelled, precision=precision)
+                result = (Operand.from_product(product), product)
+                multiplied += 1
+            if progress is not None and total:
+                progress(len(fact.squares) - cached + multiplied, total)
+    if result[1] is None:
+        # M^1
+        value, engine = operand_value(operand, precision)
+        return rounded_product(operand, value, engine, precision), reused
+    return result[1], reused
+
+
+def apply_operation(operation, operands, progress=None, cancelled=None, precision=None):
+    name = operation[0]
+    if name not in OPERATION_TITLES:
+        raise EngineError(f"Unknown operation '{name}', choose from {', '.join(OPERATIONS)}")
+    operands = [as_operand(operand) for operand in operands]
+    precision = precision or precision_setting()
+    A = operands[0]
+    if A.shape[0] != A.shape[1]:
+        raise EngineError(f"{OPERATION_TITLES[name]} needs a square matrix, not {A.shape[0]}x{A.shape[1]}")
+    if name == 'power':
+        product, reused = matrix_power(A, operation[1], precision, progress, cancelled)
+        operands = [A]
+    elif name == 'inverse':
+        product, reused = inverse_product(factorization(A, precision), progress, cancelled)
+        operands = [A]
+    elif name == 'det':
+        fact = factorization(A, precision)
+        with fact.lock:
+            reused = fact._lu is not None
+            lu = fact.lu()
+            if fact._det is None:
+                fact._det = lu.det()
+        value = Matrix([[fact._det]]) if lu.engine == 'sympy.bareiss' else np.array([[fact._det]])
+        product = Product(A, A, value, lu.engine)
+        product.precision = lu.precision
+        if product.is_numeric:
+            product.precision, product.error_bound = det_error_bound(fact, fact._det, precision)
+        operands = [A]
+    else:
+        if len(operands) < 2:
+            raise EngineError("Solve needs a right-hand side matrix")
+        B = operands[1]
+        if B.shape[0] != A.shape[0]:
+            raise EngineError("Invalid Matrix Dimensions!")
+        # a symbolic right-hand side needs the exact factorization of a numeric matrix
+        path = None if B.is_numeric else 'bareiss'
+        fact = factorization(A, precision, path)
+        with fact.lock:
+            reused = fact._lu is not None
+            lu = fact.lu()
+        product = Product(A, B, lu.solve(B, progress, cancelled), lu.engine)
+        product.precision = lu.precision
+        if product.is_numeric:
+            product.precision, product.error_bound = solve_error_bound(fact, product.value, B, precision)
+        operands = [A, B]
+    result = copied_product(product, operands, operation)
+    result.reused_factorization = reused
+    return result
@@ -0,0 +1,241 @@
+import argparse
+import math
+import multiprocessing
+import sys
+from evaluation import parse_sweep, write_sweep
+from instrumentation import PhaseStats, enable_json_log
+from matrix_engine import (MULTIMODULAR_MIN_SIZE, OUT_OF_CORE_TILE, PRECISION_DIGITS, PRECISIONS, STRASSEN_CUTOFF, EngineError, apply_cse,
+                           configure_multimodular, configure_parallel, configure_precision, configure_strassen, multiply)
+from matrix_algebra import apply_operation
+from matrix_io import export_file, multiply_batch_files, multiply_files, read_operand, write_result
+from result_cache import cacheable, configure_cache, product_key, shared_cache
+from simplification import SIMPLIFY_ENTRY_BUDGET, SIMPLIFY_LEVELS, SIMPLIFY_TOTAL_BUDGET, simplify_product
+
+#***********************************
+# Command line batch mode: multiply matrices from files without starting Qt
+#
+#   python matrix_cli.py left.csv right.npy -o result.csv --matlab - --latex result.tex --julia result.jl
+#
+# Operands: .csv, .tsv, .npy, .mtx or MATLAB style '[a b; c d]' text ('-' reads stdin)
+#
+# Out-of-core: numeric .npy or raw binary operands larger than memory, multiplied tile by tile
+# into a memory-mapped result file
+#
+#   python matrix_cli.py left.npy right.bin --right-shape 50000,20000 --dtype float64 --out-of-core -o result.npy
+#
+# Batches: many independent small pairs, (N, m, k) and (N, k, n) .npy stacks or text files with one
+# matrix per line, a single matrix on either side applies to every pair; results stream out in order
+#
+#   python matrix_cli.py poses.npy transform.npy --batch -o moved.npy
+#   python matrix_cli.py rotations.txt points.txt --batch
+#
+# Operations: a power, the inverse or the determinant of the square left operand, or the left
+# operand solved for the right-hand sides in the right one
+#
+#   python matrix_cli.py rotation.txt --power 12 --matlab -
+#   python matrix_cli.py system.csv rhs.csv --solve -o x.csv
+#
+# Sweeps: a symbolic result evaluated over arrays of values of its symbols, stacked (N, rows, cols)
+#
+#   python matrix_cli.py rotation.txt right.txt --sweep "θ=0:2*pi:1000000" --sweep "α=2" --sweep-output sweep.npy
+#***********************************
+def parse_shape(text):
+    try:
+        rows, cols = (int(part) for part in text.lower().replace('x', ',').split(','))
+    except ValueError as error:
+        raise argparse.ArgumentTypeError(f"expected ROWS,COLS, got '{text}'") from error
+    return rows, cols
+
+
+def parse_sweep_argument(text):
+    name, separator, values = text.partition('=')
+    if not separator or not name.strip():
+        raise argparse.ArgumentTypeError(f"expected SYMBOL=VALUES, got '{text}'")
+    return name.strip(), values
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='matrix_cli', description="Multiply two matrices, or power, invert, solve or take the determinant of one, without the GUI.")
+    parser.add_argument('left', help="left operand file")
+    parser.add_argument('right', nargs='?', help="right operand file (right-hand sides with --solve, none with --power, --inverse or --det)")
+    parser.add_argument('-o', '--output', default='-', help="result file (.csv, .tsv, .npy, .mtx, otherwise MATLAB text), default stdout")
+    parser.add_argument('--matlab', metavar='FILE', help="write the MATLAB code to FILE ('-' for stdout)")
+    parser.add_argument('--latex', metavar='FILE', help="write the LaTeX code to FILE ('-' for stdout)")
+    parser.add_argument('--python', metavar='FILE', help="write NumPy (numeric) or sympy (symbolic) Python code to FILE ('-' for stdout)")
+    parser.add_argument('--julia', metavar='FILE', help="write the Julia code to FILE ('-' for stdout)")
+    parser.add_argument('--cse', action='store_true', help="factor common subexpressions of symbolic results into temporaries")
+    parser.add_argument('--precision', choices=PRECISIONS, default='auto',
+                        help="numeric products: auto (exact integers, float64 otherwise), float32, float64 or mpmath, default auto")
+    parser.add_argument('--digits', type=int, default=PRECISION_DIGITS, metavar='N',
+                        help=f"significant digits of --precision mpmath, default {PRECISION_DIGITS}")
+    parser.add_argument('--simplify', choices=SIMPLIFY_LEVELS, default='none', metavar='LEVEL',
+                        help=f"simplify symbolic entries before writing them: {', '.join(SIMPLIFY_LEVELS)}, default none")
+    parser.add_argument('--simplify-entry-budget', type=float, default=SIMPLIFY_ENTRY_BUDGET, metavar='SECONDS',
+                        help=f"time budget per entry, the best form found so far is kept, default {SIMPLIFY_ENTRY_BUDGET:g}")
+    parser.add_argument('--simplify-budget', type=float, default=SIMPLIFY_TOTAL_BUDGET, metavar='SECONDS',
+                        help=f"time budget for the whole result, later entries stay as computed, default {SIMPLIFY_TOTAL_BUDGET:g}")
+    parser.add_argument('--workers', type=int, metavar='N', help="worker processes for large symbolic products (1 = serial), default: all cores")
+    parser.add_argument('--parallel-threshold', type=int, metavar='TERMS', help="minimum number of a*b terms before a product is split over processes")
+    parser.add_argument('--strassen-cutoff', type=int, metavar='N',
+                        help=f"Strassen-Winograd recursion on heavy exact entries stops at N rows/cols (0 = off), default {STRASSEN_CUTOFF}")
+    parser.add_argument('--multimodular-min-size', type=int, metavar='N',
+                        help=f"integer products beyond int64 of at least N rows/cols go modulo primes through BLAS (0 = off), default {MULTIMODULAR_MIN_SIZE}")
+    parser.add_argument('--engine', action='store_true', help="report the engine used on stderr")
+    parser.add_argument('--cache', metavar='FILE', help="result cache file, default in the user's cache directory")
+    parser.add_argument('--no-cache', action='store_true', help="neither look up nor store symbolic results in the result cache")
+    parser.add_argument('--stats', action='store_true', help="log per-phase timings and counters as a JSON line on stderr")
+    operations = parser.add_argument_group('operations').add_mutually_exclusive_group()
+    operations.add_argument('--power', type=int, metavar='N', help="N-th power of the left operand, negative N powers the inverse")
+    operations.add_argument('--inverse', action='store_true', help="inverse of the left operand")
+    operations.add_argument('--solve', action='store_true', help="solve left * X = right")
+    operations.add_argument('--det', action='store_true', help="determinant of the left operand")
+    batch = parser.add_argument_group('batches')
+    batch.add_argument('--batch', action='store_true', help="operands are stacks of matrices multiplied pair by pair, -o .npy (numeric stacks) or text")
+    sweep = parser.add_argument_group('sweeps')
+    sweep.add_argument('--sweep', type=parse_sweep_argument, action='append', metavar='SYMBOL=VALUES',
+                       help="values of a symbol of the result: start:stop:count, a,b,c or one value (repeat per symbol)")
+    sweep.add_argument('--sweep-output', metavar='FILE', help="evaluated sweep as .npy stack (N, rows, cols) or CSV")
+    out_of_core = parser.add_argument_group('out-of-core')
+    out_of_core.add_argument('--out-of-core', action='store_true', help="multiply memory-mapped numeric operands tile by tile, -o must be a .npy or raw binary file")
+    out_of_core.add_argument('--tile', type=int, default=OUT_OF_CORE_TILE, metavar='N', help=f"tile edge length, default {OUT_OF_CORE_TILE}")
+    out_of_core.add_argument('--dtype', help="element type of raw binary operands, e.g. float64")
+    out_of_core.add_argument('--left-shape', type=parse_shape, metavar='ROWS,COLS', help="shape of a raw binary left operand")
+    out_of_core.add_argument('--right-shape', type=parse_shape, metavar='ROWS,COLS', help="shape of a raw binary right operand")
+    return parser
+
+
+def requested_operation(args):
+    if args.power is not None:
+        return ('power', args.power)
+    for name in ('inverse', 'solve', 'det'):
+        if getattr(args, name):
+            return (name,)
+    return None
+
+
+def report_tiles(done, total):
+    print(f"\rmatrix_cli: tile {done}/{total}", end='\n' if done == total else '', file=sys.stderr, flush=True)
+
+
+def main_out_of_core(args):
+    if args.output == '-' or args.matlab or args.latex or args.python or args.julia or args.cse or args.simplify != 'none':
+        print("matrix_cli: --out-of-core writes only the result, -o must name a file", file=sys.stderr)
+        return 1
+    try:
+        shape, dtype = multiply_files(args.left, args.right, args.output, args.tile, args.dtype, args.left_shape, args.right_shape,
+                                      progress=report_tiles)
+    except EngineError as error:
+        print(f"matrix_cli: {error}", file=sys.stderr)
+        return 1
+    if args.engine:
+        print(f"engine: out-of-core numpy, {shape[0]}x{shape[1]} {dtype}", file=sys.stderr)
+    return 0
+
+
+def main_batch(args):
+    if args.matlab or args.latex or args.python or args.julia or args.cse or args.sweep or args.out_of_core or args.simplify != 'none':
+        print("matrix_cli: --batch writes only the results, one matrix per line or a .npy stack", file=sys.stderr)
+        return 1
+    configure_parallel(args.workers, args.parallel_threshold)
+    try:
+        count = multiply_batch_files(args.left, args.right, args.output)
+    except EngineError as error:
+        print(f"matrix_cli: {error}", file=sys.stderr)
+        return 1
+    if args.engine:
+        print(f"engine: batch, {count} products", file=sys.stderr)
+    return 0
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if bool(args.sweep) != bool(args.sweep_output):
+        parser.error("--sweep and --sweep-output go together")
+    operation = requested_operation(args)
+    if operation is not None and (args.batch or args.out_of_core):
+        parser.error("--power, --inverse, --solve and --det do not combine with --batch or --out-of-core")
+    if args.right is None and (operation is None or operation[0] == 'solve'):
+        parser.error("the right operand is missing")
+    if args.right is not None and operation is not None and operation[0] != 'solve':
+        parser.error(f"--{operation[0]} takes only the left operand")
+    if args.batch:
+        return main_batch(args)
+    if args.out_of_core:
+        return main_out_of_core(args)
+    configure_parallel(args.workers, args.parallel_threshold)
+    configure_strassen(args.strassen_cutoff)
+    configure_multimodular(args.multimodular_min_size)
+    configure_precision(args.precision, args.digits)
+    if args.cache or args.no_cache:
+        configure_cache(args.cache, enabled=not args.no_cache)
+    stats = PhaseStats()
+    if args.stats:
+        enable_json_log(sys.stderr)
+    try:
+        with stats.phase('read'):
+            operands = [read_operand(path) for path in (args.left, args.right) if path is not None]
+        cache = shared_cache() if cacheable(operands) else None
+        product = None
+        if cache is not None:
+            with stats.phase('cache'):
+                key = product_key(operands, args.cse, operation)
+                product = cache.get(key, operands)
+            stats.set('result cache', 'hit' if product is not None else 'miss')
+        if product is None:
+            if operation is not None:
+                with stats.phase(operation[0]):
+                    product = apply_operation(operation, operands)
+            else:
+                with stats.phase('multiply'):
+                    product = multiply(*operands)
+            if args.cse:
+                with stats.phase('cse'):
+                    apply_cse(product)
+            if cache is not None:
+                with stats.phase('cache'):
+                    cache.put(key, product)
+        if args.simplify != 'none':
+            with stats.phase('simplify'):
+                counts = simplify_product(product, args.simplify, args.simplify_entry_budget, args.simplify_budget)
+            for name, count in counts.items():
+                stats.set(name, count)
+        with stats.phase('write'):
+            write_result(args.output, product)
+        for name in ('matlab', 'latex', 'python', 'julia'):
+            if getattr(args, name):
+                with stats.phase(name):
+                    export_file(getattr(args, name), product, name)
+        if args.sweep:
+            with stats.phase('sweep'):
+                sweeps = {name: parse_sweep(values) for name, values in args.sweep}
+                count, _ = write_sweep(args.sweep_output, product, sweeps)
+            stats.set('samples', count)
+    except EngineError as error:
+        print(f"matrix_cli: {error}", file=sys.stderr)
+        return 1
+    if operation is not None:
+        stats.set('operation', ' '.join(str(part) for part in operation))
+    stats.set('engine', product.engine)
+    stats.set('result cells', product.shape[0] * product.shape[1])
+    if product.precision is not None:
+        stats.set('precision', product.precision)
+    if product.error_bound is not None:
+        stats.set('error bound', product.error_bound if math.isfinite(product.error_bound) else 'none')
+    if product.processes > 1:
+        stats.set('processes', product.processes)
+    stats.log('compute', left=args.left, right=args.right)
+    if args.engine:
+        processes = f" ({product.processes} processes)" if product.processes > 1 else ''
+        bound = f", {product.precision}, |error| <= {product.error_bound:.3g}" if product.error_bound is not None else ''
+        if product.error_bound is None and product.precision is not None:
+            bound = f", {product.precision}"
+        elif product.error_bound is not None and not math.isfinite(product.error_bound):
+            bound = f", {product.precision}, no error bound"
+        print(f"engine: {product.engine}{processes}{bound}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
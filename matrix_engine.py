@@ -0,0 +1,1349 @@
+import hashlib
+import math
+import multiprocessing
+import os
+import re
+import threading
+from concurrent.futures import FIRST_COMPLETED, CancelledError, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+import mpmath
+import numpy as np
+from sympy import QQ, ZZ, Add, Matrix, S, SparseMatrix, SympifyError, cse, numbered_symbols, prevprime, sympify
+from sympy.polys.matrices import DomainMatrix
+try:
+    from scipy import sparse
+except ImportError:
+    sparse = None
+
+#***********************************
+# Headless compute engine
+#  - no Qt imports, operands are plain 2-D inputs (lists of rows or arrays)
+#  - purely numeric operands are multiplied with NumPy '@' (BLAS) in float32 or float64, or with
+#    mpmath at a chosen number of digits, each product with a bound on its rounding error
+#  - exact operands (integers, fractions, polynomials in symbols) are multiplied as DomainMatrix,
+#    recursively by Strassen-Winograd when their entries are expensive to multiply, integers beyond
+#    int64 modulo word-size primes with BLAS and rebuilt by the Chinese Remainder Theorem
+#  - everything else goes through sympy expressions
+#  - large symbolic products are split into result tiles and farmed out to worker processes
+#  - numeric operands larger than memory are multiplied tile by tile (e.g. between np.memmap files)
+#  - batches of many small independent pairs share one matmul or one parse/multiply pipeline
+#***********************************
+
+INT_PATTERN = re.compile(r'^[+-]?\d+$')
+FLOAT_PATTERN = re.compile(r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$')
+OPERATOR_BLANKS = re.compile(r'\s*([^\w\s])\s*')
+INT64_MAX = 2**63 - 1
+PARSE_CACHE_SIZE = 1 << 16
+
+# Sparse path: symbolic products only ever form the nonzero a*b terms (reported as
+# 'sympy.sparse' at or below SYMBOLIC_SPARSE_DENSITY), numeric ones go to scipy.sparse
+# once both operands are sparse and big enough for CSR to beat dense BLAS
+SYMBOLIC_SPARSE_DENSITY = 0.5
+NUMERIC_SPARSE_DENSITY = 0.02
+NUMERIC_SPARSE_MIN_SIZE = 512
+NUMERIC_ENGINES = ('numpy', 'scipy.sparse', 'mpmath', 'lapack', 'numpy.linalg')
+EXACT_ENGINES = ('sympy.domain', 'sympy.strassen', 'multimodular')
+
+# Numeric precision of products of numeric operands (configure_precision):
+#  - 'auto': integers stay exact (int64 when the result fits, else ZZ), anything with a float is float64
+#  - 'float32' / 'float64': every numeric operand, integers included, rounded to that type, one BLAS call
+#  - 'mpmath': entries rounded to PRECISION_DIGITS significant digits, every result entry an exact
+#    fixed-point dot product rounded once
+PRECISIONS = ('auto', 'float32', 'float64', 'mpmath')
+PRECISION = 'auto'
+PRECISION_DIGITS = 50
+FLOAT_DTYPES = {'float32': np.float32, 'float64': np.float64}
+
+# Exact path: rows of the left DomainMatrix multiplied per block, so progress and cancel still work
+DOMAIN_BLOCK_ROWS = 32
+
+# Strassen-Winograd: 7 half-size products and 15 additions instead of 8 products, recursing until a
+# dimension is at most STRASSEN_CUTOFF (0 = never). It pays only when an entry product costs far more
+# than a sum: integers of STRASSEN_MIN_BITS and more, or polynomials sharing their monomials (at most
+# STRASSEN_MAX_SPREAD times as many distinct monomials in an operand as terms per entry)
+STRASSEN_CUTOFF = 16
+STRASSEN_MIN_BITS = 256
+STRASSEN_MAX_SPREAD = 2
+
+# Multi-modular path: dense integer (or denominator-cleared rational) products of at least
+# MULTIMODULAR_MIN_SIZE rows/columns (0 = never) are computed modulo primes and rebuilt by CRT,
+# MULTIMODULAR_BLOCK result entries at a time. Entries of more than MULTIMODULAR_MAX_BITS bits
+# keep the DomainMatrix product, the float64 sums of the residues would no longer be exact
+MULTIMODULAR_MIN_SIZE = 24
+MULTIMODULAR_MAX_BITS = 1 << 20
+MULTIMODULAR_BLOCK = 4096
+
+# Process pool: symbolic products with at least PARALLEL_MIN_TERMS nonzero a*b terms are tiled
+# over PARALLEL_WORKERS processes (1 = always serial), about PARALLEL_TILES_PER_WORKER tiles each
+PARALLEL_WORKERS = os.cpu_count() or 1
+PARALLEL_MIN_TERMS = 50000
+PARALLEL_TILES_PER_WORKER = 4
+
+# Out-of-core path: tile x tile blocks, at most three of them (left, right, sum) live in memory
+OUT_OF_CORE_TILE = 1024
+
+# Batches: independent pairs go through the pipeline BATCH_CHUNK pairs at a time, a numeric
+# chunk as one broadcasted np.matmul, a symbolic one serially or over the process pool
+BATCH_CHUNK = 4096
+
+
+class EngineError(ValueError):
+    pass
+
+
+class ComputeCancelled(Exception):
+    pass
+
+
+#***********************************
+# Entry classification
+#***********************************
+def classify_text(text):
+    if INT_PATTERN.match(text):
+        return 'int'
+    if FLOAT_PATTERN.match(text):
+        return 'float'
+    return 'symbolic'
+
+
+# Memoized: unchanged cell text is never parsed twice
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_entry(text):
+    try:
+        return sympify(text)
+    except (SympifyError, SyntaxError, TypeError) as error:
+        raise EngineError(f"Invalid entry '{text}'") from error
+
+
+def canonical_text(text):
+    return OPERATOR_BLANKS.sub(r'\1', ' '.join(text.split()))
+
+
+def is_zero_text(text):
+    return classify_text(text) != 'symbolic' and float(text) == 0
+
+
+def merge_kinds(kinds):
+    if 'symbolic' in kinds:
+        return 'symbolic'
+    if 'float' in kinds:
+        return 'float'
+    return 'int'
+
+
+def format_number(value):
+    if isinstance(value, (int, np.integer)):
+        return str(int(value))
+    if isinstance(value, np.float32):
+        # shortest text that reads back as the same float32, not the float64 digits of its value
+        return str(value)
+    if isinstance(value, (float, np.floating)):
+        return repr(float(value))
+    # mpmath mpf, at the digits of its context
+    return str(value)
+
+
+#***********************************
+# Operand: a validated 2-D input, kept as text, array or sympy Matrix and converted on demand
+#***********************************
+class Operand:
+    def __init__(self, rows):
+        rows = [[str(entry).strip() for entry in row] for row in rows]
+        if not rows or not rows[0]:
+            raise EngineError("Empty Matrix")
+        cols = len(rows[0])
+        if any(len(row) != cols for row in rows):
+            raise EngineError("Matrix rows differ in length")
+        if any(entry == '' for row in rows for entry in row):
+            raise EngineError("Matrix contains empty entries")
+
+        self._init_blank((len(rows), cols), merge_kinds({classify_text(entry) for row in rows for entry in row}))
+        self.rows = rows
+        if self.kind == 'int':
+            self.max_abs = max(abs(int(entry)) for row in rows for entry in row)
+
+    def _init_blank(self, shape, kind):
+        self.rows = None
+        self.shape = tuple(shape)
+        self.kind = kind
+        self.max_abs = None
+        self._array = None
+        self._matrix = None
+        self._nonzero = None
+        self._domain = None
+        self._mpf = None    # entries as mpmath numbers, kept from an mpmath product
+        self._key = None
+        self.error = 0.0    # bound on the absolute error of the entries, for results of rounded products
+
+    @classmethod
+    def from_array(cls, array):
+        array = np.asarray(array)
+        if array.ndim != 2 or 0 in array.shape:
+            raise EngineError("Operand must be a non-empty 2-D array")
+        operand = cls.__new__(cls)
+        if np.issubdtype(array.dtype, np.integer) or array.dtype == np.bool_:
+            operand._init_blank(array.shape, 'int')
+            operand._array = array.astype(np.int64)
+            operand.max_abs = int(np.abs(operand._array).max())
+        elif np.issubdtype(array.dtype, np.floating):
+            operand._init_blank(array.shape, 'float')
+            operand._array = array.astype(np.float64)
+        else:
+            return cls(array.tolist())
+        return operand
+
+    @classmethod
+    def from_matrix(cls, matrix):
+        entries = list(matrix)
+        if all(entry.is_Integer for entry in entries):
+            kind = 'int'
+        elif all(entry.is_Integer or entry.is_Float for entry in entries):
+            kind = 'float'
+        else:
+            kind = 'symbolic'
+        operand = cls.__new__(cls)
+        operand._init_blank(matrix.shape, kind)
+        operand._matrix = Matrix(matrix)
+        if kind == 'int':
+            operand.max_abs = max(abs(int(entry)) for entry in entries)
+        return operand
+
+    @classmethod
+    def from_product(cls, product):
+        if product.engine == 'mpmath':
+            # the texts are rounded to the digits, the next product starts from the entries themselves
+            operand = cls(product.texts())
+            operand._mpf = product.value.tolist()
+        elif product.is_numeric:
+            operand = cls.from_array(product.value)
+        else:
+            return cls.from_matrix(product.value)
+        operand.error = product.error_bound or 0.0
+        return operand
+
+    @property
+    def is_numeric(self):
+        return self.kind in ('int', 'float')
+
+    def text(self, i, j):
+        if self.rows is not None:
+            return self.rows[i][j]
+        if self._array is not None:
+            return format_number(self._array[i, j])
+        return str(self._matrix[i, j])
+
+    def array(self):
+        if self._array is None:
+            if not self.is_numeric:
+                raise EngineError("Symbolic operand has no numeric array")
+            if self.kind == 'int' and self.max_abs > INT64_MAX:
+                raise EngineError("Integer entries exceed 64 bit")
+            dtype = np.int64 if self.kind == 'int' else np.float64
+            source = self.rows if self.rows is not None else self._matrix.tolist()
+            self._array = np.array([[int(e) if dtype is np.int64 else float(e) for e in row] for row in source], dtype=dtype)
+        return self._array
+
+    # Entries rounded to a float type, integers beyond int64 included
+    def float_array(self, dtype):
+        if self.kind == 'float' or self.max_abs <= INT64_MAX:
+            return self.array().astype(dtype, copy=False)
+        source = self.rows if self.rows is not None else self._matrix.tolist()
+        try:
+            return np.array([[float(int(entry)) for entry in row] for row in source], dtype=dtype)
+        except OverflowError as error:
+            raise EngineError("Integer entries exceed the float range") from error
+
+    # Entries rounded to an mpmath context, decimal texts from all their digits rather than via float64
+    def mpf_rows(self, context):
+        if self._mpf is not None and self._mpf[0][0].context is context:
+            return self._mpf
+        if self.rows is not None:
+            source = self.rows
+        elif self._array is not None:
+            source = self._array.tolist()
+        else:
+            source = [[str(entry) if entry.is_Float else int(entry) for entry in row] for row in self._matrix.tolist()]
+        return [[context.mpf(entry) for entry in row] for row in source]
+
+    def nonzero(self):
+        if self._nonzero is None:
+            # a parsed array answers without looking at the texts again
+            if self._array is not None:
+                self._nonzero = self._array != 0
+            elif self.rows is not None:
+                self._nonzero = np.array([[not is_zero_text(entry) for entry in row] for row in self.rows], dtype=bool)
+            else:
+                self._nonzero = np.array([[not (entry.is_Number and entry == 0) for entry in row] for row in self._matrix.tolist()], dtype=bool)
+        return self._nonzero
+
+    def density(self):
+        return float(self.nonzero().mean())
+
+    # Parses the entries into the form the engine multiplies (array or Matrix) ahead of time
+    def prepare(self):
+        if self.is_numeric and (self.kind == 'float' or self.max_abs <= INT64_MAX):
+            self.array()
+        else:
+            self.matrix()
+        return self
+
+    def matrix(self):
+        if self._matrix is None:
+            if self.is_numeric and (self.kind == 'float' or self.max_abs <= INT64_MAX):
+                self._matrix = Matrix(self.array().tolist())
+            else:
+                self._matrix = Matrix([[parse_entry(entry) for entry in row] for row in self.rows])
+        return self._matrix
+
+    # DomainMatrix over the tightest domain sympy infers for the entries (ZZ, QQ, ZZ[x], ..., EX)
+    def domain_matrix(self):
+        if self._domain is None:
+            self._domain = DomainMatrix.from_Matrix(self.matrix())
+        return self._domain
+
+    # Content key: equal entries and shape give equal keys, used to cache work per operand
+    # and results across sessions. Blanks around operators do not count ('a + b' == 'a+b')
+    def key(self):
+        if self._key is None:
+            digest = hashlib.sha1(f"{self.shape}{self.kind}".encode())
+            if self.rows is None and self._array is not None:
+                digest.update(np.ascontiguousarray(self._array).tobytes())
+            else:
+                for i in range(self.shape[0]):
+                    digest.update('\x1f'.join(canonical_text(self.text(i, j)) for j in range(self.shape[1])).encode() + b'\x1e')
+            self._key = digest.hexdigest()
+        return self._key
+
+
+def as_operand(value):
+    if isinstance(value, Operand):
+        return value
+    if isinstance(value, np.ndarray):
+        return Operand.from_array(value)
+    return Operand(value)
+
+
+#***********************************
+# Product: result of a multiplication plus the operands it came from
+#***********************************
+class Product:
+    def __init__(self, left, right, value, engine):
+        self.left = left
+        self.right = right
+        self.value = value
+        self.engine = engine
+        self.operands = [left, right]
+        self.order = (0, 1)     # evaluation order over self.operands, nested pairs of indices
+        self.operation = None   # matrix_algebra: ('power', n), ('inverse',), ('solve',) or ('det',) of the operands
+        self.reused_factorization = False
+        self.cse = None         # (temporaries, reduced Matrix) once apply_cse() ran
+        self.changed = None     # None: every entry is new, else (rows, cols) that were recomputed
+        self.base_version = None
+        self.version = None
+        self.processes = 1      # worker processes the product was tiled over
+        self.key = None         # result cache key, when the product went through the cache
+        self.precision = None   # numeric products: 'int64', 'float32', 'float64' or 'mpmath N digits'
+        self.error_bound = None     # numeric products: bound on |computed - exact| of every entry
+        self._matrix = None
+        self._texts = None
+        self._compiled = None   # evaluation.CompiledResult, built on the first sweep
+
+    @property
+    def shape(self):
+        return tuple(self.value.shape)
+
+    @property
+    def is_numeric(self):
+        return self.engine in NUMERIC_ENGINES
+
+    def text(self, i, j):
+        if self.is_numeric:
+            return format_number(self.value[i, j])
+        if self.cse is not None:
+            return str(self.cse[1][i, j])
+        return str(self.value[i, j])
+
+    def temporaries_text(self):
+        if self.cse is None:
+            return ''
+        return '\n'.join(f"{symbol} = {expr}" for symbol, expr in self.cse[0])
+
+    def texts(self):
+        if self._texts is None:
+            self._texts = [[self.text(i, j) for j in range(self.shape[1])] for i in range(self.shape[0])]
+        return self._texts
+
+    def set_cse(self, cse):
+        self.cse = cse
+        self.changed = None     # every displayed entry may now read differently
+        self._texts = None
+
+    # Replaces one entry by an equal, simpler form; with CSE the displayed texts stay until apply_cse() reruns
+    def set_entry(self, i, j, expr):
+        self.value[i, j] = expr
+        if self._texts is not None and self.cse is None:
+            self._texts[i][j] = str(expr)
+        self._compiled = None
+        self.key = None     # cached renderings show the old entries
+
+    def matrix(self):
+        if self._matrix is None:
+            self._matrix = self.value if not self.is_numeric else Matrix(self.value.tolist())
+        return self._matrix
+
+
+#***********************************
+# Engine selection and multiplication
+#***********************************
+def numeric_fast_path(left, right, mode='auto'):
+    if not (left.is_numeric and right.is_numeric):
+        return False
+    if mode in FLOAT_DTYPES:
+        return True
+    if left.kind == 'int' and right.kind == 'int':
+        # int64 matmul wraps silently, so only take it when the result provably fits
+        return left.max_abs * right.max_abs * left.shape[1] <= INT64_MAX
+    return True
+
+
+def select_engine(left, right, precision=None):
+    mode, _ = precision or precision_setting()
+    if mode == 'mpmath' and left.is_numeric and right.is_numeric:
+        return 'mpmath'
+    if numeric_fast_path(left, right, mode):
+        if (sparse is not None and min(left.shape + right.shape) >= NUMERIC_SPARSE_MIN_SIZE
+                and max(left.density(), right.density()) <= NUMERIC_SPARSE_DENSITY):
+            return 'scipy.sparse'
+        return 'numpy'
+    if min(left.density(), right.density()) <= SYMBOLIC_SPARSE_DENSITY:
+        return 'sympy.sparse'
+    return 'sympy'
+
+
+def numeric_sparse_product(L, R):
+    return (sparse.csr_matrix(L) @ sparse.csr_matrix(R)).toarray()
+
+
+def symbolic_product(left, right, progress=None, cancelled=None):
+    # Dictionary of keys product, row by row so it can report progress and be cancelled.
+    # Only nonzero a*b are ever formed and unit factors are dropped.
+    M_L, M_R = left.matrix(), right.matrix()
+    right_nonzero = right.nonzero()
+    right_rows = [[(j, M_R[k, j]) for j in np.flatnonzero(right_nonzero[k])] for k in range(M_R.shape[0])]
+    left_nonzero = left.nonzero()
+    entries = {}
+    for i in range(M_L.shape[0]):
+        if cancelled is not None and cancelled():
+            raise ComputeCancelled()
+        terms = {}
+        for k in np.flatnonzero(left_nonzero[i]):
+            a = M_L[i, k]
+            for j, b in right_rows[k]:
+                terms.setdefault(j, []).append(b if a is S.One else a if b is S.One else a * b)
+        for j, row_terms in terms.items():
+            entries[i, int(j)] = Add(*row_terms)
+        if progress is not None:
+            progress(i + 1, M_L.shape[0])
+    return Matrix(SparseMatrix(M_L.shape[0], M_R.shape[1], entries))
+
+
+#***********************************
+# Numeric precision: float32/float64 through BLAS or mpmath at a number of digits, and an
+# a-priori bound on the rounding error (Higham, Accuracy and Stability of Numerical Algorithms, 3.5)
+#  - an entry is a length-k dot product of inputs rounded once each: |error| <= gamma(k+2) (|A||B|)_ij
+#  - |A||B| is bounded through Cauchy-Schwarz by the largest row norm of A times the largest column
+#    norm of B, O(n^2) next to the O(n^3) product
+#  - mpmath dot products are exact, only the inputs and the result are rounded
+#  - operands that are results of rounded products carry their bound into the next product
+#***********************************
+def configure_precision(precision=None, digits=None):
+    global PRECISION, PRECISION_DIGITS
+    if precision is not None:
+        if precision not in PRECISIONS:
+            raise EngineError(f"Unknown precision '{precision}', choose from {', '.join(PRECISIONS)}")
+        PRECISION = precision
+    if digits is not None:
+        PRECISION_DIGITS = max(1, int(digits))
+
+
+# Read once per product, so a product is computed at one precision even if it changes meanwhile
+def precision_setting():
+    return PRECISION, PRECISION_DIGITS
+
+
+@lru_cache(maxsize=None)
+def mpmath_context(digits):
+    # a context of its own: the global mpmath.mp is shared with sympy and other threads
+    context = mpmath.MPContext()
+    context.dps = digits
+    return context
+
+
+def numeric_arrays(left, right, mode):
+    dtype = FLOAT_DTYPES.get(mode)
+    if dtype is None:
+        return left.array(), right.array()
+    return left.float_array(dtype), right.float_array(dtype)
+
+
+def fixed_point(rows):
+    # every row as integers times one power of two, exactly: rows[i] == ints[i] * 2**exponents[i]
+    ints, exponents = [], []
+    for row in rows:
+        parts = [entry.man_exp for entry in row]
+        exponent = min((exp for man, exp in parts if man), default=0)
+        ints.append([((-man if entry < 0 else man) << (exp - exponent)) if man else 0 for entry, (man, exp) in zip(row, parts)])
+        exponents.append(exponent)
+    return np.array(ints, dtype=object), exponents
+
+
+def mpmath_product(left, right, context, progress=None, cancelled=None):
+    A, row_exponents = fixed_point(left.mpf_rows(context))
+    B, column_exponents = fixed_point(list(zip(*right.mpf_rows(context))))
+    B = B.T
+    rows = A.shape[0]
+    value = np.empty((rows, B.shape[1]), dtype=object)
+    for start in range(0, rows, DOMAIN_BLOCK_ROWS):
+        if cancelled is not None and cancelled():
+            raise ComputeCancelled()
+        block = A[start:start + DOMAIN_BLOCK_ROWS, :] @ B
+        for i, row in enumerate(block.tolist(), start):
+            # integer dot products are exact, the conversion back is the only rounding
+            value[i, :] = [context.mpf((int(total), row_exponents[i] + exponent)) for total, exponent in zip(row, column_exponents)]
+        if progress is not None:
+            progress(min(start + DOMAIN_BLOCK_ROWS, rows), rows)
+    return value
+
+
+def gamma(n, unit):
+    return n * unit / (1 - n * unit) if n * unit < 1 else math.inf
+
+
+# (precision name, significant bits) of the floats a precision setting computes in
+def precision_unit(precision):
+    mode, digits = precision
+    if mode == 'mpmath':
+        return f'mpmath {digits} digits', mpmath_context(digits).prec
+    name = 'float32' if mode == 'float32' else 'float64'
+    return name, np.finfo(FLOAT_DTYPES[name]).nmant + 1
+
+
+# (precision name, bound on |computed - exact| over all entries) of a numeric product
+def numeric_error_bound(left, right, value, precision):
+    mode, digits = precision
+    if value.dtype.kind in 'iu':
+        return 'int64', 0.0
+    name, bits = precision_unit(precision)
+    size = left.shape[1]
+    if (not left.error and not right.error and left.kind == right.kind == 'int'
+            and left.max_abs * right.max_abs * size < 2**bits):
+        # inputs, terms and sums are all representable: nothing was rounded
+        return name, 0.0
+    unit = 2.0**-bits
+    try:
+        A, B = np.abs(left.float_array(np.float64)), np.abs(right.float_array(np.float64))
+    except EngineError:
+        return name, math.inf
+    with np.errstate(over='ignore'):
+        norms = np.linalg.norm(A, axis=1).max() * np.linalg.norm(B, axis=0).max()
+        if mode == 'mpmath':
+            bound = gamma(2, unit) * norms + unit * float(max(abs(entry) for entry in value.flat))
+        else:
+            bound = gamma(size + 2, unit) * norms
+        if left.error or right.error:
+            bound += (left.error * B.sum(axis=0).max() + right.error * A.sum(axis=1).max()
+                      + size * left.error * right.error)
+    return name, float(bound)
+
+
+def numeric_product(left, right, engine, precision, progress=None, cancelled=None):
+    if engine == 'mpmath':
+        value = mpmath_product(left, right, mpmath_context(precision[1]), progress, cancelled)
+    else:
+        L, R = numeric_arrays(left, right, precision[0])
+        value = numeric_sparse_product(L, R) if engine == 'scipy.sparse' else L @ R
+        if progress is not None:
+            progress(1, 1)
+    product = Product(left, right, value, engine)
+    product.precision, product.error_bound = numeric_error_bound(left, right, value, precision)
+    return product
+
+
+def is_exact_domain(domain):
+    if domain.is_ZZ or domain.is_QQ:
+        return True
+    # polynomials in plain symbols only: sin(θ) or sqrt(2) as generators would lose their relations
+    return (domain.is_PolynomialRing and (domain.domain.is_ZZ or domain.domain.is_QQ)
+            and all(symbol.is_Symbol for symbol in domain.symbols))
+
+
+def exact_operands(left, right):
+    A, B = left.domain_matrix(), right.domain_matrix()
+    if not (is_exact_domain(A.domain) and is_exact_domain(B.domain)):
+        return None
+    return A.unify(B)
+
+
+def domain_product(left, right, A, B, progress=None, cancelled=None, strassen=False, multimodular=False):
+    denominator = None
+    if A.domain.is_QQ:
+        # integer matrices multiply much faster than rational ones: clear the denominators first
+        left_denominator, A = A.clear_denoms(convert=True)
+        right_denominator, B = B.clear_denoms(convert=True)
+        denominator = left_denominator.element * right_denominator.element
+    if min(left.density(), right.density()) > SYMBOLIC_SPARSE_DENSITY:
+        A, B = A.to_dense(), B.to_dense()
+    if multimodular:
+        C = multimodular_product(A, B, progress, cancelled)
+    elif strassen:
+        C = strassen_product(A, B, progress=progress, cancelled=cancelled)
+    else:
+        rows = A.shape[0]
+        blocks = []
+        for start in range(0, rows, DOMAIN_BLOCK_ROWS):
+            if cancelled is not None and cancelled():
+                raise ComputeCancelled()
+            blocks.append(A[start:start + DOMAIN_BLOCK_ROWS, :] * B)
+            if progress is not None:
+                progress(min(start + DOMAIN_BLOCK_ROWS, rows), rows)
+        C = blocks[0].vstack(*blocks[1:])
+    if denominator is not None:
+        C = C.convert_to(QQ) * QQ(1, denominator)
+    return C.to_Matrix()
+
+
+#***********************************
+# Strassen-Winograd recursion over DomainMatrix blocks
+#  - odd dimensions are padded with a zero row/column per level, the padding is cut off again
+#  - only dense exact operands with heavy entries qualify, anything else keeps the blocked product
+#***********************************
+def configure_strassen(cutoff=None):
+    global STRASSEN_CUTOFF
+    if cutoff is not None:
+        STRASSEN_CUTOFF = max(0, int(cutoff))
+
+
+def use_strassen(left, right, A, B, cutoff=None):
+    cutoff = STRASSEN_CUTOFF if cutoff is None else cutoff
+    if cutoff < 1 or min(left.shape + right.shape) <= cutoff:
+        return False
+    if min(left.density(), right.density()) <= SYMBOLIC_SPARSE_DENSITY:
+        return False
+    if A.domain.is_QQ:
+        A, B = A.clear_denoms(convert=True)[1], B.clear_denoms(convert=True)[1]
+    elements = [element for element in A.to_list_flat() + B.to_list_flat() if element]
+    if A.domain.is_ZZ:
+        return max(int(element).bit_length() for element in elements) >= STRASSEN_MIN_BITS
+    # sums of polynomials with the same monomials stay as short as their summands
+    monomials = set()
+    for element in elements:
+        monomials.update(element.keys())
+    terms = sum(len(element) for element in elements) / len(elements)
+    return len(monomials) <= STRASSEN_MAX_SPREAD * terms
+
+
+def padded(M, rows, cols):
+    if M.shape[1] < cols:
+        M = M.hstack(DomainMatrix.zeros((M.shape[0], cols - M.shape[1]), M.domain, fmt='dense'))
+    if M.shape[0] < rows:
+        M = M.vstack(DomainMatrix.zeros((rows - M.shape[0], cols), M.domain, fmt='dense'))
+    return M
+
+
+def strassen_product(A, B, cutoff=None, progress=None, cancelled=None):
+    cutoff = STRASSEN_CUTOFF if cutoff is None else cutoff
+    m, k, n = A.shape[0], A.shape[1], B.shape[1]
+    depth = 0
+    while min(m, k, n) > cutoff:
+        m, k, n = (m + 1) // 2, (k + 1) // 2, (n + 1) // 2
+        depth += 1
+    # every level has 7 subproducts of the same shape: 7**depth classical products in total
+    steps = [0, 7 ** depth]
+
+    def product(A, B):
+        m, k, n = A.shape[0], A.shape[1], B.shape[1]
+        if min(m, k, n) <= cutoff:
+            if cancelled is not None and cancelled():
+                raise ComputeCancelled()
+            C = A * B
+            steps[0] += 1
+            if progress is not None:
+                progress(*steps)
+            return C
+        m2, k2, n2 = (m + 1) // 2, (k + 1) // 2, (n + 1) // 2
+        A, B = padded(A, 2 * m2, 2 * k2), padded(B, 2 * k2, 2 * n2)
+        A11, A12, A21, A22 = A[:m2, :k2], A[:m2, k2:], A[m2:, :k2], A[m2:, k2:]
+        B11, B12, B21, B22 = B[:k2, :n2], B[:k2, n2:], B[k2:, :n2], B[k2:, n2:]
+        S1 = A21 + A22
+        S2 = S1 - A11
+        S3 = A11 - A21
+        S4 = A12 - S2
+        T1 = B12 - B11
+        T2 = B22 - T1
+        T3 = B22 - B12
+        T4 = T2 - B21
+        M1 = product(A11, B11)
+        M2 = product(A12, B21)
+        M3 = product(S4, B22)
+        M4 = product(A22, T4)
+        M5 = product(S1, T1)
+        M6 = product(S2, T2)
+        M7 = product(S3, T3)
+        U2 = M1 + M6
+        U3 = U2 + M7
+        U4 = U2 + M5
+        C = (M1 + M2).hstack(U4 + M3).vstack((U3 - M4).hstack(U3 + M5))
+        return C[:m, :n]
+    return product(A, B)
+
+
+#***********************************
+# Multi-modular integer products
+#  - |C| <= k*max|A|*max|B| bounds the result, primes p with k*(p-1)^2 < 2^53 are taken until their
+#    product M exceeds twice the bound, so every residue product is an exact float64 BLAS matmul
+#  - the operands are reduced modulo all primes at once, their bytes times 256^l mod p in one product
+#  - CRT: C = sum r_p*E_p mod M with E_p = 1 mod p and 0 mod the other primes, again one float64
+#    product against the bytes of the E_p, then a carry pass turns the byte sums into integers
+#***********************************
+_word_primes = {}
+_word_primes_lock = threading.Lock()
+
+
+def configure_multimodular(min_size=None):
+    global MULTIMODULAR_MIN_SIZE
+    if min_size is not None:
+        MULTIMODULAR_MIN_SIZE = max(0, int(min_size))
+
+
+def use_multimodular(left, right, A, B, min_size=None):
+    min_size = MULTIMODULAR_MIN_SIZE if min_size is None else min_size
+    if min_size < 1 or min(left.shape + right.shape) < min_size:
+        return False
+    if not (A.domain.is_ZZ or A.domain.is_QQ):
+        return False
+    if min(left.density(), right.density()) <= SYMBOLIC_SPARSE_DENSITY:
+        return False
+    if A.domain.is_QQ:
+        A, B = A.clear_denoms(convert=True)[1], B.clear_denoms(convert=True)[1]
+    return max(abs(int(element)) for element in A.to_list_flat() + B.to_list_flat()).bit_length() <= MULTIMODULAR_MAX_BITS
+
+
+# the count largest primes below 2^bits
+def word_primes(bits, count):
+    with _word_primes_lock:
+        primes = _word_primes.setdefault(bits, [])
+        while len(primes) < count:
+            primes.append(prevprime(primes[-1] if primes else 1 << bits))
+        return primes[:count]
+
+
+def float_mod(x, p):
+    # x mod p for integral float64 below 2^53, much faster than np.fmod
+    r = x - np.floor(x * (1.0 / p)) * p
+    r += p * (r < 0)
+    r -= p * (r >= p)
+    return r
+
+
+def byte_digits(values, width):
+    # little-endian base-256 digits of non-negative integers, one row per value
+    data = b''.join(value.to_bytes(width, 'little') for value in values)
+    return np.frombuffer(data, dtype=np.uint8).reshape(len(values), width).astype(np.float64)
+
+
+def modular_residues(values, primes, moduli):
+    width = max(1, (max(abs(value) for value in values).bit_length() + 7) // 8)
+    powers = np.empty((width, len(primes)))
+    powers[0] = 1
+    for l in range(1, width):
+        powers[l] = float_mod(powers[l - 1] * 256, moduli)
+    residues = float_mod(byte_digits([abs(value) for value in values], width) @ powers, moduli)
+    negative = np.fromiter((value < 0 for value in values), dtype=bool, count=len(values))
+    return np.where(negative[:, None] & (residues > 0), moduli - residues, residues)
+
+
+def multimodular_product(A, B, progress=None, cancelled=None):
+    (m, k), n = A.shape, B.shape[1]
+    left, right = [int(element) for element in A.to_list_flat()], [int(element) for element in B.to_list_flat()]
+    bound = k * max(abs(value) for value in left) * max(abs(value) for value in right)
+    if not bound:
+        return DomainMatrix.zeros((m, n), ZZ).to_dense()
+    bits = min(26, (53 - k.bit_length()) // 2)
+    # every prime is above 2^(bits-1)
+    primes = word_primes(bits, (2 * bound).bit_length() // (bits - 1) + 1)
+    moduli = np.array(primes, dtype=np.float64)
+    left_residues = modular_residues(left, primes, moduli).T.reshape(len(primes), m, k)
+    right_residues = modular_residues(right, primes, moduli).T.reshape(len(primes), k, n)
+    if cancelled is not None and cancelled():
+        raise ComputeCancelled()
+    residues = float_mod(np.matmul(left_residues, right_residues), moduli[:, None, None]).reshape(len(primes), m * n)
+
+    modulus = math.prod(primes)
+    idempotents = [modulus // p * pow(modulus // p, -1, p) for p in primes]
+    # sum r_p*E_p < len(primes)*2^bits*M, one spare byte for the carries
+    width = (modulus.bit_length() + len(primes).bit_length() + bits + 7) // 8 + 1
+    digits = byte_digits(idempotents, width).T
+    half = modulus // 2
+    entries = []
+    for start in range(0, m * n, MULTIMODULAR_BLOCK):
+        if cancelled is not None and cancelled():
+            raise ComputeCancelled()
+        sums = (digits @ residues[:, start:start + MULTIMODULAR_BLOCK]).astype(np.int64)
+        for l in range(width - 1):
+            sums[l + 1] += sums[l] >> 8
+            sums[l] &= 0xFF
+        data = np.ascontiguousarray(sums.T, dtype=np.uint8).tobytes()
+        for offset in range(0, len(data), width):
+            value = int.from_bytes(data[offset:offset + width], 'little') % modulus
+            entries.append(ZZ(value - modulus if value > half else value))
+        if progress is not None:
+            progress(min(start + MULTIMODULAR_BLOCK, m * n), m * n)
+    return DomainMatrix([entries[i * n:(i + 1) * n] for i in range(m)], (m, n), ZZ)
+
+
+#***********************************
+# Process pool tiling of symbolic products
+#  - tiles ship as entry text (left rows x right columns) and come back as (Matrix, texts),
+#    so printing the entries, often slower than the product itself, is parallel as well
+#***********************************
+_process_pool = None
+_process_pool_lock = threading.Lock()
+
+
+def configure_parallel(workers=None, min_terms=None):
+    global PARALLEL_WORKERS, PARALLEL_MIN_TERMS
+    if workers is not None and max(1, int(workers)) != PARALLEL_WORKERS:
+        PARALLEL_WORKERS = max(1, int(workers))
+        shutdown_process_pool()
+    if min_terms is not None:
+        PARALLEL_MIN_TERMS = max(0, int(min_terms))
+
+
+def shutdown_process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is not None:
+            _process_pool.shutdown(wait=False, cancel_futures=True)
+            _process_pool = None
+
+
+def process_pool():
+    global _process_pool
+    with _process_pool_lock:
+        if _process_pool is None:
+            # spawn, not fork: the GUI calls in from a worker thread of a threaded Qt process
+            _process_pool = ProcessPoolExecutor(PARALLEL_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+        return _process_pool
+
+
+def product_terms(left, right):
+    # number of nonzero a*b terms the product forms
+    return int(left.nonzero().sum(axis=0) @ right.nonzero().sum(axis=1))
+
+
+def use_processes(left, right):
+    return PARALLEL_WORKERS > 1 and product_terms(left, right) >= PARALLEL_MIN_TERMS
+
+
+def tile_ranges(size, count):
+    bounds = np.linspace(0, size, min(size, count) + 1).astype(int)
+    return list(zip(bounds[:-1].tolist(), bounds[1:].tolist()))
+
+
+def operand_block(operand, rows, cols):
+    return [[operand.text(i, j) for j in range(*cols)] for i in range(*rows)]
+
+
+def product_tile(left_rows, right_rows, exact, strassen_cutoff):
+    left, right = Operand(left_rows), Operand(right_rows)
+    operands = exact_operands(left, right) if exact else None
+    if operands is not None:
+        # worker processes do not see configure_strassen(), the cutoff comes with the tile
+        value = domain_product(left, right, *operands, strassen=use_strassen(left, right, *operands, strassen_cutoff))
+    else:
+        value = symbolic_product(left, right)
+    return value, [[str(entry) for entry in row] for row in value.tolist()]
+
+
+def parallel_product(left, right, exact, progress=None, cancelled=None):
+    num_rows, num_cols = left.shape[0], right.shape[1]
+    tiles = PARALLEL_WORKERS * PARALLEL_TILES_PER_WORKER
+    row_tiles = max(1, round(math.sqrt(tiles * num_rows / num_cols)))
+    row_ranges = tile_ranges(num_rows, row_tiles)
+    col_ranges = tile_ranges(num_cols, math.ceil(tiles / len(row_ranges)))
+    inner = (0, left.shape[1])
+    pool = process_pool()
+    right_blocks = [operand_block(right, inner, cols) for cols in col_ranges]
+    futures = {}
+    for rows in row_ranges:
+        left_block = operand_block(left, rows, inner)
+        for cols, right_block in zip(col_ranges, right_blocks):
+            futures[pool.submit(product_tile, left_block, right_block, exact, STRASSEN_CUTOFF)] = (rows, cols)
+
+    value = Matrix.zeros(num_rows, num_cols)
+    texts = [[''] * num_cols for _ in range(num_rows)]
+    pending = set(futures)
+    try:
+        while pending:
+            if cancelled is not None and cancelled():
+                raise ComputeCancelled()
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                (r0, r1), (c0, c1) = futures[future]
+                tile, tile_texts = future.result()
+                value[r0:r1, c0:c1] = tile
+                for i, row in enumerate(tile_texts, r0):
+                    texts[i][c0:c1] = row
+            if progress is not None:
+                progress(len(futures) - len(pending), len(futures))
+    except CancelledError as error:
+        # the pool was shut down under us (worker count changed)
+        raise ComputeCancelled() from error
+    except BrokenProcessPool as error:
+        shutdown_process_pool()
+        raise EngineError("A worker process died during the multiplication") from error
+    finally:
+        for future in pending:
+            future.cancel()
+    return value, texts
+
+
+def multiply(left, right, progress=None, cancelled=None, precision=None):
+    left, right = as_operand(left), as_operand(right)
+    if left.shape[1] != right.shape[0]:
+        raise EngineError("Invalid Matrix Dimensions!")
+    precision = precision or precision_setting()
+    engine = select_engine(left, right, precision)
+    if engine in NUMERIC_ENGINES:
+        return numeric_product(left, right, engine, precision, progress, cancelled)
+    exact = exact_operands(left, right)
+    if exact is not None:
+        if use_multimodular(left, right, *exact):
+            engine = 'multimodular'
+        else:
+            engine = 'sympy.strassen' if use_strassen(left, right, *exact) else 'sympy.domain'
+    # a multi-modular product is a few BLAS calls, tiling it over processes would only add overhead
+    if engine != 'multimodular' and use_processes(left, right):
+        value, texts = parallel_product(left, right, exact is not None, progress, cancelled)
+        product = Product(left, right, value, engine)
+        product._texts = texts
+        product.processes = PARALLEL_WORKERS
+        return product
+    if exact is not None:
+        return Product(left, right, domain_product(left, right, *exact, progress, cancelled, engine == 'sympy.strassen',
+                                                   engine == 'multimodular'), engine)
+    return Product(left, right, symbolic_product(left, right, progress, cancelled), engine)
+
+
+#***********************************
+# Operand names used by the exporters
+#***********************************
+def operand_names(count):
+    return ['M_L', 'M_R'] if count == 2 else [f'M_{i + 1}' for i in range(count)]
+
+
+#***********************************
+# Common-subexpression elimination of symbolic results
+#***********************************
+def matrix_cse(matrix):
+    temporaries, reduced = cse(matrix, symbols=numbered_symbols('tmp', exclude=matrix.free_symbols))
+    return temporaries, reduced[0]
+
+
+def apply_cse(product):
+    if product.is_numeric:
+        return product
+    product.set_cse(matrix_cse(product.matrix()))
+    return product
+
+
+#***********************************
+# Incremental product: keeps the last result and only recomputes what an edit touched
+#  - left cell (i,k) changed  -> result row i
+#  - right cell (k,j) changed -> result column j
+#***********************************
+def changed_cells(old, new):
+    if old.rows is not None and new.rows is not None:
+        return np.array(old.rows, dtype=object) != np.array(new.rows, dtype=object)
+    if old.is_numeric and new.is_numeric and old.kind == new.kind:
+        return old.array() != new.array()
+    return np.ones(new.shape, dtype=bool)
+
+
+class IncrementalProduct:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.version = 0
+        self.invalidate()
+
+    def invalidate(self):
+        self.left = None
+        self.right = None
+        self.value = None
+        self.engine = None
+        self.precision = None
+        self.texts = None
+
+    def update(self, left, right, progress=None, cancelled=None):
+        left, right = as_operand(left), as_operand(right)
+        with self.lock:
+            try:
+                return self._update(left, right, progress, cancelled)
+            except BaseException:
+                # a cancelled or failed update leaves a half written result behind
+                self.invalidate()
+                raise
+
+    def _update(self, left, right, progress, cancelled):
+        if left.shape[1] != right.shape[0]:
+            raise EngineError("Invalid Matrix Dimensions!")
+        precision = precision_setting()
+        engine = select_engine(left, right, precision)
+        numeric = engine in NUMERIC_ENGINES
+        # mpmath results are recomputed whole, patching them would mean fixed-point rows per edit
+        if (self.value is None or numeric != (self.engine in NUMERIC_ENGINES)
+                or precision != self.precision or engine == 'mpmath'
+                or left.shape != self.left.shape or right.shape != self.right.shape
+                or left.kind != self.left.kind or right.kind != self.right.kind):
+            product = multiply(left, right, progress, cancelled, precision)
+            self.value, self.engine, self.texts = product.value, product.engine, product.texts()
+            changed = None
+        else:
+            rows = np.flatnonzero(changed_cells(self.left, left).any(axis=1)).tolist()
+            cols = np.flatnonzero(changed_cells(self.right, right).any(axis=0)).tolist()
+            # an exact result keeps being patched exactly, so recomputed entries read the same
+            if self.engine not in EXACT_ENGINES or exact_operands(left, right) is None:
+                self.engine = engine
+            self._recompute(left, right, rows, cols, progress, cancelled)
+            changed = (rows, cols)
+        self.left, self.right, self.precision = left, right, precision
+
+        # version/base_version let a consumer check that 'changed' applies to what it shows
+        product = Product(left, right, self.value.copy(), self.engine)
+        if numeric:
+            product.precision, product.error_bound = numeric_error_bound(left, right, self.value, precision)
+        product._texts = [row[:] for row in self.texts]
+        product.changed = changed
+        product.base_version = self.version
+        self.version += 1
+        product.version = self.version
+        return product
+
+    def _recompute(self, left, right, rows, cols, progress, cancelled):
+        if self.engine in NUMERIC_ENGINES:
+            L, R = numeric_arrays(left, right, self.precision[0])
+            row_product, column_product = (lambda i: L[i, :] @ R), (lambda j: L @ R[:, j])
+        elif self.engine in EXACT_ENGINES:
+            A, B = exact_operands(left, right)
+            row_product, column_product = (lambda i: (A[i:i + 1, :] * B).to_Matrix()), (lambda j: (A * B[:, j:j + 1]).to_Matrix())
+        else:
+            L, R = left.matrix(), right.matrix()
+            row_product, column_product = (lambda i: L[i, :] * R), (lambda j: L * R[:, j])
+        total, done = len(rows) + len(cols), 0
+        for i in rows:
+            if cancelled is not None and cancelled():
+                raise ComputeCancelled()
+            self.value[i, :] = row_product(i)
+            self.texts[i] = [self.entry_text(i, j) for j in range(self.value.shape[1])]
+            done += 1
+            if progress is not None:
+                progress(done, total)
+        for j in cols:
+            if cancelled is not None and cancelled():
+                raise ComputeCancelled()
+            self.value[:, j] = column_product(j)
+            for i in range(self.value.shape[0]):
+                self.texts[i][j] = self.entry_text(i, j)
+            done += 1
+            if progress is not None:
+                progress(done, total)
+
+    def entry_text(self, i, j):
+        if self.engine in NUMERIC_ENGINES:
+            return format_number(self.value[i, j])
+        return str(self.value[i, j])
+
+
+#***********************************
+# Matrix chains A*B*C*...: optimal parenthesization and cached sub-chain products
+#***********************************
+def chain_order(shapes):
+    # classic O(n^3) dynamic program over the scalar multiplication count
+    count = len(shapes)
+    dims = [shapes[0][0]] + [shape[1] for shape in shapes]
+    cost = [[0] * count for _ in range(count)]
+    split = [[0] * count for _ in range(count)]
+    for length in range(2, count + 1):
+        for i in range(count - length + 1):
+            j = i + length - 1
+            cost[i][j] = None
+            for k in range(i, j):
+                candidate = cost[i][k] + cost[k + 1][j] + dims[i] * dims[k + 1] * dims[j + 1]
+                if cost[i][j] is None or candidate < cost[i][j]:
+                    cost[i][j], split[i][j] = candidate, k
+
+    def tree(i, j):
+        if i == j:
+            return i
+        return (tree(i, split[i][j]), tree(split[i][j] + 1, j))
+    return tree(0, count - 1), cost[0][count - 1]
+
+
+def chain_text(order, names, outer=True):
+    if isinstance(order, int):
+        return names[order]
+    text = chain_text(order[0], names, False) + ' * ' + chain_text(order[1], names, False)
+    return text if outer else f'({text})'
+
+
+class ChainProduct:
+    def __init__(self):
+        self.cache = {}     # operand keys of a sub-chain -> (Operand, Product)
+        self.incremental = IncrementalProduct()
+
+    def update(self, operands, progress=None, cancelled=None):
+        operands = [as_operand(operand) for operand in operands]
+        if len(operands) < 2:
+            raise EngineError("A product needs at least two matrices")
+        if any(a.shape[1] != b.shape[0] for a, b in zip(operands, operands[1:])):
+            raise EngineError("Invalid Matrix Dimensions!")
+        if len(operands) == 2:
+            return self.incremental.update(operands[0], operands[1], progress, cancelled)
+
+        order, _ = chain_order([operand.shape for operand in operands])
+        keys = [operand.key() for operand in operands]
+        precision = precision_setting()
+        used = {}
+        steps = [0, len(operands) - 1]
+
+        # returns (operand, product, first, last) of the sub-chain below node
+        def evaluate(node):
+            if isinstance(node, int):
+                return operands[node], None, node, node
+            left, _, first, _ = evaluate(node[0])
+            right, _, _, last = evaluate(node[1])
+            key = (precision,) + tuple(keys[first:last + 1])
+            if key in self.cache:
+                used[key] = self.cache[key]
+            else:
+                product = multiply(left, right, cancelled=cancelled, precision=precision)
+                used[key] = (Operand.from_product(product), product)
+            steps[0] += 1
+            if progress is not None:
+                progress(*steps)
+            return used[key][0], used[key][1], first, last
+
+        _, last_product, _, _ = evaluate(order)
+        # only the sub-chains of the current chain are kept, so editing one operand
+        # re-evaluates just the sub-chains that contain it
+        self.cache = used
+        value = last_product.value.copy() if last_product.is_numeric else Matrix(last_product.value)
+        product = Product(last_product.left, last_product.right, value, last_product.engine)
+        product.precision, product.error_bound = last_product.precision, last_product.error_bound
+        product.operands = operands
+        product.order = order
+        return product
+
+
+def multiply_chain(operands, progress=None, cancelled=None):
+    return ChainProduct().update(operands, progress, cancelled)
+
+
+#***********************************
+# Out-of-core blocked multiplication: operands and result are 2-D arrays that only get
+# sliced, typically np.memmap views of files, so peak memory is a few tiles
+#***********************************
+def blocked_max_abs(array, tile=OUT_OF_CORE_TILE):
+    return max(int(np.abs(np.asarray(array[i:i + tile], dtype=np.int64)).max()) for i in range(0, array.shape[0], tile))
+
+
+def blocked_result_dtype(left, right, tile=OUT_OF_CORE_TILE):
+    if left.ndim != 2 or right.ndim != 2 or 0 in left.shape + right.shape:
+        raise EngineError("Operands must be non-empty 2-D arrays")
+    if left.shape[1] != right.shape[0]:
+        raise EngineError("Invalid Matrix Dimensions!")
+    kinds = {np.dtype(left.dtype).kind, np.dtype(right.dtype).kind}
+    if not kinds <= set('biufc'):
+        raise EngineError("Out-of-core operands must be numeric")
+    if kinds <= set('biu'):
+        # same int64 bound as the in-memory fast path, checked with one pass over each operand
+        if blocked_max_abs(left, tile) * blocked_max_abs(right, tile) * left.shape[1] > INT64_MAX:
+            raise EngineError("Integer product may exceed 64 bit, convert the operands to float")
+        return np.dtype(np.int64)
+    return np.result_type(left.dtype, right.dtype)
+
+
+def blocked_multiply(left, right, out, tile=OUT_OF_CORE_TILE, progress=None, cancelled=None):
+    tile = max(1, int(tile))
+    rows, inner, cols = left.shape[0], left.shape[1], right.shape[1]
+    if out.shape != (rows, cols):
+        raise EngineError("Output has the wrong shape")
+    dtype = out.dtype
+    row_tiles, col_tiles = range(0, rows, tile), range(0, cols, tile)
+    total, done = len(row_tiles) * len(col_tiles), 0
+    for i in row_tiles:
+        for j in col_tiles:
+            if cancelled is not None and cancelled():
+                raise ComputeCancelled()
+            block = np.zeros((min(tile, rows - i), min(tile, cols - j)), dtype=dtype)
+            for k in range(0, inner, tile):
+                block += np.asarray(left[i:i + tile, k:k + tile], dtype=dtype) @ np.asarray(right[k:k + tile, j:j + tile], dtype=dtype)
+            out[i:i + tile, j:j + tile] = block
+            done += 1
+            if progress is not None:
+                progress(done, total)
+    if hasattr(out, 'flush'):
+        out.flush()
+    return out
+
+
+#***********************************
+# Batched products: many independent small pairs (transform stacks and the like)
+#  - numeric stacks (N, m, k) @ (N, k, n) are one broadcasted np.matmul, either side may be a
+#    single matrix that applies to every pair
+#  - pairs of entry rows stream through multiply_pairs(), results come out in input order
+#***********************************
+def stack_max_abs(stack):
+    return int(np.abs(stack).max()) if stack.size else 0
+
+
+def multiply_stack(left, right):
+    left, right = np.asarray(left), np.asarray(right)
+    if left.ndim not in (2, 3) or right.ndim not in (2, 3) or 0 in left.shape + right.shape:
+        raise EngineError("Stacks must be non-empty (N, rows, cols) or (rows, cols) arrays")
+    if left.shape[-1] != right.shape[-2]:
+        raise EngineError("Invalid Matrix Dimensions!")
+    if left.ndim == 3 and right.ndim == 3 and 1 not in (left.shape[0], right.shape[0]) and left.shape[0] != right.shape[0]:
+        raise EngineError(f"Stacks of {left.shape[0]} and {right.shape[0]} matrices do not pair up")
+    kinds = {left.dtype.kind, right.dtype.kind}
+    if not kinds <= set('biufc'):
+        raise EngineError("Stacks must be numeric")
+    if kinds <= set('biu'):
+        left, right = left.astype(np.int64), right.astype(np.int64)
+        # int64 matmul wraps silently: Python integers once the bound no longer holds
+        if stack_max_abs(left) * stack_max_abs(right) * left.shape[-1] > INT64_MAX:
+            return np.matmul(left.astype(object), right.astype(object))
+    return np.matmul(left, right)
+
+
+def pair_shape(left_rows, right_rows, index):
+    for rows in (left_rows, right_rows):
+        if not rows or not rows[0] or any(len(row) != len(rows[0]) for row in rows):
+            raise EngineError(f"Pair {index + 1}: matrix rows differ in length or are empty")
+    if len(left_rows[0]) != len(right_rows):
+        raise EngineError(f"Pair {index + 1}: Invalid Matrix Dimensions!")
+    return len(left_rows), len(right_rows), len(right_rows[0])
+
+
+def numeric_stack(texts):
+    try:
+        return texts.astype(np.int64)
+    except OverflowError:
+        return None     # integers beyond 64 bit stay exact on the symbolic path
+    except ValueError:
+        pass
+    try:
+        values = texts.astype(np.float64)
+    except (ValueError, OverflowError):
+        return None
+    # 'inf' and 'nan' are symbols to the engine
+    return values if np.isfinite(values).all() else None
+
+
+def numeric_chunk(pairs):
+    # one matmul when every entry is a number and every pair has the same shapes
+    if len({(len(left), len(right), len(right[0])) for left, right in pairs}) != 1:
+        return None
+    left = numeric_stack(np.array([rows for rows, _ in pairs], dtype=str))
+    right = numeric_stack(np.array([rows for _, rows in pairs], dtype=str)) if left is not None else None
+    if right is None:
+        return None
+    return multiply_stack(left, right)
+
+
+def symbolic_pairs(pairs):
+    # parse_entry is shared by every pair, repeated entries (common in transform stacks) parse once
+    results = []
+    for left_rows, right_rows in pairs:
+        left = Matrix([[parse_entry(entry) for entry in row] for row in left_rows])
+        right = Matrix([[parse_entry(entry) for entry in row] for row in right_rows])
+        results.append([[str(entry) for entry in row] for row in (left * right).tolist()])
+    return results
+
+
+def chunk_texts(pairs):
+    stack = numeric_chunk(pairs)
+    if stack is None:
+        return symbolic_pairs(pairs)
+    if stack.dtype == object:
+        return [[[format_number(entry) for entry in row] for row in matrix] for matrix in stack.tolist()]
+    return stack.astype(str).tolist()
+
+
+def batch_pairs(lefts, rights):
+    lefts, rights = list(lefts), list(rights)
+    if not lefts or not rights:
+        raise EngineError("Empty batch")
+    if len(lefts) != len(rights) and 1 not in (len(lefts), len(rights)):
+        raise EngineError(f"Batches of {len(lefts)} and {len(rights)} matrices do not pair up")
+    count = max(len(lefts), len(rights))
+    pairs = [(lefts[0] if len(lefts) == 1 else lefts[index], rights[0] if len(rights) == 1 else rights[index]) for index in range(count)]
+    pairs = [([[str(entry).strip() for entry in row] for row in left], [[str(entry).strip() for entry in row] for row in right])
+             for left, right in pairs]
+    terms = 0
+    for index, (left, right) in enumerate(pairs):
+        rows, inner, cols = pair_shape(left, right, index)
+        terms += rows * inner * cols
+    return pairs, terms
+
+
+def multiply_pairs(lefts, rights, progress=None, cancelled=None):
+    # generator of result entry texts, one list of rows per pair, in input order
+    pairs, terms = batch_pairs(lefts, rights)
+    chunks = [pairs[start:start + BATCH_CHUNK] for start in range(0, len(pairs), BATCH_CHUNK)]
+    if PARALLEL_WORKERS > 1 and terms >= PARALLEL_MIN_TERMS and len(pairs) > 1:
+        size = max(1, min(BATCH_CHUNK, -(-len(pairs) // (PARALLEL_WORKERS * PARALLEL_TILES_PER_WORKER))))
+        chunks = [pairs[start:start + size] for start in range(0, len(pairs), size)]
+        yield from parallel_chunks(chunks, len(pairs), progress, cancelled)
+        return
+    done = 0
+    for chunk in chunks:
+        if cancelled is not None and cancelled():
+            raise ComputeCancelled()
+        yield from chunk_texts(chunk)
+        done += len(chunk)
+        if progress is not None:
+            progress(done, len(pairs))
+
+
+def parallel_chunks(chunks, total, progress=None, cancelled=None):
+    pool = process_pool()
+    window = PARALLEL_WORKERS * 2     # chunks in flight, bounds the results held back for ordering
+    futures = [pool.submit(chunk_texts, chunk) for chunk in chunks[:window]]
+    done = 0
+    try:
+        for index in range(len(chunks)):
+            while True:
+                if cancelled is not None and cancelled():
+                    raise ComputeCancelled()
+                finished, _ = wait([futures[index]], timeout=0.1)
+                if finished:
+                    break
+            results = futures[index].result()
+            futures[index] = None
+            if index + window < len(chunks):
+                futures.append(pool.submit(chunk_texts, chunks[index + window]))
+            yield from results
+            done += len(results)
+            if progress is not None:
+                progress(done, total)
+    except CancelledError as error:
+        raise ComputeCancelled() from error
+    except BrokenProcessPool as error:
+        shutdown_process_pool()
+        raise EngineError("A worker process died during the multiplication") from error
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
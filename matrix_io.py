@@ -0,0 +1,381 @@
+import csv
+import io
+import os
+import re
+import sys
+import numpy as np
+from exporters import EXPORTERS
+from matrix_engine import (BATCH_CHUNK, OUT_OF_CORE_TILE, ComputeCancelled, EngineError, Operand, blocked_multiply, blocked_result_dtype,
+                           format_number, multiply_pairs, multiply_stack)
+
+#***********************************
+# Operand readers and result writers for files and text (no Qt imports)
+#  - CSV / TSV, NumPy .npy, Matrix Market .mtx, MATLAB style '[a b; c d]' text
+#  - pasted text: additionally LaTeX bmatrix/pmatrix and NumPy/sympy reprs
+#  - exports (exporters.py) streamed straight into files
+#  - memory-mapped .npy or raw binary files for out-of-core products
+#  - stacks of many small matrices for batched products: (N, rows, cols) .npy, or text with one
+#    matrix per line ('[a b; c d]') or per block of lines separated by blank lines
+#***********************************
+
+MATLAB_ASSIGNMENT = re.compile(r'^\s*[A-Za-z_]\w*\s*=\s*')
+LATEX_ENVIRONMENT = re.compile(r'\\(begin|end)\{[a-zA-Z]*matrix\*?\}(\[[^\]]*\])?')
+LATEX_DELIMITERS = re.compile(r'^\\left[\[(.|]|\\right[\])|.]$')
+LATEX_FRACTION = re.compile(r'\\[dt]?frac\{([^{}]*)\}\{([^{}]*)\}')
+LATEX_POWER = re.compile(r'\^\{([^{}]*)\}')
+LATEX_COMMAND = re.compile(r'\\([a-zA-Z]+)')
+LATEX_FUNCTION = re.compile(r'\\([a-zA-Z]+)\s*')
+LATEX_PRODUCT = re.compile(r'(?<=[\w).])\s+(?=[\w(])')
+NESTED_ROW = re.compile(r'\[([^\[\]]*)\]')
+REPR_WRAPPER = re.compile(r'^\s*(array|Matrix|ImmutableMatrix|MutableDenseMatrix)\(|,?\s*dtype=[\w.]+\s*|\)\s*$')
+
+# LaTeX commands of entries -> the plain text the grids use (Greek letters as Unicode)
+LATEX_SYMBOLS = {
+    'alpha': 'α', 'beta': 'β', 'gamma': 'γ', 'delta': 'δ', 'epsilon': 'ε', 'varepsilon': 'ε', 'zeta': 'ζ', 'eta': 'η',
+    'theta': 'θ', 'vartheta': 'θ', 'iota': 'ι', 'kappa': 'κ', 'lambda': 'λ', 'mu': 'μ', 'nu': 'ν', 'xi': 'ξ',
+    'omicron': 'ο', 'pi': 'π', 'rho': 'ρ', 'sigma': 'σ', 'tau': 'τ', 'upsilon': 'υ', 'phi': 'φ', 'varphi': 'φ',
+    'chi': 'χ', 'psi': 'ψ', 'omega': 'ω', 'cdot': '*', 'times': '*', 'left': '', 'right': '',
+}
+
+
+#***********************************
+# Text parsers
+#***********************************
+# pieces of text between separators outside of (), [] and {}, so 'atan2(y, x)' stays one entry
+def split_top_level(text, separators):
+    pieces, depth, start = [], 0, 0
+    for index, char in enumerate(text):
+        if char in '([{':
+            depth += 1
+        elif char in ')]}':
+            depth = max(0, depth - 1)
+        elif depth == 0 and char in separators:
+            pieces.append(text[start:index])
+            start = index + 1
+    pieces.append(text[start:])
+    return pieces
+
+
+def row_entries(row):
+    # commas separate entries when present, so symbolic entries may contain blanks
+    entries = split_top_level(row, ',')
+    return entries if len(entries) > 1 else [entry for entry in split_top_level(row, ' \t') if entry.strip()]
+
+
+def parse_matlab(text):
+    text = MATLAB_ASSIGNMENT.sub('', text.strip()).rstrip(';').strip()
+    if text.startswith('[') and text.endswith(']'):
+        text = text[1:-1]
+    rows = [row.strip() for row in split_top_level(text, ';\n') if row.strip()]
+    return [[entry.strip() for entry in row_entries(row)] for row in rows]
+
+
+def parse_delimited(text, delimiter=','):
+    return [[entry.strip() for entry in row] for row in csv.reader(io.StringIO(text), delimiter=delimiter) if any(entry.strip() for entry in row)]
+
+
+def latex_group(text):
+    return text if re.fullmatch(r'\w+', text) else f'({text})'
+
+
+def latex_entry(text):
+    text = text.replace('\\,', ' ').replace('\\;', ' ').replace('\\!', '')
+    text = LATEX_COMMAND.sub(lambda match: LATEX_SYMBOLS.get(match.group(1), match.group(0)), text)
+    while LATEX_FRACTION.search(text) or LATEX_POWER.search(text):
+        text = LATEX_FRACTION.sub(lambda match: latex_group(match.group(1).strip()) + '/' + latex_group(match.group(2).strip()), text)
+        text = LATEX_POWER.sub(lambda match: '**' + latex_group(match.group(1).strip()), text)
+    text = LATEX_FUNCTION.sub(r'\1', text)     # \sin{...} -> sin(...)
+    text = text.replace('^', '**').replace('{', '(').replace('}', ')')
+    text = LATEX_PRODUCT.sub('*', ' '.join(text.split()))     # '3 α θ' is a product
+    return text.replace(' ', '')
+
+
+def parse_latex(text):
+    text = LATEX_ENVIRONMENT.sub('', text.strip().strip('$')).strip()
+    text = LATEX_DELIMITERS.sub('', text).strip()
+    rows = [row for row in re.split(r'\\\\', text) if row.strip()]
+    return [[latex_entry(entry) for entry in row.split('&')] for row in rows]
+
+
+# 'array([[1, 2], [3, 4]])', NumPy's '[[1 2]\n [3 4]]' and 'Matrix([[a, b], [c, d]])'
+def parse_nested(text):
+    rows = NESTED_ROW.findall(REPR_WRAPPER.sub('', MATLAB_ASSIGNMENT.sub('', text.strip())))
+    return [[entry.strip() for entry in row_entries(row) if entry.strip()] for row in rows]
+
+
+def parse_matrix_text(text):
+    text = text.strip()
+    if '\\begin' in text or '&' in text:
+        rows = parse_latex(text)
+    elif text.count('[') > 1 or REPR_WRAPPER.match(text):
+        rows = parse_nested(text)
+    elif '\t' in text:
+        rows = parse_delimited(text, '\t')
+    elif '\n' in text and ';' not in text and '[' not in text:
+        rows = parse_delimited(text, ',') if ',' in text else parse_matlab(text)
+    else:
+        rows = parse_matlab(text)
+    rows = [row for row in rows if row]
+    if not rows:
+        raise EngineError("No matrix found in the text")
+    return rows
+
+
+#***********************************
+# File readers
+#***********************************
+def read_text(path):
+    if path == '-':
+        return sys.stdin.read()
+    with open(path, encoding='utf-8') as file:
+        return file.read()
+
+
+def read_matrix_market(path):
+    try:
+        from scipy.io import mmread
+    except ImportError as error:
+        raise EngineError("Reading Matrix Market files needs scipy") from error
+    matrix = mmread(path)
+    return matrix.toarray() if hasattr(matrix, 'toarray') else np.asarray(matrix)
+
+
+def read_operand(path):
+    extension = os.path.splitext(path)[1].lower()
+    try:
+        if extension == '.npy':
+            return Operand.from_array(np.load(path, allow_pickle=False))
+        if extension == '.mtx':
+            return Operand.from_array(read_matrix_market(path))
+        if extension == '.csv':
+            return Operand(parse_delimited(read_text(path), ','))
+        if extension == '.tsv':
+            return Operand(parse_delimited(read_text(path), '\t'))
+        return Operand(parse_matrix_text(read_text(path)))
+    except OSError as error:
+        raise EngineError(f"Cannot read '{path}': {error.strerror or error}") from error
+    except ValueError as error:
+        if isinstance(error, EngineError):
+            raise EngineError(f"{path}: {error}") from error
+        raise EngineError(f"Cannot parse '{path}': {error}") from error
+
+
+# Entry text of a file for the grids, which also hold incomplete matrices
+def read_rows(path):
+    extension = os.path.splitext(path)[1].lower()
+    if extension in ('.npy', '.mtx'):
+        operand = read_operand(path)
+        return [[operand.text(i, j) for j in range(operand.shape[1])] for i in range(operand.shape[0])]
+    try:
+        text = read_text(path)
+    except OSError as error:
+        raise EngineError(f"Cannot read '{path}': {error.strerror or error}") from error
+    if extension in ('.csv', '.tsv'):
+        return parse_delimited(text, '\t' if extension == '.tsv' else ',')
+    return parse_matrix_text(text)
+
+
+#***********************************
+# Writers
+#***********************************
+def open_output(path):
+    if path == '-':
+        return sys.stdout
+    return open(path, 'w', encoding='utf-8', newline='')
+
+
+def write_result(path, product):
+    extension = os.path.splitext(path)[1].lower() if path != '-' else ''
+    if extension in ('.npy', '.mtx'):
+        if not product.is_numeric:
+            raise EngineError(f"Symbolic results cannot be written as {extension}")
+        if product.value.dtype == object:
+            raise EngineError(f"mpmath results cannot be written as {extension}, use a text or CSV file")
+        if extension == '.npy':
+            np.save(path, product.value)
+        else:
+            try:
+                from scipy.io import mmwrite
+            except ImportError as error:
+                raise EngineError("Writing Matrix Market files needs scipy") from error
+            mmwrite(path, product.value)
+        return
+    file = open_output(path)
+    try:
+        if extension in ('.csv', '.tsv'):
+            EXPORTERS[extension[1:]].export(product, file)
+        else:
+            for line in product.temporaries_text().splitlines():
+                file.write(f"% {line}\n")
+            file.write('[' + ';\n '.join(', '.join(row) for row in product.texts()) + ']\n')
+    finally:
+        if file is not sys.stdout:
+            file.close()
+
+
+# Streams one exporter's output into a file, a cancelled or failed export leaves no partial file behind
+def export_file(path, product, name, progress=None, cancelled=None):
+    try:
+        file = open_output(path)
+    except OSError as error:
+        raise EngineError(f"Cannot write '{path}': {error.strerror or error}") from error
+    try:
+        EXPORTERS[name].export(product, file, progress, cancelled)
+    except BaseException as error:
+        if file is not sys.stdout:
+            file.close()
+            os.remove(path)
+        if isinstance(error, OSError):
+            raise EngineError(f"Cannot write '{path}': {error.strerror or error}") from error
+        raise
+    if file is not sys.stdout:
+        file.close()
+
+
+#***********************************
+# Memory-mapped operands: .npy carries dtype and shape, raw binary files need both given
+#***********************************
+def open_memmap(path, dtype=None, shape=None):
+    try:
+        if os.path.splitext(path)[1].lower() == '.npy':
+            return np.load(path, mmap_mode='r', allow_pickle=False)
+        if dtype is None or shape is None:
+            raise EngineError(f"Raw binary file '{path}' needs a dtype and a shape")
+        dtype = np.dtype(dtype)
+        expected = dtype.itemsize * shape[0] * shape[1]
+        if os.path.getsize(path) != expected:
+            raise EngineError(f"'{path}' has {os.path.getsize(path)} bytes, {shape[0]}x{shape[1]} {dtype} needs {expected}")
+        return np.memmap(path, dtype=dtype, mode='r', shape=tuple(shape))
+    except OSError as error:
+        raise EngineError(f"Cannot read '{path}': {error.strerror or error}") from error
+    except TypeError as error:
+        raise EngineError(f"Unknown dtype '{dtype}'") from error
+
+
+def create_memmap(path, dtype, shape):
+    try:
+        if os.path.splitext(path)[1].lower() == '.npy':
+            return np.lib.format.open_memmap(path, mode='w+', dtype=dtype, shape=shape)
+        return np.memmap(path, dtype=dtype, mode='w+', shape=shape)
+    except OSError as error:
+        raise EngineError(f"Cannot write '{path}': {error.strerror or error}") from error
+
+
+def multiply_files(left_path, right_path, output_path, tile=OUT_OF_CORE_TILE, dtype=None, left_shape=None, right_shape=None,
+                   progress=None, cancelled=None):
+    left = open_memmap(left_path, dtype, left_shape)
+    right = open_memmap(right_path, dtype, right_shape)
+    result_dtype = blocked_result_dtype(left, right, tile)
+    out = create_memmap(output_path, result_dtype, (left.shape[0], right.shape[1]))
+    try:
+        blocked_multiply(left, right, out, tile, progress, cancelled)
+    except BaseException as error:
+        # a half written result is worse than none
+        del out
+        os.remove(output_path)
+        if isinstance(error, OSError):
+            raise EngineError(f"Cannot write '{output_path}': {error.strerror or error}") from error
+        raise
+    return out.shape, out.dtype
+
+
+#***********************************
+# Batch files: stacks of independent pairs, results streamed out in input order
+#***********************************
+BLANK_LINES = re.compile(r'\n\s*\n')
+
+
+def read_stack(path):
+    try:
+        if os.path.splitext(path)[1].lower() == '.npy':
+            stack = np.load(path, mmap_mode='r', allow_pickle=False)
+            if stack.ndim not in (2, 3):
+                raise EngineError(f"'{path}' holds a {stack.ndim}-D array, expected (N, rows, cols) or (rows, cols)")
+            return stack
+        text = read_text(path).strip()
+    except OSError as error:
+        raise EngineError(f"Cannot read '{path}': {error.strerror or error}") from error
+    blocks = BLANK_LINES.split(text) if BLANK_LINES.search(text) else text.splitlines()
+    try:
+        return [parse_matrix_text(block) for block in blocks if block.strip()]
+    except EngineError as error:
+        raise EngineError(f"{path}: {error}") from error
+
+
+def stack_rows(stack):
+    if isinstance(stack, list):
+        return stack
+    matrices = stack[None] if stack.ndim == 2 else stack
+    return [[[format_number(value) for value in row] for row in matrix] for matrix in np.asarray(matrices).tolist()]
+
+
+def matrix_line(rows):
+    return '[' + '; '.join(', '.join(row) for row in rows) + ']\n'
+
+
+def stack_count(stack):
+    return 1 if stack.ndim == 2 else stack.shape[0]
+
+
+# Products of BATCH_CHUNK pairs at a time, a single matrix on either side applies to every pair
+def stack_chunks(left, right, cancelled=None):
+    count = max(stack_count(left), stack_count(right))
+    for start in range(0, count, BATCH_CHUNK):
+        if cancelled is not None and cancelled():
+            raise ComputeCancelled()
+        stop = min(start + BATCH_CHUNK, count)
+        operands = [stack if stack_count(stack) == 1 else stack[start:stop] for stack in (left, right)]
+        yield start, stop, np.broadcast_to(multiply_stack(*operands), (stop - start, left.shape[-2], right.shape[-1]))
+
+
+def multiply_stack_file(left, right, output_path, progress=None, cancelled=None):
+    count = max(stack_count(left), stack_count(right))
+    out = None
+    try:
+        for start, stop, block in stack_chunks(left, right, cancelled):
+            if block.dtype == object or (out is not None and block.dtype != out.dtype):
+                raise EngineError("Integer products exceed 64 bit, convert the stacks to float")
+            if out is None:
+                out = create_memmap(output_path, block.dtype, (count,) + block.shape[1:])
+            out[start:stop] = block
+            if progress is not None:
+                progress(stop, count)
+        out.flush()
+    except BaseException:
+        if out is not None:
+            del out
+            os.remove(output_path)
+        raise
+    return count
+
+
+def multiply_batch_files(left_path, right_path, output_path='-', progress=None, cancelled=None):
+    left, right = read_stack(left_path), read_stack(right_path)
+    numeric = not isinstance(left, list) and not isinstance(right, list)
+    if output_path != '-' and os.path.splitext(output_path)[1].lower() == '.npy':
+        if not numeric:
+            raise EngineError("Only two .npy stacks give a .npy result, text batches are written as text")
+        return multiply_stack_file(left, right, output_path, progress, cancelled)
+    if numeric:
+        results = (rows for _, _, block in stack_chunks(left, right, cancelled) for rows in stack_rows(block))
+    else:
+        results = multiply_pairs(stack_rows(left), stack_rows(right), progress, cancelled)
+    try:
+        file = open_output(output_path)
+    except OSError as error:
+        raise EngineError(f"Cannot write '{output_path}': {error.strerror or error}") from error
+    count = 0
+    try:
+        for rows in results:
+            file.write(matrix_line(rows))
+            count += 1
+    except BaseException as error:
+        if file is not sys.stdout:
+            file.close()
+            os.remove(output_path)
+        if isinstance(error, OSError):
+            raise EngineError(f"Cannot write '{output_path}': {error.strerror or error}") from error
+        raise
+    if file is not sys.stdout:
+        file.close()
+    return count
@@ -0,0 +1,210 @@
+import numpy as np
+from PyQt5.QtCore import Qt, QAbstractTableModel, QModelIndex, pyqtSignal
+from PyQt5.QtGui import QColor, QFont, QKeySequence
+from PyQt5.QtWidgets import QLineEdit, QTableView, QHeaderView, QStyledItemDelegate, QAbstractItemView
+
+#***********************************
+# Compact cell store: one numpy object array of stripped strings, grown in chunks
+#***********************************
+class CellStore:
+    def __init__(self):
+        self.cells = np.full((0, 0), '', dtype=object)
+
+    def reserve(self, rows, cols):
+        cap_rows, cap_cols = self.cells.shape
+        if rows <= cap_rows and cols <= cap_cols:
+            return
+        grown = np.full((max(rows, 2 * cap_rows), max(cols, 2 * cap_cols)), '', dtype=object)
+        grown[:cap_rows, :cap_cols] = self.cells
+        self.cells = grown
+
+    def get(self, row, col):
+        if row < self.cells.shape[0] and col < self.cells.shape[1]:
+            return self.cells[row, col]
+        return ''
+
+    def set(self, row, col, text):
+        self.reserve(row + 1, col + 1)
+        self.cells[row, col] = text.strip()
+
+    def load(self, rows):
+        num_rows = len(rows)
+        num_cols = max((len(row) for row in rows), default=0)
+        self.cells = np.full((num_rows, num_cols), '', dtype=object)
+        for i, row in enumerate(rows):
+            self.cells[i, :len(row)] = [str(entry).strip() for entry in row]
+
+    def clear(self):
+        self.cells = np.full((0, 0), '', dtype=object)
+
+    def filled(self):
+        return self.cells != ''
+
+    def extent(self):
+        filled = self.filled()
+        rows = np.flatnonzero(filled.any(axis=1))
+        cols = np.flatnonzero(filled.any(axis=0))
+        if rows.size == 0:
+            return 0, 0
+        return int(rows[-1]) + 1, int(cols[-1]) + 1
+
+    # A valid matrix fills exactly the top left rows x cols block, without holes
+    def dimensions(self):
+        filled = self.filled()
+        num_rows, num_cols = self.extent()
+        if num_rows == 0:
+            return 0, 0, False
+        return num_rows, num_cols, bool(filled[:num_rows, :num_cols].all())
+
+    def read(self, rows, cols):
+        return self.cells[:rows, :cols].tolist()
+
+
+#***********************************
+# Table model on top of a CellStore, only visible cells are ever asked for
+#***********************************
+class MatrixModel(QAbstractTableModel):
+    cell_changed = pyqtSignal(int, int)
+
+    def __init__(self, read_only=False, min_rows=5, min_cols=5, parent=None):
+        super().__init__(parent)
+        self.store = CellStore()
+        self.read_only = read_only
+        self.min_rows = min_rows
+        self.min_cols = min_cols
+        self.num_rows = min_rows
+        self.num_cols = min_cols
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.num_rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.num_cols
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        if role in (Qt.DisplayRole, Qt.EditRole, Qt.ToolTipRole):
+            return self.store.get(index.row(), index.column())
+        if role == Qt.BackgroundRole:
+            return QColor('white') if self.store.get(index.row(), index.column()) else QColor('lightgrey')
+        if role == Qt.ForegroundRole:
+            return QColor('black')
+        if role == Qt.TextAlignmentRole:
+            return Qt.AlignCenter
+        return None
+
+    def flags(self, index):
+        flags = Qt.ItemIsEnabled | Qt.ItemIsSelectable
+        if not self.read_only:
+            flags |= Qt.ItemIsEditable
+        return flags
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.EditRole:
+            return False
+        row, col = index.row(), index.column()
+        text = str(value).strip()
+        if text == self.store.get(row, col):
+            return False
+        self.store.set(row, col, text)
+        self.dataChanged.emit(index, index, [Qt.DisplayRole, Qt.BackgroundRole])
+        if text:
+            self.grow_to(row + 2, col + 2)
+        self.cell_changed.emit(row, col)
+        return True
+
+    # Editable grids always keep one spare row and column to type into
+    def grow_to(self, rows, cols):
+        if rows > self.num_rows:
+            self.beginInsertRows(QModelIndex(), self.num_rows, rows - 1)
+            self.num_rows = rows
+            self.endInsertRows()
+        if cols > self.num_cols:
+            self.beginInsertColumns(QModelIndex(), self.num_cols, cols - 1)
+            self.num_cols = cols
+            self.endInsertColumns()
+
+    def set_rows(self, rows):
+        self.beginResetModel()
+        self.store.load(rows)
+        spare = 0 if self.read_only else 1
+        num_rows, num_cols = self.store.cells.shape
+        self.num_rows = max(self.min_rows, num_rows + spare)
+        self.num_cols = max(self.min_cols, num_cols + spare)
+        self.endResetModel()
+
+    def clear(self):
+        self.set_rows([])
+
+    # Write back only the given rows and columns of an otherwise unchanged result
+    def update_cells(self, texts, rows, cols):
+        num_cols = len(texts[0]) if texts else 0
+        for i in rows:
+            self.store.cells[i, :num_cols] = texts[i]
+            self.dataChanged.emit(self.index(i, 0), self.index(i, num_cols - 1))
+        for j in cols:
+            self.store.cells[:len(texts), j] = [row[j] for row in texts]
+            self.dataChanged.emit(self.index(0, j), self.index(len(texts) - 1, j))
+
+    def set_cell(self, row, col, text):
+        self.store.set(row, col, text)
+        self.dataChanged.emit(self.index(row, col), self.index(row, col))
+
+    def dimensions(self):
+        return self.store.dimensions()
+
+    def read(self, rows, cols):
+        return self.store.read(rows, cols)
+
+
+#***********************************
+# Editor and view
+#***********************************
+class FocusLineEdit(QLineEdit):
+    focus_in_signal = pyqtSignal()
+    def focusInEvent(self, event):
+        super(FocusLineEdit, self).focusInEvent(event)
+        self.focus_in_signal.emit()  # Emit the focus signal when focused
+
+
+class MatrixDelegate(QStyledItemDelegate):
+    editor_focused = pyqtSignal(object)
+
+    def createEditor(self, parent, option, index):
+        editor = FocusLineEdit(parent)
+        editor.setAlignment(Qt.AlignCenter)
+        editor.focus_in_signal.connect(lambda: self.editor_focused.emit(editor))
+        return editor
+
+
+class MatrixView(QTableView):
+    focused = pyqtSignal()
+    paste_requested = pyqtSignal()     # Ctrl+V outside a cell editor: paste a whole matrix
+
+    def __init__(self, model, cell_width, cell_height, parent=None):
+        super().__init__(parent)
+        self.setModel(model)
+        self.delegate = MatrixDelegate(self)
+        self.setItemDelegate(self.delegate)
+        # Fixed section sizes let the view lay out huge models without measuring every cell
+        for header, size in ((self.horizontalHeader(), cell_width), (self.verticalHeader(), cell_height)):
+            header.setSectionResizeMode(QHeaderView.Fixed)
+            header.setDefaultSectionSize(size)
+            header.setMinimumSectionSize(size)
+            header.setFont(QFont("Arial", 7))
+        self.verticalHeader().setMinimumWidth(30)
+        self.verticalHeader().setDefaultAlignment(Qt.AlignCenter)
+        self.setWordWrap(False)
+        self.setStyleSheet("QTableView { gridline-color: black; }")
+        self.setEditTriggers(QAbstractItemView.AllEditTriggers)
+
+    def focusInEvent(self, event):
+        super().focusInEvent(event)
+        self.focused.emit()
+
+    def keyPressEvent(self, event):
+        if event.matches(QKeySequence.Paste):
+            self.paste_requested.emit()
+            return
+        super().keyPressEvent(event)
@@ -1,10 +1,19 @@
+import time
+startup_time = time.perf_counter()     # before any other import, for --profile-startup
+import multiprocessing
+import os
 import sys
-from PyQt5.QtWidgets import QApplication, QWidget, QLineEdit, QLabel, QGridLayout, QVBoxLayout, QHBoxLayout, QPushButton, QComboBox
-from PyQt5.QtCore import Qt
+from PyQt5.QtWidgets import QApplication, QWidget, QLabel, QVBoxLayout, QHBoxLayout, QPushButton, QComboBox, QProgressBar, QCheckBox, QScrollArea, QSpinBox, QFileDialog
+from PyQt5 import sip
+from PyQt5.QtCore import Qt, QObject, QRunnable, QThreadPool, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 from title_bar import TitleBar
-from sympy import Matrix, latex
-import pyperclip
+from matrix_model import MatrixModel, MatrixView
+from startup_profile import StartupProfile
+from instrumentation import PhaseStats, enable_json_log
+
+# sympy, the compute engine and pyperclip are imported on first use or by the background
+# EngineLoader once the window is painted, they would otherwise dominate time-to-first-paint
 
 #***********************************
 # Stylesheet Dark / Light
@@ -43,27 +52,59 @@ window_style_sheet = ["""
 #***********************************
 greek_letters = ['α', 'β', 'γ', 'δ', 'ε', 'ζ', 'η', 'θ', 'ι', 'κ', 'λ', 'μ', 'ν', 'ξ', 'ο', 'π', 'ρ', 'σ', 'τ', 'υ', 'φ', 'χ', 'ψ', 'ω']
 
-max_rows, max_cols = 5,5
+# Grids show at least min_rows x min_cols cells and grow with their content
+min_rows, min_cols = 5,5
 
-# pyinstaller --noconsole --onefile --distpath=./ --icon=icon.svg --name=Matrix_Multiplicators matrix_rechner.py 
+# Height the window grows by while the stats panel is open
+stats_panel_height = 70
 
-from PyQt5.QtCore import pyqtSignal
+# Exports with more cells than this (operands and result) go to a file instead of the clipboard
+clipboard_max_cells = 250000
 
-class FocusLineEdit(QLineEdit):
-    focus_in_signal = pyqtSignal()  
-    def focusInEvent(self, event):
-        super(FocusLineEdit, self).focusInEvent(event)
-        self.focus_in_signal.emit()  # Emit the focus signal when focused
+# Simplification levels of symbolic results (simplification.SIMPLIFY_LEVELS), cheapest first
+simplify_levels = [("No simplification", 'none'), ("Expand", 'expand'), ("Cancel / collect", 'cancel'),
+                   ("Trigsimp", 'trigsimp'), ("Full simplify", 'full')]
 
-class MatrixMultiplicationApp(QWidget):
+# Precision of numeric products (matrix_engine.PRECISIONS), mpmath at the digits next to it
+precision_modes = [("Auto precision", 'auto'), ("float32", 'float32'), ("float64 (BLAS)", 'float64'), ("mpmath", 'mpmath')]
+precision_digits = 50
+
+# Operations on the operands (matrix_algebra.OPERATIONS): the chain product, or one square Matrix 1
+# (solve: Matrix 1 and the right-hand sides in Matrix 2)
+operations = [("Multiply", 'multiply'), ("Power Mⁿ", 'power'), ("Inverse M⁻¹", 'inverse'), ("Solve M₁⁻¹·M₂", 'solve'),
+              ("Determinant", 'det')]
+
+#***********************************
+# Background import of the compute engine (sympy, numpy, scipy)
+#***********************************
+class EngineLoaderSignals(QObject):
+    loaded = pyqtSignal(float)     # seconds the import took
+
+
+class EngineLoader(QRunnable):
     def __init__(self):
         super().__init__()
+        self.signals = EngineLoaderSignals()
+
+    def run(self):
+        start = time.perf_counter()
+        import compute_worker  # noqa: F401  (pulls in matrix_engine and sympy)
+        self.signals.loaded.emit(time.perf_counter() - start)
+
+# pyinstaller --noconsole --onefile --distpath=./ --icon=icon.svg --name=Matrix_Multiplicators matrix_rechner.py 
+
+class MatrixMultiplicationApp(QWidget):
+    def __init__(self, startup_profile=None):
+        super().__init__()
+        self.startup_profile = startup_profile
+        self.painted = False
+        self.engine_loader = None
 
         #***********************************
         # Setup main window
         #***********************************
         self.setWindowTitle("Matrizen Multiplikator")   
-        self.setFixedSize(1250,625)
+        self.setFixedSize(1480,625)
         self.setWindowFlags(Qt.FramelessWindowHint)
         self.setStyleSheet(window_style_sheet[0])
         self.setWindowIcon(TitleBar.iconFromBase64(TitleBar.image_base64))
@@ -72,8 +113,22 @@ class MatrixMultiplicationApp(QWidget):
         # Initial conditions
         #***********************************
         self.current_line_edit = None
-        self.matlab_code = ''
-        self.latex_code = ''
+        self.target_view = None     # operand grid that paste/import fills
+        self.product = None     # last result, exported on demand
+        self.export_job = None
+        self.simplify_job = None
+        self.sweep_texts = {}   # last sweep values per symbol name
+        self.current_job = None
+        self.job_counter = 0
+        self.thread_pool = QThreadPool.globalInstance()
+        self.chain = None   # ChainProduct, created with the first compute job
+        self.operand_matrices = []
+        self.operand_views = []
+        self.operand_labels = []
+        self.result_version = None
+        self.live_timer = QTimer(self)
+        self.live_timer.setSingleShot(True)
+        self.live_timer.setInterval(200)
         #***********************************
         # Dropdown widgets and layout
         #***********************************
@@ -84,22 +139,83 @@ class MatrixMultiplicationApp(QWidget):
         dropdown_mode.setFocusPolicy(Qt.NoFocus)
         dropdown_mode.setCurrentIndex(0)
 
+        # Numeric products in float32, float64 or mpmath, each result comes with an error bound
+        self.precision_combo = QComboBox()
+        self.precision_combo.addItems([label for label, _ in precision_modes])
+        self.precision_combo.setFixedSize(130, 30)
+        self.precision_combo.setCursor(Qt.PointingHandCursor)
+        self.precision_combo.setFocusPolicy(Qt.NoFocus)
+        self.precision_combo.setToolTip("Auto: exact integers, float64 otherwise. float32 is fastest on large operands, "
+                                        "mpmath computes with the digits next to it")
+        self.digits_spinbox = QSpinBox()
+        self.digits_spinbox.setRange(1, 1000)
+        self.digits_spinbox.setValue(precision_digits)
+        self.digits_spinbox.setSuffix(" digits")
+        self.digits_spinbox.setFixedSize(95, 30)
+        self.digits_spinbox.setKeyboardTracking(False)
+        self.digits_spinbox.setEnabled(False)
+        self.digits_spinbox.setToolTip("Significant digits of mpmath products")
+
+        self.live_checkbox = QCheckBox("Live update")
+        self.live_checkbox.setCursor(Qt.PointingHandCursor)
+        self.live_checkbox.setFocusPolicy(Qt.NoFocus)
+
+        self.cse_checkbox = QCheckBox("Common subexpressions")
+        self.cse_checkbox.setCursor(Qt.PointingHandCursor)
+        self.cse_checkbox.setFocusPolicy(Qt.NoFocus)
+
+        # Worker processes for large symbolic products, 1 keeps everything in this process
+        workers_label = QLabel("Processes")
+        self.workers_spinbox = QSpinBox()
+        self.workers_spinbox.setRange(1, os.cpu_count() or 1)
+        self.workers_spinbox.setValue(os.cpu_count() or 1)
+        self.workers_spinbox.setFixedSize(60, 30)
+        self.workers_spinbox.setToolTip("Large symbolic products are split over this many processes")
+
+        add_operand_button = QPushButton("+ Matrix")
+        remove_operand_button = QPushButton("- Matrix")
+        # Out-of-core: multiply two .npy files larger than memory straight into a result file
+        files_button = QPushButton("Multiply files")
+        # Whole matrices from the clipboard or a file into the last focused grid
+        paste_button = QPushButton("Paste")
+        import_button = QPushButton("Import")
+        # Result (with operands) as MATLAB, LaTeX, Python, Julia or CSV file
+        export_button = QPushButton("Export")
+        for button in (add_operand_button, remove_operand_button, paste_button, import_button, files_button, export_button):
+            button.setFixedSize(110 if button is files_button else 80, 30)
+            button.setStyleSheet("""
+                QPushButton {
+                    background-color: lightgrey; 
+                    color: black; 
+                    font-size: 14px;
+                    border-radius: 10px;  /* Rounded border */
+                }
+                QPushButton:hover {
+                    background-color: grey;  /* Hand cursor on hover */
+                }
+            """)
+            button.setCursor(Qt.PointingHandCursor)
+            button.setFocusPolicy(Qt.NoFocus)
+
         dropdown_layout = QHBoxLayout()
         dropdown_layout.addWidget(dropdown_mode)
+        dropdown_layout.addWidget(self.precision_combo)
+        dropdown_layout.addWidget(self.digits_spinbox)
+        dropdown_layout.addWidget(self.live_checkbox)
+        dropdown_layout.addWidget(self.cse_checkbox)
+        dropdown_layout.addWidget(workers_label)
+        dropdown_layout.addWidget(self.workers_spinbox)
+        dropdown_layout.addWidget(add_operand_button)
+        dropdown_layout.addWidget(remove_operand_button)
+        dropdown_layout.addWidget(paste_button)
+        dropdown_layout.addWidget(import_button)
+        dropdown_layout.addWidget(files_button)
+        dropdown_layout.addWidget(export_button)
         dropdown_layout.addStretch(1)
 
         #***********************************
-        # 'x' and '=' labels and layouts
+        # '=' label and layout ('x' labels are created per operand)
         #***********************************
-        equals_label = QLabel("x")
-        equals_label.setFixedSize(50, 50)  
-        equals_label.setFont(QFont("Arial", 36, QFont.Bold))  
-        equals_label.setAlignment(Qt.AlignCenter)  
-        equals_layout = QVBoxLayout()
-        equals_layout.addStretch(1)
-        equals_layout.addWidget(equals_label)
-        equals_layout.addStretch(1)
-
         cross_label = QLabel("=")
         cross_label.setFixedSize(50, 50)
         cross_label.setFont(QFont("Arial", 48, QFont.Bold))  
@@ -110,22 +226,34 @@ class MatrixMultiplicationApp(QWidget):
         cross_layout.addStretch(1)
 
         #***********************************
-        # Matrizes and layout [M] 'x' [M] '=' [M]
+        # Matrizes and layout [M] 'x' [M] 'x' ... '=' [M]
+        #  - the operand chain scrolls horizontally once it no longer fits
         #***********************************
-        self.left_matrix = self.create_matrix_grid(max_rows, max_cols, False, 40, 40)
-        self.right_matrix = self.create_matrix_grid(max_rows, max_cols, False, 40, 40)
-        self.result_matrix = self.create_matrix_grid(max_rows, max_cols, True, 90, 40)
-        self.left_matrix.setObjectName('left_matrix')
-        self.right_matrix.setObjectName('right_matrix')
-        self.result_matrix.setObjectName('result_matrix')
+        operands_widget = QWidget()
+        self.operands_layout = QHBoxLayout(operands_widget)
+        self.operands_layout.setContentsMargins(0, 0, 0, 0)
+        self.operands_layout.addStretch(1)
+        operands_scroll = QScrollArea()
+        operands_scroll.setWidget(operands_widget)
+        operands_scroll.setWidgetResizable(True)
+        operands_scroll.setFixedSize(600, 260)
+        operands_scroll.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        operands_scroll.setStyleSheet("QScrollArea { border: none; }")
+
+        self.add_operand()
+        self.add_operand()
+        self.left_matrix, self.left_view = self.operand_matrices[0], self.operand_views[0]
+        self.right_matrix, self.right_view = self.operand_matrices[1], self.operand_views[1]
+        self.result_matrix, self.result_view = self.create_matrix_grid(True, 90, 40, 500)
+        self.left_view.setObjectName('left_matrix')
+        self.right_view.setObjectName('right_matrix')
+        self.result_view.setObjectName('result_matrix')
 
         matrix_layout = QHBoxLayout()
         matrix_layout.setContentsMargins(20, 20, 20, 20)
-        matrix_layout.addLayout(self.left_matrix)
-        matrix_layout.addLayout(equals_layout)
-        matrix_layout.addLayout(self.right_matrix)
+        matrix_layout.addWidget(operands_scroll)
         matrix_layout.addLayout(cross_layout)
-        matrix_layout.addLayout(self.result_matrix)
+        matrix_layout.addWidget(self.result_view)
 
         #***********************************
         # Greek letter buttons 'α' - 'ω' and layout
@@ -149,6 +277,7 @@ class MatrixMultiplicationApp(QWidget):
                                 """)
             button.clicked.connect(lambda checked, l=letter: self.insert_greek_letter(l))
             button.setCursor(Qt.PointingHandCursor)
+            button.setFocusPolicy(Qt.NoFocus)  # keep the open cell editor focused
             greek_button_layout.addWidget(button)
 
         #***********************************
@@ -228,11 +357,101 @@ class MatrixMultiplicationApp(QWidget):
         self.error_label.setFont(QFont("Arial", 14, QFont.Bold))  
         self.error_label.setStyleSheet("QLabel { color : red; }")
         self.error_label.setAlignment(Qt.AlignCenter)  
-        error_layout = QVBoxLayout()
+
+        #***********************************
+        # Busy indicator and 'Cancel' button for running compute jobs
+        #***********************************
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setFixedSize(200, 20)
+        self.progress_bar.setTextVisible(False)
+        self.progress_bar.hide()
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setFixedSize(150,40)
+        self.cancel_button.setStyleSheet("""
+            QPushButton {
+                background-color: red; 
+                color: white; 
+                font-size: 16px;
+                border-radius: 10px;  /* Rounded border */
+            }
+            QPushButton:hover {
+                background-color: #CC0000;  /* Hand cursor on hover */
+            }
+        """)
+        self.cancel_button.setCursor(Qt.PointingHandCursor)
+        self.cancel_button.hide()
+
+        error_layout = QHBoxLayout()
         error_layout.addStretch(1)
         error_layout.addWidget(self.error_label)
+        error_layout.addWidget(self.progress_bar)
+        error_layout.addWidget(self.cancel_button)
         error_layout.addStretch(1)
 
+        #***********************************
+        # Collapsible stats panel: per-phase timings and counters of the last compute
+        #***********************************
+        self.stats_button = QPushButton("▸ Stats")
+        self.stats_button.setCheckable(True)
+        self.stats_button.setFixedSize(80, 25)
+        self.stats_button.setFlat(True)
+        self.stats_button.setCursor(Qt.PointingHandCursor)
+        self.stats_button.setFocusPolicy(Qt.NoFocus)
+
+        self.stats_label = QLabel("No computation yet")
+        self.stats_label.setFixedHeight(stats_panel_height - 10)
+        self.stats_label.setFont(QFont("Courier New", 9))
+        self.stats_label.setWordWrap(True)
+        self.stats_label.setTextInteractionFlags(Qt.TextSelectableByMouse)
+        self.stats_label.hide()
+
+        # Evaluate the symbolic result over sweeps of its free symbols
+        evaluate_button = QPushButton("Evaluate")
+        evaluate_button.setFixedSize(100, 25)
+        evaluate_button.setCursor(Qt.PointingHandCursor)
+        evaluate_button.setFocusPolicy(Qt.NoFocus)
+        evaluate_button.setToolTip("Evaluate the result over arrays of values of its symbols, saved as .npy or CSV")
+
+        # Symbolic results are shown at once, simpler forms replace the entries in the background
+        self.simplify_combo = QComboBox()
+        self.simplify_combo.addItems([label for label, _ in simplify_levels])
+        self.simplify_combo.setFixedSize(170, 25)
+        self.simplify_combo.setCursor(Qt.PointingHandCursor)
+        self.simplify_combo.setFocusPolicy(Qt.NoFocus)
+        self.simplify_combo.setToolTip("Simplify symbolic results in the background, each entry within a time budget")
+
+        # Power, inverse, solve and determinant reuse the factorization of an unchanged Matrix 1
+        self.operation_combo = QComboBox()
+        self.operation_combo.addItems([label for label, _ in operations])
+        self.operation_combo.setFixedSize(140, 25)
+        self.operation_combo.setCursor(Qt.PointingHandCursor)
+        self.operation_combo.setFocusPolicy(Qt.NoFocus)
+        self.operation_combo.setToolTip("Multiply the chain, or apply an operation to the square Matrix 1")
+        self.exponent_spinbox = QSpinBox()
+        self.exponent_spinbox.setRange(-1000, 1000)
+        self.exponent_spinbox.setValue(2)
+        self.exponent_spinbox.setPrefix("n = ")
+        self.exponent_spinbox.setFixedSize(90, 25)
+        self.exponent_spinbox.setKeyboardTracking(False)
+        self.exponent_spinbox.setEnabled(False)
+        self.exponent_spinbox.setToolTip("Exponent of the power, negative powers are powers of the inverse")
+
+        # Hits and misses of the persistent result cache in this session
+        self.cache_label = QLabel("")
+        self.cache_label.setFixedWidth(180)
+        self.cache_label.setFont(QFont("Courier New", 9))
+        self.cache_label.setAlignment(Qt.AlignRight | Qt.AlignTop)
+
+        stats_layout = QHBoxLayout()
+        stats_layout.addWidget(self.stats_button, alignment=Qt.AlignTop)
+        stats_layout.addWidget(self.stats_label, 1)
+        stats_layout.addWidget(self.operation_combo, alignment=Qt.AlignTop)
+        stats_layout.addWidget(self.exponent_spinbox, alignment=Qt.AlignTop)
+        stats_layout.addWidget(evaluate_button, alignment=Qt.AlignTop)
+        stats_layout.addWidget(self.simplify_combo, alignment=Qt.AlignTop)
+        stats_layout.addWidget(self.cache_label, alignment=Qt.AlignTop)
+
         #***********************************
         # Main Layout:
         #  - Dropdown
@@ -247,6 +466,7 @@ class MatrixMultiplicationApp(QWidget):
         main_layout.addLayout(matrix_layout)
         main_layout.addLayout(greek_button_layout)
         main_layout.addLayout(buttons_layout)
+        main_layout.addLayout(stats_layout)
         main_layout.addLayout(error_layout)
 
         #***********************************
@@ -262,7 +482,50 @@ class MatrixMultiplicationApp(QWidget):
         reset_button.clicked.connect(self.reset)
         latex_button.clicked.connect(self.copy_latex_code)
         matlab_button.clicked.connect(self.copy_matlab_code)
+        self.cancel_button.clicked.connect(self.cancel_compute)
         dropdown_mode.currentIndexChanged.connect(self.on_dropdown_mode_selection)
+        self.precision_combo.currentIndexChanged.connect(self.on_precision_changed)
+        self.digits_spinbox.valueChanged.connect(self.on_precision_changed)
+        self.live_timer.timeout.connect(self.compute)
+        add_operand_button.clicked.connect(self.add_operand)
+        remove_operand_button.clicked.connect(self.remove_operand)
+        files_button.clicked.connect(self.multiply_files)
+        self.stats_button.toggled.connect(self.toggle_stats_panel)
+        evaluate_button.clicked.connect(self.evaluate_result)
+        self.simplify_combo.currentIndexChanged.connect(self.on_simplify_level_changed)
+        self.operation_combo.currentIndexChanged.connect(self.on_operation_changed)
+        self.exponent_spinbox.valueChanged.connect(self.on_operation_changed)
+        paste_button.clicked.connect(self.paste_matrix)
+        import_button.clicked.connect(self.import_matrix)
+        export_button.clicked.connect(lambda: self.export_result())
+
+    #***********************************
+    # Startup: the engine is imported in the background once the window is on screen
+    #***********************************
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if not self.painted:
+            self.painted = True
+            if self.startup_profile is not None:
+                self.startup_profile.mark("show and first paint")
+            QTimer.singleShot(0, self.preload_engine)
+
+    def preload_engine(self):
+        self.engine_loader = EngineLoader()
+        self.engine_loader.signals.loaded.connect(self.on_engine_loaded)
+        self.thread_pool.start(self.engine_loader)
+
+    def on_engine_loaded(self, seconds):
+        if self.startup_profile is not None:
+            self.startup_profile.add("engine import (background)", seconds)
+            self.startup_profile.report("time to first paint")
+            QApplication.instance().quit()
+
+    def product_chain(self):
+        if self.chain is None:
+            from matrix_engine import ChainProduct
+            self.chain = ChainProduct()
+        return self.chain
 
     #***********************************
     # Dropdown functions
@@ -271,167 +534,553 @@ class MatrixMultiplicationApp(QWidget):
         self.setStyleSheet(window_style_sheet[index])
         self.title_bar.title_label.setStyleSheet(window_style_sheet[index])
 
+    def precision(self):
+        return precision_modes[self.precision_combo.currentIndex()][1]
+
+    def on_precision_changed(self, value):
+        self.digits_spinbox.setEnabled(self.precision() == 'mpmath')
+        # mixed products round their numeric sub-products to the precision as well
+        if self.product is not None and (self.product.is_numeric or any(operand.is_numeric for operand in self.product.operands)):
+            self.compute()
+
+    def operation(self):
+        name = operations[self.operation_combo.currentIndex()][1]
+        if name == 'multiply':
+            return None
+        return (name, self.exponent_spinbox.value()) if name == 'power' else (name,)
+
+    def on_operation_changed(self, value):
+        self.exponent_spinbox.setEnabled(operations[self.operation_combo.currentIndex()][1] == 'power')
+        if self.product is not None:
+            self.compute()
+
     #***********************************
     # Grid and Matrices creation and handle funcions
     #***********************************
-    def create_matrix_grid(self, rows, cols, read_only, width, height):
-        grid = QGridLayout()
-        for row in range(rows):
-            for col in range(cols):
-                line_edit = FocusLineEdit(self)                
-                line_edit.setFixedSize(width, height)  
-                line_edit.setAlignment(Qt.AlignCenter)  
-                line_edit.setStyleSheet("background-color: lightgrey; border: 1px solid black;")
-                if read_only:
-                    line_edit.setReadOnly(True)
-                else:
-                    line_edit.focus_in_signal.connect(self.set_current_line_edit)
-                line_edit.textChanged.connect(lambda text, le=line_edit: self.handle_text_change(le))
-                grid.addWidget(line_edit, row, col)
-        return grid
-
-    def set_current_line_edit(self):
-        self.current_line_edit = self.sender()
+    def create_matrix_grid(self, read_only, width, height, view_width):
+        model = MatrixModel(read_only, min_rows, min_cols, self)
+        view = MatrixView(model, width, height, self)
+        view.setFixedSize(view_width, 230)
+        if not read_only:
+            view.delegate.editor_focused.connect(self.set_current_line_edit)
+            view.focused.connect(lambda: self.set_target_view(view))
+            view.paste_requested.connect(lambda: self.paste_matrix(view))
+            model.cell_changed.connect(self.handle_cell_change)
+        return model, view
+
+    # In live-update mode every edit schedules a (debounced) incremental compute
+    def handle_cell_change(self, row, col):
+        self.schedule_live_compute()
+
+    def schedule_live_compute(self):
+        if self.live_checkbox.isChecked():
+            self.live_timer.start()
+
+    # Operands of the chain: [M] 'x' [M] 'x' [M] ...
+    def add_operand(self):
+        if self.operand_matrices:
+            equals_label = QLabel("x")
+            equals_label.setFixedSize(50, 50)  
+            equals_label.setFont(QFont("Arial", 36, QFont.Bold))  
+            equals_label.setAlignment(Qt.AlignCenter)  
+            self.operands_layout.insertWidget(self.operands_layout.count() - 1, equals_label)
+            self.operand_labels.append(equals_label)
+        matrix, view = self.create_matrix_grid(False, 40, 40, 240)
+        self.operands_layout.insertWidget(self.operands_layout.count() - 1, view)
+        self.operand_matrices.append(matrix)
+        self.operand_views.append(view)
+        self.schedule_live_compute()
+
+    def remove_operand(self):
+        if len(self.operand_matrices) <= 2:
+            return
+        self.operand_matrices.pop()
+        self.operand_views.pop().deleteLater()
+        self.operand_labels.pop().deleteLater()
+        self.schedule_live_compute()
+
+    def set_current_line_edit(self, line_edit):
+        self.current_line_edit = line_edit
+
+    def set_target_view(self, view):
+        self.target_view = view
+
+    #***********************************
+    # Paste / import of whole matrices: one model reset per grid, one repaint
+    #***********************************
+    def paste_matrix(self, view=None):
+        from matrix_engine import EngineError
+        from matrix_io import parse_matrix_text
+        view = view or self.target_operand_view()
+        try:
+            rows = parse_matrix_text(QApplication.clipboard().text())
+        except EngineError as error:
+            self.error_label.setText(str(error))
+            return
+        # a single value goes into the current cell, like pasting into the cell editor
+        if len(rows) == 1 and len(rows[0]) == 1 and view.currentIndex().isValid():
+            view.model().setData(view.currentIndex(), rows[0][0])
+            return
+        self.fill_matrix(view, rows)
+
+    def import_matrix(self):
+        from matrix_engine import EngineError
+        from matrix_io import read_rows
+        view = self.target_operand_view()
+        path, _ = QFileDialog.getOpenFileName(self, "Import matrix", "",
+                                              "Matrices (*.txt *.m *.csv *.tsv *.tex *.npy *.mtx);;All files (*)")
+        if not path:
+            return
+        try:
+            rows = read_rows(path)
+        except EngineError as error:
+            self.error_label.setText(str(error))
+            return
+        self.fill_matrix(view, rows)
+
+    def target_operand_view(self):
+        if self.target_view in self.operand_views:
+            return self.target_view
+        return self.operand_views[0]
+
+    def fill_matrix(self, view, rows):
+        view.model().set_rows(rows)
+        self.error_label.setText(f"{len(rows)}x{max(len(row) for row in rows)} matrix loaded into Matrix {self.operand_views.index(view) + 1}")
+        self.schedule_live_compute()
 
     def copy_matlab_code(self):
-        pyperclip.copy(self.matlab_code)
+        self.copy_export('matlab')
 
     def copy_latex_code(self):
-        pyperclip.copy(self.latex_code)
+        self.copy_export('latex')
 
-    def insert_greek_letter(self, letter):
-        if self.current_line_edit is not None:
-            self.current_line_edit.insert(letter)
+    #***********************************
+    # Exports: generated only when copied or saved, in a background job
+    #***********************************
+    def copy_export(self, name):
+        if self.product is None:
+            self.error_label.setText("Nothing to copy, compute a result first")
+            return
+        product = self.product
+        cells = sum(source.shape[0] * source.shape[1] for source in product.operands + [product])
+        if cells > clipboard_max_cells:
+            self.error_label.setText("Too large for the clipboard, save it to a file instead")
+            self.export_result(name)
+            return
+        self.start_export_job(name, None)
+
+    def export_result(self, name=None):
+        from exporters import EXPORTERS, exporter_for_path
+        if self.product is None:
+            self.error_label.setText("Nothing to export, compute a result first")
+            return
+        filters = {f"{exporter.title} (*{exporter.extension})": exporter for exporter in EXPORTERS.values()}
+        selected = next((text for text, exporter in filters.items() if exporter.name == name), "")
+        path, selected = QFileDialog.getSaveFileName(self, "Export result", "", ';;'.join(filters), selected)
+        if not path:
+            return
+        exporter = exporter_for_path(path)
+        if exporter is None:
+            exporter = filters.get(selected, EXPORTERS['matlab'])
+            path += exporter.extension
+        self.start_export_job(exporter.name, path)
+
+    def start_export_job(self, name, path):
+        from compute_worker import ExportJob
+        if self.export_job is not None:
+            self.export_job.cancel()
+        self.job_counter += 1
+        job = ExportJob(self.job_counter, self.product, name, path)
+        job.signals.progress.connect(self.on_export_progress)
+        job.signals.finished.connect(self.on_export_finished)
+        job.signals.failed.connect(self.on_export_failed)
+        job.signals.cancelled.connect(self.on_export_cancelled)
+        self.export_job = job
+        self.error_label.setText("Exporting ...")
+        self.thread_pool.start(job)
 
-    def handle_text_change(self, line_edit):
-        if line_edit.text():
-            line_edit.setStyleSheet("background-color: white; border: 1px solid black;")
+    def is_export_job(self, job_id):
+        return self.export_job is not None and self.export_job.job_id == job_id
+
+    def on_export_progress(self, job_id, done, total):
+        if self.is_export_job(job_id):
+            self.error_label.setText(f"Exporting ... {done * 100 // total}%")
+
+    def on_export_finished(self, job_id, result):
+        if not self.is_export_job(job_id):
+            return
+        job, self.export_job = self.export_job, None
+        if job.path is None:
+            import pyperclip
+            pyperclip.copy(result)
+            self.error_label.setText("Copied to the clipboard")
         else:
-            line_edit.setStyleSheet("background-color: lightgrey; border: 1px solid black;")
+            self.error_label.setText(f"{os.path.basename(result)} written")
+
+    def on_export_failed(self, job_id, message):
+        if self.is_export_job(job_id):
+            self.export_job = None
+            self.error_label.setText(message)
+
+    def on_export_cancelled(self, job_id):
+        if self.is_export_job(job_id):
+            self.export_job = None
+
+    def insert_greek_letter(self, letter):
+        # Insert into the open cell editor, otherwise append to the current cell
+        if self.current_line_edit is not None and not sip.isdeleted(self.current_line_edit):
+            self.current_line_edit.insert(letter)
+            return
+        for view in self.operand_views:
+            index = view.currentIndex()
+            if view.hasFocus() and index.isValid():
+                view.model().setData(index, index.data() + letter)
 
     #***********************************
     # Function which check for correctly filled matrices
     #***********************************
     def check_matrix_sizes(self, matrix):
-        num_rows, num_cols = 0, 0
-        # Find empty matrix
-        if matrix.itemAtPosition(0, 0).widget().text().strip() == "":
-            return 0, 0, False
-        # Set dimensions
-        for i in range(max_cols):
-            if matrix.itemAtPosition(i, 0).widget().text().strip() != "":
-                num_rows += 1
-            if matrix.itemAtPosition(0, i).widget().text().strip() != "":
-                num_cols += 1
-        # Check dimensions with other rows and cols
-        filled_rows = 0
-        for row in range(max_rows):
-            filled_cols = 0
-            value_in_row = False
-            for col in range(max_cols):
-                if matrix.itemAtPosition(row, col).widget().text().strip() != "":
-                    filled_cols += 1  
-                    value_in_row = True              
-            if value_in_row: 
-                if filled_cols != num_cols:
-                    return num_rows, num_cols, False
-                filled_rows += 1  
-        if filled_rows != num_rows:
-            return num_rows, num_cols, False        
-        return num_rows, num_cols, True
+        return matrix.dimensions()
 
     #***********************************
     # Function which does the (meth) math
     #***********************************
     def compute(self):
-        for widget in self.findChildren(QLineEdit, name='result_matrix'):
-            widget.clear()
-            widget.setStyleSheet("background-color: lightgrey; border: 1px solid black;")
-
-        lm_rows, lm_cols, lm_valid = self.check_matrix_sizes(self.left_matrix)
-        rm_rows, rm_cols, rm_valid = self.check_matrix_sizes(self.right_matrix)
-        if (not lm_valid) and (not rm_valid):
-            self.error_label.setText("Invalid Left and Right Matrix")
-        elif not lm_valid:
-            self.error_label.setText("Invalid Left Matrix")
-        elif not rm_valid:
-            self.error_label.setText("Invalid Right Matrix")
-        elif lm_rows != rm_cols or lm_cols != rm_rows:
+        self.drop_current_job()
+        self.drop_simplify_job()
+
+        stats = PhaseStats()
+        operation = self.operation()
+        # an operation reads Matrix 1, solve also Matrix 2, the other grids are left alone
+        matrices = self.operand_matrices if operation is None else self.operand_matrices[:2 if operation[0] == 'solve' else 1]
+        with stats.phase('validate'):
+            dimensions = [self.check_matrix_sizes(matrix) for matrix in matrices]
+        invalid = [index for index, (_, _, valid) in enumerate(dimensions) if not valid]
+        if invalid:
+            self.error_label.setText(self.invalid_matrix_message(invalid))
+            self.clear_result()
+            return
+        elif operation is None and any(a[1] != b[0] for a, b in zip(dimensions, dimensions[1:])):
             self.error_label.setText("Invalid Matrix Dimensions!")
+            self.clear_result()
+            return
         else:
             self.error_label.setText("")
 
-        M_R = Matrix([[self.right_matrix.itemAtPosition(i, j).widget().text() for i in range(rm_rows)] for j in range(rm_cols)])
-        M_L = Matrix([[self.left_matrix.itemAtPosition(i, j).widget().text() for i in range(lm_rows)] for j in range(lm_cols)])
-
-        M_Res = M_R * M_L
-
-        self.matlab_code += f"{'M_L'} = ["
-        for i in range(M_L.shape[0]):
-            row_entries = ' '.join([str(M_L[i, j]) for j in range(M_L.shape[1])]) 
-            self.matlab_code += row_entries
-            if i < M_L.shape[0] - 1:
-                self.matlab_code += "; "
-        self.matlab_code += "];\n"
-
-        self.matlab_code += f"{'M_R'} = ["
-        for i in range(M_R.shape[0]):
-            row_entries = ' '.join([str(M_R[i, j]) for j in range(M_R.shape[1])]) 
-            self.matlab_code += row_entries
-            if i < M_R.shape[0] - 1:
-                self.matlab_code += "; "
-        self.matlab_code += "];\n"
-
-        self.matlab_code += 'M_Res = M_L * M_R'
-
-        self.latex_code = latex(M_L) + '$\\times$' + latex(M_R) + '$=$' + latex(M_Res) 
-        print(M_Res)
-        print(self.latex_code)
-        print(self.matlab_code)
-        for row in range(M_Res.shape[0]):
-            for col in range(M_Res.shape[1]):
-                result_field = self.result_matrix.itemAtPosition(row, col).widget()                
-                if result_field is not None:
-                    result_field.setText(str(M_Res[row, col]))
-
-        """ for i in range(lm_rows):         # Loop over rows of left matrix
-            for j in range(rm_cols):     # Loop over columns of right matrix
-                result_string = ''    
-                for k in range(lm_cols): # Loop over columns of left matrix (or rows of right matrix)
-                    left_item = self.left_matrix.itemAtPosition(i, k).widget()
-                    right_item = self.right_matrix.itemAtPosition(k, j).widget()
-                    if self.current_result_view == 'reduced':
-                        if str(left_item.text()) == '0' or str(right_item.text()) == '0': 
-                            continue
-                        elif str(left_item.text()) == '1':
-                            result_string +=  ('+' + str(right_item.text()))
-                        elif str(right_item.text()) == '1':
-                            result_string +=  ('+' + str(left_item.text()))
-                        else:
-                            result_string +=  ('+' + str(left_item.text()) + "*" + str(right_item.text()))
-                    else:
-                        result_string +=  ('+' + str(left_item.text()) + "*" + str(right_item.text()))
-
-                result_field = self.result_matrix.itemAtPosition(i, j).widget()
-                if result_field is not None:
-                    print("updating field with: " + result_string + "with current_view: " + self.current_result_view)
-                    result_field.setText(result_string[1:])
- """
+        with stats.phase('read'):
+            operands = [self.read_matrix(matrix, rows, cols) for matrix, (rows, cols, _) in zip(matrices, dimensions)]
+        stats.set('operand cells', sum(rows * cols for rows, cols, _ in dimensions))
+        self.start_compute_job(operands, stats, operation)
+
+    def invalid_matrix_message(self, invalid):
+        if len(self.operand_matrices) == 2:
+            if len(invalid) == 2:
+                return "Invalid Left and Right Matrix"
+            return "Invalid Left Matrix" if invalid[0] == 0 else "Invalid Right Matrix"
+        return "Invalid Matrix " + ", ".join(str(index + 1) for index in invalid)
+
+    #***********************************
+    # Background compute jobs: start, cancel and receive results
+    #***********************************
+    def start_compute_job(self, operands, stats=None, operation=None):
+        from compute_worker import ComputeJob
+        from matrix_engine import configure_parallel, configure_precision
+        configure_parallel(workers=self.workers_spinbox.value())
+        configure_precision(self.precision(), self.digits_spinbox.value())
+        self.job_counter += 1
+        job = ComputeJob(self.job_counter, operands, self.product_chain(), self.cse_checkbox.isChecked(), stats, operation)
+        job.signals.progress.connect(self.on_compute_progress)
+        job.signals.finished.connect(self.on_compute_finished)
+        job.signals.failed.connect(self.on_compute_failed)
+        job.signals.cancelled.connect(self.on_compute_cancelled)
+        self.current_job = job
+        self.set_busy(True)
+        self.thread_pool.start(job)
+
+    def drop_current_job(self):
+        # Results of a dropped job are ignored, see is_current_job()
+        if self.current_job is not None:
+            self.current_job.cancel()
+            self.current_job = None
+        self.set_busy(False)
+
+    def cancel_compute(self):
+        self.drop_current_job()
+        self.error_label.setText("Computation cancelled")
+
+    def set_busy(self, busy):
+        # Range (0, 0) shows the indeterminate busy animation until the first progress report
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setVisible(busy)
+        self.cancel_button.setVisible(busy)
+
+    def is_current_job(self, job_id):
+        return self.current_job is not None and self.current_job.job_id == job_id
+
+    def on_compute_progress(self, job_id, done, total):
+        if self.is_current_job(job_id):
+            self.progress_bar.setRange(0, total)
+            self.progress_bar.setValue(done)
+
+    def on_compute_failed(self, job_id, message):
+        if self.is_current_job(job_id):
+            self.current_job = None
+            self.set_busy(False)
+            self.error_label.setText(message)
+            self.clear_result()
+
+    def on_compute_cancelled(self, job_id):
+        if self.is_current_job(job_id):
+            self.current_job = None
+            self.set_busy(False)
+
+    def on_compute_finished(self, job_id, result):
+        if not self.is_current_job(job_id):
+            return
+        self.current_job = None
+        self.set_busy(False)
+        product = result.product
+        self.product = product
+        with result.stats.phase('display'):
+            if product.changed is not None and product.base_version == self.result_version:
+                self.result_matrix.update_cells(result.texts, *product.changed)
+            else:
+                self.result_matrix.set_rows(result.texts)
+        self.result_version = product.version
+        self.show_stats(job_id, result.stats)
+        self.show_cache_counter()
+        self.show_temporaries(product)
+        self.show_error_bound(product)
+        self.start_simplify_job(product)
+
+    def show_error_bound(self, product):
+        if product.error_bound is None:
+            return
+        bound = "exact" if product.error_bound == 0 else f"every entry within ±{product.error_bound:.2g}"
+        if product.error_bound == float('inf'):
+            bound = "no error bound available"
+        self.result_view.setToolTip(f"{product.precision}: {bound}")
+        # Auto keeps today's quiet result, a chosen precision says what it costs
+        if self.precision() != 'auto':
+            self.error_label.setText(f"{product.precision}: {bound}")
+
+    def show_temporaries(self, product):
+        # With CSE the grid shows reduced forms, the temporaries are listed on hover
+        temporaries = product.temporaries_text()
+        self.result_view.setToolTip(temporaries)
+        if temporaries:
+            self.error_label.setText(f"{len(product.cse[0])} common subexpressions (hover result)")
+
+    #***********************************
+    # Background simplification: entries are replaced in the result grid as simpler forms arrive
+    #***********************************
+    def simplify_level(self):
+        return simplify_levels[self.simplify_combo.currentIndex()][1]
+
+    def on_simplify_level_changed(self, index):
+        # a lower level needs the unsimplified result again, recomputing gets it (from the cache)
+        if self.product is not None and not self.product.is_numeric:
+            self.compute()
+
+    def start_simplify_job(self, product):
+        self.drop_simplify_job()
+        if self.simplify_level() == 'none' or product.is_numeric:
+            return
+        from compute_worker import SimplifyJob
+        self.job_counter += 1
+        job = SimplifyJob(self.job_counter, product, self.simplify_level())
+        job.signals.progress.connect(self.on_simplify_progress)
+        job.signals.simplified.connect(self.on_entry_simplified)
+        job.signals.finished.connect(self.on_simplify_finished)
+        job.signals.failed.connect(self.on_simplify_failed)
+        job.signals.cancelled.connect(self.on_simplify_failed)
+        self.simplify_job = job
+        self.thread_pool.start(job)
+
+    def drop_simplify_job(self):
+        if self.simplify_job is not None:
+            self.simplify_job.cancel()
+            self.simplify_job = None
+
+    def is_simplify_job(self, job_id):
+        return self.simplify_job is not None and self.simplify_job.job_id == job_id
+
+    def on_simplify_progress(self, job_id, done, total):
+        if self.is_simplify_job(job_id):
+            self.error_label.setText(f"Simplifying ... {done}/{total}")
+
+    def on_entry_simplified(self, job_id, row, col, form):
+        if not self.is_simplify_job(job_id):
+            return
+        self.product.set_entry(row, col, form)
+        if self.product.cse is None:
+            self.result_matrix.set_cell(row, col, str(form))
+        # the grid no longer shows what the incremental engine holds, the next result is shown in full
+        self.result_version = None
+
+    def on_simplify_finished(self, job_id, result):
+        if not self.is_simplify_job(job_id):
+            return
+        self.simplify_job = None
+        counts, product_cse = result
+        if product_cse is not None:
+            self.product.set_cse(product_cse)
+            self.result_matrix.set_rows(self.product.texts())
+            self.show_temporaries(self.product)
+        over_budget = counts['over budget'] + counts['skipped']
+        self.error_label.setText(f"{counts['simplified entries']} entries simplified"
+                                 + (f", {over_budget} over the time budget" if over_budget else ""))
+
+    def on_simplify_failed(self, job_id, message=None):
+        if self.is_simplify_job(job_id):
+            self.simplify_job = None
+            self.error_label.setText(message or "")
+
+    #***********************************
+    # Out-of-core jobs: progress and outcome go to the status label, the grids stay untouched
+    #***********************************
+    def multiply_files(self):
+        file_filter = "NumPy arrays (*.npy)"
+        left_path, _ = QFileDialog.getOpenFileName(self, "Left matrix", "", file_filter)
+        if not left_path:
+            return
+        right_path, _ = QFileDialog.getOpenFileName(self, "Right matrix", "", file_filter)
+        if not right_path:
+            return
+        output_path, _ = QFileDialog.getSaveFileName(self, "Save result as", "", file_filter)
+        if not output_path:
+            return
+        if not output_path.lower().endswith('.npy'):
+            output_path += '.npy'
+        from compute_worker import OutOfCoreJob
+        self.drop_current_job()
+        self.job_counter += 1
+        job = OutOfCoreJob(self.job_counter, left_path, right_path, output_path)
+        job.signals.progress.connect(self.on_out_of_core_progress)
+        job.signals.finished.connect(self.on_out_of_core_finished)
+        job.signals.failed.connect(self.on_out_of_core_failed)
+        job.signals.cancelled.connect(self.on_compute_cancelled)
+        self.current_job = job
+        self.error_label.setText("Multiplying files ...")
+        self.set_busy(True)
+        self.thread_pool.start(job)
+
+    def on_out_of_core_progress(self, job_id, done, total):
+        if self.is_current_job(job_id):
+            self.on_compute_progress(job_id, done, total)
+            self.error_label.setText(f"Multiplying files: tile {done}/{total}")
+
+    def on_out_of_core_finished(self, job_id, result):
+        if self.is_current_job(job_id):
+            self.current_job = None
+            self.set_busy(False)
+            output_path, shape, dtype = result
+            self.error_label.setText(f"{os.path.basename(output_path)}: {shape[0]}x{shape[1]} {dtype} written")
+
+    def on_out_of_core_failed(self, job_id, message):
+        if self.is_current_job(job_id):
+            self.current_job = None
+            self.set_busy(False)
+            self.error_label.setText(message)
+
+    #***********************************
+    # Parameter sweeps: the result is compiled once and evaluated over arrays of symbol values
+    #***********************************
+    def evaluate_result(self):
+        if self.product is None:
+            self.error_label.setText("Nothing to evaluate, compute a result first")
+            return
+        if self.product.is_numeric or not self.product.matrix().free_symbols:
+            self.error_label.setText("The result has no symbols to evaluate")
+            return
+        from sweep_dialog import SweepDialog
+        names = sorted(symbol.name for symbol in self.product.matrix().free_symbols)
+        dialog = SweepDialog(names, self.sweep_texts, self)
+        if dialog.exec_() != SweepDialog.Accepted:
+            return
+        self.sweep_texts.update(dialog.texts())
+        path, selected = QFileDialog.getSaveFileName(self, "Save evaluation as", "",
+                                                    "NumPy stack (N, rows, cols) (*.npy);;CSV, one line per sample (*.csv)")
+        if not path:
+            return
+        if not path.lower().endswith(('.npy', '.csv')):
+            path += '.csv' if selected.startswith('CSV') else '.npy'
+        from compute_worker import SweepJob
+        self.drop_current_job()
+        self.job_counter += 1
+        job = SweepJob(self.job_counter, self.product, {name: self.sweep_texts[name] for name in names}, path)
+        job.signals.progress.connect(self.on_sweep_progress)
+        job.signals.finished.connect(self.on_sweep_finished)
+        job.signals.failed.connect(self.on_out_of_core_failed)
+        job.signals.cancelled.connect(self.on_compute_cancelled)
+        self.current_job = job
+        self.error_label.setText("Evaluating ...")
+        self.set_busy(True)
+        self.thread_pool.start(job)
+
+    def on_sweep_progress(self, job_id, done, total):
+        if self.is_current_job(job_id):
+            self.on_compute_progress(job_id, done, total)
+            self.error_label.setText(f"Evaluating: {done}/{total} samples")
+
+    def on_sweep_finished(self, job_id, result):
+        if self.is_current_job(job_id):
+            self.current_job = None
+            self.set_busy(False)
+            path, count, (rows, cols) = result
+            self.error_label.setText(f"{os.path.basename(path)}: {count} samples of {rows}x{cols} written")
+
+    #***********************************
+    # Stats panel and JSON log line of a finished compute
+    #***********************************
+    def show_stats(self, job_id, stats):
+        self.stats_label.setText(f"total {stats.total() * 1000:.1f} ms   {stats.phase_text()}\n{stats.counter_text()}")
+        stats.log('compute', job=job_id)
+
+    def show_cache_counter(self):
+        from result_cache import shared_cache
+        cache = shared_cache()
+        self.cache_label.setText(cache.counter_text() if cache is not None else "")
+
+    def toggle_stats_panel(self, open):
+        self.stats_label.setVisible(open)
+        self.stats_button.setText("▾ Stats" if open else "▸ Stats")
+        self.setFixedSize(self.width(), self.height() + (stats_panel_height if open else -stats_panel_height))
+
+    def clear_result(self):
+        self.drop_simplify_job()
+        self.result_matrix.clear()
+        self.result_view.setToolTip("")
+        self.result_version = None
+        self.product = None
+
+    def read_matrix(self, matrix, rows, cols):
+        return matrix.read(rows, cols)
     
     #***********************************
     # Function which resets all grids (matrices)
     #***********************************   
     def reset(self):
-        print("Reset button pressed")
+        self.drop_current_job()
         self.error_label.setText("")
-        for widget in self.findChildren(QLineEdit):
-            widget.clear()
-            widget.setStyleSheet("background-color: lightgrey; border: 1px solid black;")
+        for matrix in self.operand_matrices:
+            matrix.clear()
+        self.clear_result()
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()    # worker processes of the frozen executable
+    enable_json_log()                   # one JSON line per computation on stderr
+    # --profile-startup: report how long each startup phase takes on stderr, then quit
+    startup_profile = StartupProfile(startup_time) if '--profile-startup' in sys.argv else None
+    if startup_profile is not None:
+        startup_profile.mark("imports")
     app = QApplication(sys.argv)
+    if startup_profile is not None:
+        startup_profile.mark("QApplication")
 
-    window = MatrixMultiplicationApp()
+    window = MatrixMultiplicationApp(startup_profile)
+    if startup_profile is not None:
+        startup_profile.mark("window construction")
     window.show()
 
     sys.exit(app.exec_())
@@ -0,0 +1,215 @@
+import hashlib
+import os
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from matrix_engine import Product, precision_setting
+
+#***********************************
+# Persistent result cache: symbolic products (and the exports copied from them) in a local
+# SQLite file, keyed by the content of the operands, bounded in size with LRU eviction
+#  - numeric products are never stored, BLAS recomputes them faster than they load
+#  - values are pickled sympy objects, the file is only ever read by the user who wrote it
+#  - any cache failure counts as a miss, a broken cache never breaks a computation
+#***********************************
+
+CACHE_VERSION = 1
+CACHE_MAX_BYTES = 256 * 1024 * 1024
+CACHE_FILE_NAME = 'results.sqlite'
+
+
+def default_cache_path():
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or os.path.expanduser('~')
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(base, 'matrix_multiplicator', CACHE_FILE_NAME)
+
+
+def product_key(operands, cse=False, operation=None, precision=None):
+    digest = hashlib.sha1(f"v{CACHE_VERSION}|cse={bool(cse)}".encode())
+    if operation is not None:
+        digest.update(b'|op=' + repr(tuple(operation)).encode())
+    if any(operand.is_numeric for operand in operands):
+        # numeric sub-products of a mixed chain are rounded to the precision mode
+        mode, digits = precision or precision_setting()
+        digest.update(f"|precision={mode}{digits if mode == 'mpmath' else ''}".encode())
+    for operand in operands:
+        digest.update(b'|' + operand.key().encode())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, path=None, max_bytes=CACHE_MAX_BYTES):
+        self.path = path or default_cache_path()
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+        self._connection = None
+
+    def connection(self):
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # one connection shared by the compute and export threads, serialized by self.lock
+            connection = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, data BLOB NOT NULL, '
+                               'size INTEGER NOT NULL, used REAL NOT NULL)')
+            connection.execute('CREATE TABLE IF NOT EXISTS renderings (key TEXT NOT NULL, format TEXT NOT NULL, '
+                               'text TEXT NOT NULL, size INTEGER NOT NULL, PRIMARY KEY (key, format))')
+            self._connection = connection
+        return self._connection
+
+    def close(self):
+        with self.lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    #***********************************
+    # Products
+    #***********************************
+    def get(self, key, operands):
+        with self.lock:
+            try:
+                connection = self.connection()
+                row = connection.execute('SELECT data FROM results WHERE key = ?', (key,)).fetchone()
+                if row is not None:
+                    with connection:
+                        connection.execute('UPDATE results SET used = ? WHERE key = ?', (time.time(), key))
+                    state = pickle.loads(row[0])
+            except (sqlite3.Error, OSError):
+                row = None
+            except Exception:
+                # written by an incompatible sympy or cache version
+                self._delete(key)
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        product = Product(operands[0], operands[-1], state['value'], state['engine'])
+        product.operands = list(operands)
+        product.order = state['order']
+        product.cse = state['cse']
+        product.operation = state.get('operation')
+        product._texts = state['texts']
+        product.key = key
+        return product
+
+    def put(self, key, product):
+        if product.is_numeric:
+            return
+        state = {'value': product.value, 'engine': product.engine, 'order': product.order,
+                 'cse': product.cse, 'operation': product.operation, 'texts': product.texts()}
+        with self.lock:
+            try:
+                data = pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL)
+                connection = self.connection()
+                with connection:
+                    connection.execute('INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)', (key, data, len(data), time.time()))
+                    connection.execute('DELETE FROM renderings WHERE key = ?', (key,))
+                self._evict()
+            except (sqlite3.Error, OSError, pickle.PicklingError, RecursionError):
+                return
+        product.key = key
+
+    #***********************************
+    # Exports of cached products (clipboard sized, the files are streamed instead)
+    #***********************************
+    def rendering(self, key, name):
+        with self.lock:
+            try:
+                row = self.connection().execute('SELECT text FROM renderings WHERE key = ? AND format = ?', (key, name)).fetchone()
+            except (sqlite3.Error, OSError):
+                return None
+        return row[0] if row is not None else None
+
+    def put_rendering(self, key, name, text):
+        with self.lock:
+            try:
+                connection = self.connection()
+                with connection:
+                    # only products still in the cache get renderings
+                    connection.execute('INSERT OR REPLACE INTO renderings SELECT ?, ?, ?, ? FROM results WHERE key = ?',
+                                       (key, name, text, len(text.encode()), key))
+                self._evict()
+            except (sqlite3.Error, OSError):
+                pass
+
+    #***********************************
+    # Size bound: least recently used products go first, with their renderings
+    #***********************************
+    def size(self):
+        connection = self.connection()
+        results = connection.execute('SELECT COALESCE(SUM(size), 0) FROM results').fetchone()[0]
+        renderings = connection.execute('SELECT COALESCE(SUM(size), 0) FROM renderings').fetchone()[0]
+        return results + renderings
+
+    def _evict(self):
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        connection = self.connection()
+        rows = connection.execute('SELECT results.key, results.size + COALESCE(SUM(renderings.size), 0) FROM results '
+                                  'LEFT JOIN renderings ON renderings.key = results.key '
+                                  'GROUP BY results.key ORDER BY results.used').fetchall()
+        with connection:
+            for key, size in rows:
+                if excess <= 0:
+                    break
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                connection.execute('DELETE FROM renderings WHERE key = ?', (key,))
+                excess -= size
+
+    def _delete(self, key):
+        try:
+            with self.connection() as connection:
+                connection.execute('DELETE FROM results WHERE key = ?', (key,))
+                connection.execute('DELETE FROM renderings WHERE key = ?', (key,))
+        except sqlite3.Error:
+            pass
+
+    def clear(self):
+        with self.lock:
+            connection = self.connection()
+            with connection:
+                connection.execute('DELETE FROM results')
+                connection.execute('DELETE FROM renderings')
+            connection.execute('VACUUM')
+
+    def counter_text(self):
+        return f"Cache: {self.hits} hits, {self.misses} misses"
+
+
+#***********************************
+# Shared cache of the process, like the engine's process pool
+#***********************************
+_shared_cache = None
+_shared_cache_enabled = True
+_shared_cache_lock = threading.Lock()
+
+
+def configure_cache(path=None, max_bytes=None, enabled=True):
+    global _shared_cache, _shared_cache_enabled
+    with _shared_cache_lock:
+        if _shared_cache is not None:
+            _shared_cache.close()
+        _shared_cache_enabled = bool(enabled)
+        _shared_cache = ResultCache(path, max_bytes or CACHE_MAX_BYTES) if _shared_cache_enabled else None
+
+
+def shared_cache():
+    global _shared_cache
+    with _shared_cache_lock:
+        if _shared_cache is None and _shared_cache_enabled:
+            _shared_cache = ResultCache()
+        return _shared_cache
+
+
+# Purely numeric products are recomputed, never looked up
+def cacheable(operands):
+    return not all(operand.is_numeric for operand in operands)
@@ -0,0 +1,200 @@
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+from sympy import cancel, collect, count_ops, expand, simplify, trigsimp
+from matrix_engine import ComputeCancelled, EngineError, apply_cse
+
+#***********************************
+# Tiered simplification of symbolic results under a time budget
+#  - levels: none < expand < cancel (cancel, then collect over the symbols) < trigsimp < full (simplify)
+#  - tiers run cheapest first, each on the best form so far, a form is only kept when it is smaller
+#    (fewer operations, then shorter text)
+#  - the tiers run in a helper process that is killed when an entry overruns its budget, so a
+#    runaway simplify() never blocks; the best form found before the deadline is kept
+#  - results are memoized per (level, expression) for the whole session
+#***********************************
+
+SIMPLIFY_LEVELS = ('none', 'expand', 'cancel', 'trigsimp', 'full')
+SIMPLIFY_ENTRY_BUDGET = 1.0     # seconds per entry
+SIMPLIFY_TOTAL_BUDGET = 20.0    # seconds per result
+SIMPLIFY_MEMO_SIZE = 4096
+SIMPLIFY_POLL = 0.1             # seconds between cancel checks while the helper works
+
+
+def cancel_collect(expr):
+    expr = cancel(expr)
+    return collect(expr, sorted(expr.free_symbols, key=lambda symbol: symbol.name))
+
+
+TIERS = {
+    'expand': expand,
+    'cancel': cancel_collect,
+    'trigsimp': trigsimp,
+    'full': simplify,
+}
+
+
+def expression_cost(expr):
+    return count_ops(expr), len(str(expr))
+
+
+def check_level(level):
+    if level not in SIMPLIFY_LEVELS:
+        raise EngineError(f"Unknown simplification level '{level}', choose from {', '.join(SIMPLIFY_LEVELS)}")
+    return level
+
+
+def simplified_forms(expr, level):
+    # successively smaller forms of expr, up to and including the tier of level
+    best, best_cost = expr, expression_cost(expr)
+    for tier in SIMPLIFY_LEVELS[1:SIMPLIFY_LEVELS.index(level) + 1]:
+        try:
+            candidate = TIERS[tier](best)
+        except Exception:
+            # e.g. PolynomialError from cancel() on non-rational parts, the next tier may still work
+            continue
+        cost = expression_cost(candidate)
+        if cost < best_cost:
+            best, best_cost = candidate, cost
+            yield best
+
+
+def simplifier_main(connection):
+    connection.send('ready')
+    while True:
+        try:
+            expr, level = connection.recv()
+        except EOFError:
+            return
+        for form in simplified_forms(expr, level):
+            connection.send(form)
+        connection.send(None)
+
+
+#***********************************
+# Simplifier: the helper process plus the memo, one entry at a time
+#***********************************
+class Simplifier:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.memo = OrderedDict()   # (level, expr) -> (best form, budget it ran out of or None when complete)
+        self.process = None
+        self.connection = None
+
+    def start(self):
+        context = multiprocessing.get_context('spawn')
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=simplifier_main, args=(child,), daemon=True)
+        self.process.start()
+        child.close()
+        # the helper imports sympy first, its startup does not count against an entry's budget
+        if self.connection.recv() != 'ready':
+            raise EngineError("The simplifier process did not start")
+
+    def stop(self):
+        if self.process is not None:
+            self.process.kill()
+            self.process.join()
+            self.connection.close()
+        self.process = None
+        self.connection = None
+
+    def remember(self, key, form, exhausted):
+        self.memo[key] = (form, exhausted)
+        self.memo.move_to_end(key)
+        while len(self.memo) > SIMPLIFY_MEMO_SIZE:
+            self.memo.popitem(last=False)
+
+    # Best form of expr within budget seconds, and whether the budget ran out first
+    def simplify(self, expr, level, budget=SIMPLIFY_ENTRY_BUDGET, cancelled=None):
+        key = (level, expr)
+        with self.lock:
+            if key in self.memo:
+                form, exhausted = self.memo[key]
+                if exhausted is None or exhausted >= budget:
+                    self.memo.move_to_end(key)
+                    return form, exhausted is not None
+            if self.process is None or not self.process.is_alive():
+                self.start()
+            self.connection.send((expr, level))
+            best = expr
+            deadline = time.perf_counter() + budget
+            while True:
+                remaining = deadline - time.perf_counter()
+                if cancelled is not None and cancelled():
+                    self.stop()
+                    raise ComputeCancelled()
+                if remaining <= 0:
+                    # the helper is still inside a tier: it goes, the next entry starts a fresh one
+                    self.stop()
+                    self.remember(key, best, budget)
+                    return best, True
+                if not self.connection.poll(min(remaining, SIMPLIFY_POLL)):
+                    continue
+                try:
+                    form = self.connection.recv()
+                except EOFError:
+                    # the helper died (out of memory, recursion), keep what it delivered
+                    self.stop()
+                    self.remember(key, best, budget)
+                    return best, True
+                if form is None:
+                    self.remember(key, best, None)
+                    return best, False
+                best = form
+
+
+_shared_simplifier = None
+_shared_simplifier_lock = threading.Lock()
+
+
+def shared_simplifier():
+    global _shared_simplifier
+    with _shared_simplifier_lock:
+        if _shared_simplifier is None:
+            _shared_simplifier = Simplifier()
+        return _shared_simplifier
+
+
+#***********************************
+# Whole results: entries in row order until the total budget is spent
+#***********************************
+def symbolic_entries(matrix):
+    return [(i, j, matrix[i, j]) for i in range(matrix.shape[0]) for j in range(matrix.shape[1]) if not matrix[i, j].is_Atom]
+
+
+def simplify_entries(entries, level, improved, entry_budget=SIMPLIFY_ENTRY_BUDGET, total_budget=SIMPLIFY_TOTAL_BUDGET,
+                     progress=None, cancelled=None, simplifier=None):
+    # improved(i, j, form) gets every entry that became smaller; returns counters for the stats
+    check_level(level)
+    counts = {'simplified entries': 0, 'over budget': 0, 'skipped': 0}
+    if level == 'none' or not entries:
+        return counts
+    simplifier = simplifier or shared_simplifier()
+    deadline = time.perf_counter() + total_budget
+    for done, (i, j, expr) in enumerate(entries, 1):
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            counts['skipped'] = len(entries) - done + 1
+            break
+        form, exhausted = simplifier.simplify(expr, level, min(entry_budget, remaining), cancelled)
+        counts['over budget'] += exhausted
+        if form is not expr and form != expr:
+            counts['simplified entries'] += 1
+            improved(i, j, form)
+        if progress is not None:
+            progress(done, len(entries))
+    return counts
+
+
+def simplify_product(product, level, entry_budget=SIMPLIFY_ENTRY_BUDGET, total_budget=SIMPLIFY_TOTAL_BUDGET,
+                     progress=None, cancelled=None):
+    if product.is_numeric:
+        return {}
+    counts = simplify_entries(symbolic_entries(product.value), level, product.set_entry, entry_budget, total_budget,
+                              progress, cancelled)
+    # temporaries of the old entries no longer match
+    if product.cse is not None and counts['simplified entries']:
+        apply_cse(product)
+    return counts
@@ -0,0 +1,28 @@
+import sys
+import time
+
+#***********************************
+# Startup profile: named phases measured from one start time, reported as a table
+#***********************************
+class StartupProfile:
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.phases = []
+
+    # Closes the phase that ran since the previous mark
+    def mark(self, name):
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+        return now - self.start
+
+    # A phase that ran alongside the others (e.g. in a background thread)
+    def add(self, name, seconds):
+        self.phases.append((name, seconds))
+
+    def report(self, total_label='total', file=sys.stderr):
+        width = max(len(name) for name, _ in self.phases + [(total_label, 0)])
+        for name, seconds in self.phases:
+            print(f"{name:<{width}}  {seconds * 1000:8.1f} ms", file=file)
+        print(f"{total_label:<{width}}  {(self.last - self.start) * 1000:8.1f} ms", file=file)
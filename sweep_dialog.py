@@ -0,0 +1,37 @@
+from PyQt5.QtWidgets import QDialog, QDialogButtonBox, QFormLayout, QLabel, QLineEdit, QVBoxLayout
+from PyQt5.QtGui import QFont
+
+#***********************************
+# Sweep dialog: one line of values per free symbol of the result
+#  - 'start:stop:count' for evenly spaced samples, 'a, b, c' for a list, or one value
+#***********************************
+class SweepDialog(QDialog):
+    def __init__(self, names, texts=None, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("Evaluate result")
+        texts = texts or {}
+
+        hint = QLabel("start:stop:count (e.g. 0:2*pi:1000000), a list a, b, c or a single value.\n"
+                      "Swept symbols must have the same number of samples.")
+        hint.setFont(QFont("Arial", 10))
+
+        form = QFormLayout()
+        self.edits = {}
+        for name in names:
+            edit = QLineEdit(texts.get(name, '0'))
+            edit.setMinimumWidth(300)
+            form.addRow(QLabel(name), edit)
+            self.edits[name] = edit
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        buttons.button(QDialogButtonBox.Ok).setText("Evaluate and save ...")
+        buttons.accepted.connect(self.accept)
+        buttons.rejected.connect(self.reject)
+
+        layout = QVBoxLayout(self)
+        layout.addWidget(hint)
+        layout.addLayout(form)
+        layout.addWidget(buttons)
+
+    def texts(self):
+        return {name: edit.text() for name, edit in self.edits.items()}
@@ -0,0 +1,10 @@
+from sympy import Matrix, symbols
+from exporters import export_text
+from matrix_engine import Operand, multiply
+
+
+def test_matlab_formula_is_a_terminated_statement():
+    x = symbols('x')
+    product = multiply(Operand.from_matrix(Matrix([[x, 1]])), Operand.from_matrix(Matrix([[2], [x]])))
+    text = export_text(product, 'matlab')
+    assert text.endswith('M_Res = M_L * M_R;\n')
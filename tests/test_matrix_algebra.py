@@ -0,0 +1,52 @@
+import math
+from fractions import Fraction
+import pytest
+from sympy import Matrix, Rational
+from matrix_engine import Operand
+from matrix_algebra import apply_operation, clear_factorizations
+
+PRECISIONS = [('float32', 50), ('float64', 50), ('mpmath', 30)]
+
+
+def hilbert(n):
+    texts = [[repr(1 / (i + j + 1)) for j in range(n)] for i in range(n)]
+    return Operand(texts), Matrix(n, n, lambda i, j: Rational(Fraction(texts[i][j])))
+
+
+@pytest.mark.parametrize('precision', PRECISIONS)
+@pytest.mark.parametrize('operation', [('power', 0), ('power', 1), ('power', -1), ('power', -2), ('inverse',), ('det',), ('solve',)])
+def test_numeric_results_carry_precision_and_bound(operation, precision):
+    clear_factorizations()
+    operands = [Operand([['0.1', '0.2'], ['0.3', '0.4']]), Operand([['1'], ['2']])]
+    product = apply_operation(operation, operands, precision=precision)
+    assert product.precision is not None
+    assert product.error_bound is not None and product.error_bound >= 0
+
+
+@pytest.mark.parametrize('precision', PRECISIONS)
+def test_bounds_cover_the_error_of_lu_results(precision):
+    clear_factorizations()
+    A, exact = hilbert(6)
+    B = Operand([[str(i + 1)] for i in range(6)])
+    solution = exact.LUsolve(Matrix([i + 1 for i in range(6)]))
+    solved = apply_operation(('solve',), [A, B], precision=precision)
+    assert max(abs(float(solved.value[i, 0]) - float(solution[i])) for i in range(6)) <= solved.error_bound
+    inverse, exact_inverse = apply_operation(('inverse',), [A], precision=precision), exact.inv()
+    assert max(abs(float(inverse.value[i, j]) - float(exact_inverse[i, j])) for i in range(6) for j in range(6)) <= inverse.error_bound
+    det = apply_operation(('det',), [A], precision=precision)
+    assert abs(float(det.value[0, 0]) - float(exact.det())) <= det.error_bound
+
+
+def test_no_bound_when_too_ill_conditioned():
+    clear_factorizations()
+    A, _ = hilbert(11)
+    product = apply_operation(('inverse',), [A], precision=('float32', 50))
+    assert product.precision == 'float32' and product.error_bound == math.inf
+
+
+def test_integer_powers_stay_exact():
+    clear_factorizations()
+    A = Operand([['2', '1'], ['1', '3']])
+    for exponent in (0, 1):
+        product = apply_operation(('power', exponent), [A], precision=('float64', 50))
+        assert product.error_bound == 0.0
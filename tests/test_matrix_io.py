@@ -0,0 +1,40 @@
+import io
+from sympy import Function, Matrix, Rational, atan2, symbols
+from matrix_io import parse_matlab, parse_matrix_text, parse_nested
+
+
+def test_matlab_functions_with_several_arguments():
+    assert parse_matlab('[atan2(y, x), 1; 2, 3]') == [['atan2(y, x)', '1'], ['2', '3']]
+    assert parse_matlab('[atan2(y, x) Max(a, b); 2 3]') == [['atan2(y, x)', 'Max(a, b)'], ['2', '3']]
+
+
+def test_matlab_rows_and_entries():
+    assert parse_matlab('M = [1 2; 3 4];') == [['1', '2'], ['3', '4']]
+    assert parse_matlab('[a + b, c; d, e]') == [['a + b', 'c'], ['d', 'e']]
+    assert parse_matrix_text('[f(x, y); g(1, 2)]') == [['f(x, y)'], ['g(1, 2)']]
+
+
+def exported(matrix, constructor='Matrix'):
+    from exporters import PythonExporter, RowCounter
+    from matrix_engine import Operand
+    file = io.StringIO()
+    PythonExporter().write_matrix(file, 'M_1', Operand.from_matrix(matrix), RowCounter(matrix.shape[0]), constructor)
+    return file.getvalue()
+
+
+def test_nested_entries_with_commas():
+    assert parse_nested('Matrix([[Rational(1, 2), 3]])') == [['Rational(1, 2)', '3']]
+    assert parse_nested('Matrix([[f(x, y), 2]])') == [['f(x, y)', '2']]
+    assert parse_nested('array([[1, 2],\n       [3, 4]])') == [['1', '2'], ['3', '4']]
+    assert parse_nested('[[1 2]\n [3 4]]') == [['1', '2'], ['3', '4']]
+
+
+def test_python_export_round_trip():
+    from matrix_engine import Operand
+    x, y = symbols('x y')
+    f = Function('f')
+    matrix = Matrix([[Rational(1, 2), 3, f(x, y)], [Rational(-7, 3), atan2(y, x), x**2 + 1]])
+    rows = parse_matrix_text(exported(matrix))
+    assert Operand(rows).matrix() == matrix
+    numbers = Matrix([[1, -2], [3, 40]])
+    assert Operand(parse_matrix_text(exported(numbers, 'np.array'))).matrix() == numbers
@@ -0,0 +1,73 @@
+import math
+import random
+import pytest
+from sympy import Matrix, Rational
+from sympy.polys.domains import ZZ
+from sympy.polys.matrices import DomainMatrix
+from matrix_engine import Operand, domain_product, exact_operands, multimodular_product, word_primes
+
+
+def domain_matrix(rows):
+    return DomainMatrix([[ZZ(entry) for entry in row] for row in rows], (len(rows), len(rows[0])), ZZ)
+
+
+def check(left, right):
+    A, B = domain_matrix(left), domain_matrix(right)
+    assert multimodular_product(A, B).to_Matrix() == (A * B).to_Matrix()
+
+
+def random_rows(rng, m, n, bits):
+    return [[rng.randrange(-2**bits, 2**bits) for _ in range(n)] for _ in range(m)]
+
+
+@pytest.mark.parametrize('bits', [1, 40, 300])
+def test_all_negative_entries(bits):
+    rng = random.Random(bits)
+    left = [[-abs(entry) - 1 for entry in row] for row in random_rows(rng, 5, 7, bits)]
+    right = [[-abs(entry) - 1 for entry in row] for row in random_rows(rng, 7, 4, bits)]
+    check(left, right)
+
+
+def test_zero_operands():
+    rng = random.Random(0)
+    check([[0] * 6 for _ in range(3)], random_rows(rng, 6, 4, 50))
+    check(random_rows(rng, 3, 6, 50), [[0] * 4 for _ in range(6)])
+    # an all-zero product from nonzero operands
+    check([[1, 1]], [[5], [-5]])
+
+
+@pytest.mark.parametrize('shape', [(1, 1, 1), (3, 8, 5), (9, 2, 4), (4, 13, 1), (1, 13, 6)])
+def test_non_square_operands(shape):
+    m, k, n = shape
+    rng = random.Random(m * 100 + k * 10 + n)
+    check(random_rows(rng, m, k, 120), random_rows(rng, k, n, 120))
+
+
+@pytest.mark.parametrize('k', [1, 2, 7, 63, 1000])
+def test_row_times_column(k):
+    rng = random.Random(k)
+    check(random_rows(rng, 1, k, 200), random_rows(rng, k, 1, 200))
+
+
+def test_rational_operands():
+    rng = random.Random(1)
+    left = Operand.from_matrix(Matrix(4, 6, lambda i, j: Rational(rng.randrange(-10**20, 10**20), rng.randrange(1, 10**6))))
+    right = Operand.from_matrix(Matrix(6, 3, lambda i, j: Rational(rng.randrange(-10**20, 10**20), rng.randrange(1, 10**6))))
+    A, B = exact_operands(left, right)
+    assert domain_product(left, right, A, B, multimodular=True) == left.matrix() * right.matrix()
+
+
+# k (p - 1)^2 is closest to 2^53 for k = 2^j - 1 with odd j: residues of p - 1 in every prime
+# the product uses make the float64 dot products as large as they get
+@pytest.mark.parametrize('k', [7, 31, 127])
+def test_dot_products_near_the_float64_limit(k):
+    bits = min(26, (53 - k.bit_length()) // 2)
+    primes = word_primes(bits, 40)
+    assert k * (primes[0] - 1)**2 > 2**52
+    modulus = math.prod(primes)
+    rng = random.Random(k)
+    # entries -(c M + 1) are p - 1 modulo each of the first 40 primes
+    left = [[-(rng.randrange(1, 100) * modulus + 1) for _ in range(k)] for _ in range(3)]
+    right = [[-(rng.randrange(1, 100) * modulus + 1) for _ in range(2)] for _ in range(k)]
+    check(left, right)
+    check([[-1] * k], [[-1]] * k)
@@ -0,0 +1,27 @@
+from sympy import Matrix, symbols
+from matrix_engine import Operand, configure_precision
+from result_cache import product_key
+
+
+def test_precision_is_part_of_the_key_of_numeric_operands():
+    x = symbols('x')
+    symbolic, numeric = Operand.from_matrix(Matrix([[x, 1]])), Operand([['0.17'], ['2']])
+    mixed = [symbolic, numeric]
+    assert product_key(mixed, precision=('float32', 50)) != product_key(mixed, precision=('float64', 50))
+    assert product_key(mixed, precision=('mpmath', 30)) != product_key(mixed, precision=('mpmath', 40))
+    # digits only matter to mpmath
+    assert product_key(mixed, precision=('float64', 30)) == product_key(mixed, precision=('float64', 40))
+    symbolic_only = [symbolic, Operand.from_matrix(Matrix([[x], [x]]))]
+    assert product_key(symbolic_only, precision=('float32', 50)) == product_key(symbolic_only, precision=('float64', 50))
+
+
+def test_key_follows_the_configured_precision():
+    x = symbols('x')
+    mixed = [Operand.from_matrix(Matrix([[x, 1]])), Operand([['0.17'], ['2']])]
+    try:
+        configure_precision('float32')
+        float32 = product_key(mixed)
+        configure_precision('float64')
+        assert product_key(mixed) != float32
+    finally:
+        configure_precision('auto')
@@ -57,15 +57,21 @@ class TitleBar(QWidget):
     def mouseReleaseEvent(self, event):
         self.old_pos = None
 
+    # The embedded PNG is decoded once and shared by the window icon and the title bar
+    pixmap_cache = {}
+
+    @staticmethod
     def iconFromBase64(base64):
-        pixmap = QtGui.QPixmap()
-        pixmap.loadFromData(QtCore.QByteArray.fromBase64(base64))
-        icon = QtGui.QIcon(pixmap)
+        icon = QtGui.QIcon(TitleBar.PixmapFromBase64(base64))
         return icon
-    
-    def PixmapFromBase64(self, base64):
-        pixmap = QtGui.QPixmap()
-        pixmap.loadFromData(QtCore.QByteArray.fromBase64(base64))
+
+    @staticmethod
+    def PixmapFromBase64(base64):
+        pixmap = TitleBar.pixmap_cache.get(base64)
+        if pixmap is None:
+            pixmap = QtGui.QPixmap()
+            pixmap.loadFromData(QtCore.QByteArray.fromBase64(base64))
+            TitleBar.pixmap_cache[base64] = pixmap
         return pixmap
     
     image_base64 = b'''iVBORw0KGgoAAAANSUhEUgAAAXoAAAF6CAYAAAAXoJOQAAAACXBIWXMAABJ0AAASdAHeZh94AAAgAElEQVR4nO3daWxe130n/u85d3nus3ERKYqk9s1arJ22HC9xFDtO7DiJEy+